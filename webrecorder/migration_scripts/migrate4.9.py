@@ -0,0 +1,44 @@
+import os
+import sys
+
+# add parent dir to path to access webrecorder package
+wr_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, wr_path)
+
+from redis import StrictRedis
+from webrecorder.models import Collection, BookmarkList
+
+
+# ============================================================================
+def main():
+    """
+    Pages and bookmarks are now stored in a compact, versioned encoding
+    Rewriting all c:{coll}:p and l:{blist}:b values still stored as plain JSON
+    Safe to run again, already packed values are skipped
+    """
+    r = StrictRedis.from_url(os.environ['REDIS_BASE_URL'], decode_responses=True)
+
+    if len(sys.argv) > 1 and sys.argv[1] == '-d':
+        print('Dry Run')
+        dry = True
+    else:
+        print('Packing pages and bookmarks')
+        dry = False
+
+    formats = [(Collection.PAGES_KEY.format(coll='*'), Collection.PAGE_FORMAT),
+               (BookmarkList.BOOK_CONTENT_KEY.format(blist='*'), BookmarkList.BOOKMARK_FORMAT)]
+
+    for pattern, packed_format in formats:
+        total = 0
+
+        for key in r.scan_iter(pattern):
+            count = packed_format.repack_hash(r, key, dry_run=dry)
+            if count:
+                print('{0}: {1}'.format(key, count))
+
+            total += count
+
+        print('{0}: {1} total'.format(pattern, total))
+
+
+main()
@@ -0,0 +1,114 @@
+"""Micro-benchmark of committed recording index lookups.
+
+Writes the same sorted CDXJ lines as a plain index and as a compressed
+block index with a ZipNum summary, and compares the index sizes and the
+time per exact-url lookup with CDXJFileIndexSource: binary search of the
+memory-mapped plain index vs. binary search of the summary and a ranged
+read and decompression of the matching blocks.
+
+Run from the package root with:
+
+    python -m test.bench_cdxj_index [--count N] [--lookups N] [--block-lines N]
+"""
+from webrecorder.load.cdxjindexsource import CDXJFileIndexSource, CDXJFileCache, iter_cdxj_range
+from webrecorder.models import Recording
+
+from argparse import ArgumentParser
+from mock import patch
+from tempfile import TemporaryDirectory
+
+import json
+import os
+import random
+import time
+
+
+# ============================================================================
+SITES = ['com,example', 'org,iana', 'org,wikipedia,en', 'com,nytimes',
+         'com,twitter', 'uk,co,bbc', 'com,github', 'uk,gov']
+
+
+# ============================================================================
+def make_cdxj_lines(count):
+    rand = random.Random(4242)
+    lines = []
+
+    for i in range(count):
+        site = rand.choice(SITES)
+        urlkey = '{0})/page/{1}?q={2}'.format(site, i, rand.randint(0, 1000))
+        timestamp = '2018{0:010d}'.format(rand.randint(0, 9999999999))
+
+        data = {'url': 'http://example.com/page/{0}'.format(i),
+                'mime': 'text/html',
+                'status': '200',
+                'digest': 'sha1:{0:032X}'.format(rand.getrandbits(128)),
+                'length': str(rand.randint(500, 50000)),
+                'offset': str(rand.randint(0, 1000000000)),
+                'filename': 'rec-20180101000000000000-{0}.warc.gz'.format(i // 10000)}
+
+        lines.append('{0} {1} {2}'.format(urlkey, timestamp, json.dumps(data)))
+
+    lines.sort()
+    return lines
+
+
+def time_lookups(func, keys):
+    start = time.perf_counter()
+    found = 0
+    for key in keys:
+        found += sum(1 for line in func(key, key + b'!'))
+
+    return time.perf_counter() - start, found
+
+
+def main(args=None):
+    parser = ArgumentParser(description='Committed recording index lookup micro-benchmark')
+    parser.add_argument('--count', type=int, default=500000,
+                        help='number of CDXJ lines in the index')
+    parser.add_argument('--lookups', type=int, default=2000,
+                        help='number of urls to look up')
+    parser.add_argument('--block-lines', type=int, default=1000,
+                        help='CDXJ lines per compressed block')
+
+    r = parser.parse_args(args=args)
+
+    lines = make_cdxj_lines(r.count)
+
+    rand = random.Random(1234)
+    keys = [rand.choice(lines).split(' ', 1)[0].encode('utf-8') for i in range(r.lookups)]
+
+    with TemporaryDirectory() as temp_dir:
+        plain_filename = os.path.join(temp_dir, 'index.cdxj')
+        blocks_filename = os.path.join(temp_dir, 'index.cdxj.gz')
+        summary_filename = os.path.join(temp_dir, 'index.idx')
+
+        with open(plain_filename, 'wt') as out:
+            for line in lines:
+                out.write(line + '\n')
+
+        with patch.object(Recording, 'CDXJ_BLOCK_LINES', r.block_lines):
+            Recording.write_cdxj_blocks(lines, blocks_filename, summary_filename)
+
+        file_cache = CDXJFileCache(cache_dir=temp_dir)
+        source = CDXJFileIndexSource(redis=None, file_cache=file_cache)
+
+        plain = file_cache.get(plain_filename)
+        summary = file_cache.get(summary_filename)
+
+        plain_time, plain_found = time_lookups(lambda key, end_key: iter_cdxj_range(plain, key, end_key), keys)
+
+        blocks_time, blocks_found = time_lookups(lambda key, end_key: source.load_blocks(blocks_filename, summary, key, end_key), keys)
+
+        assert plain_found == blocks_found
+
+        plain_size = os.path.getsize(plain_filename)
+        blocks_size = os.path.getsize(blocks_filename) + os.path.getsize(summary_filename)
+
+        print('{0} cdxj lines, {1} lookups, {2} lines per block'.format(len(lines), len(keys), r.block_lines))
+        print('plain cdxj:    {0:7.1f} MB  {1:.3f} ms/lookup'.format(plain_size / 1e6, plain_time * 1e3 / len(keys)))
+        print('block index:   {0:7.1f} MB  {1:.3f} ms/lookup  (summary {2:.1f} KB)'.format(
+              blocks_size / 1e6, blocks_time * 1e3 / len(keys), os.path.getsize(summary_filename) / 1e3))
+
+
+if __name__ == '__main__':
+    main()
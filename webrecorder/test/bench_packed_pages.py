@@ -0,0 +1,72 @@
+"""Micro-benchmark of stored page encodings.
+
+Encodes the same pages as plain JSON objects and with the packed page
+format, and compares the stored size per page and the time to decode
+all pages one at a time vs. with the bulk decoder.
+
+Run from the package root with:
+
+    python -m test.bench_packed_pages [--count N]
+"""
+from webrecorder.models import Collection
+
+from argparse import ArgumentParser
+
+import json
+import random
+import time
+
+
+# ============================================================================
+def make_pages(count):
+    rand = random.Random(4242)
+    pages = []
+
+    for i in range(count):
+        page = {'url': 'http://example.com/path/{0}?q={1}'.format(i, rand.randint(0, 1000)),
+                'timestamp': '2018{0:010d}'.format(rand.randint(0, 9999999999)),
+                'title': 'Example Page {0}'.format(i),
+                'rec': 'rec-{0}'.format(i // 1000)}
+
+        if rand.random() < 0.5:
+            page['browser'] = 'chrome:60'
+
+        pages.append(page)
+
+    return pages
+
+
+def time_decode(func, values):
+    start = time.perf_counter()
+    pages = func(values)
+    return time.perf_counter() - start, pages
+
+
+def main(args=None):
+    parser = ArgumentParser(description='Stored page encoding micro-benchmark')
+    parser.add_argument('--count', type=int, default=100000,
+                        help='number of pages')
+
+    r = parser.parse_args(args=args)
+
+    pages = make_pages(r.count)
+    page_format = Collection.PAGE_FORMAT
+
+    plain = [json.dumps(page) for page in pages]
+    packed = [page_format.pack(page) for page in pages]
+
+    plain_time, plain_pages = time_decode(lambda values: [json.loads(value) for value in values], plain)
+    packed_time, packed_pages = time_decode(page_format.unpack_all, packed)
+
+    assert plain_pages == packed_pages == pages
+
+    plain_size = sum(len(value) for value in plain)
+    packed_size = sum(len(value) for value in packed)
+
+    print('{0} pages'.format(len(pages)))
+    print('plain json:  {0:6.1f} bytes/page  {1:.3f} s decode'.format(plain_size / len(pages), plain_time))
+    print('packed:      {0:6.1f} bytes/page  {1:.3f} s decode'.format(packed_size / len(pages), packed_time))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+"""Throughput test of the recorder's per-response checks.
+
+Records the same number of responses with the recording open, skip url
+and user size checks made against Redis on every response, and again
+with the checks cached and the user size leased locally
+(record_check_cache_secs, record_quota_lease_size), and reports the
+responses recorded per second and the Redis calls made by the recorder's
+writer per response. An optional delay per Redis call stands in for the
+network round trip to a remote Redis.
+
+Run from the package root with:
+
+    python -m test.bench_recorder [--count N] [--latency-ms N]
+"""
+from .testutils import FullStackTests
+
+from argparse import ArgumentParser
+
+import gevent
+import time
+
+
+# ============================================================================
+class CountingRedis(object):
+    def __init__(self, redis, latency):
+        self.redis = redis
+        self.latency = latency
+        self.count = 0
+
+    def __getattr__(self, name):
+        attr = getattr(self.redis, name)
+        if not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            self.count += 1
+            if self.latency:
+                gevent.sleep(self.latency)
+            return attr(*args, **kwargs)
+
+        return call
+
+
+# ============================================================================
+class BenchRecorder(FullStackTests):
+    @classmethod
+    def init_recording(cls):
+        cls.set_uuids('Recording', ['rec'])
+        res = cls.testapp.get('/_new/temp/rec/record/mp_/http://httpbin.org/get?init=1')
+        res.follow()
+
+        cls.writer = cls.runner.rec_serv.server.application.wr.writer
+
+    @classmethod
+    def run_step(cls, name, count, latency, cache_secs, lease_size):
+        cls.writer.check_cache_secs = cache_secs
+        cls.writer.quota_lease_size = lease_size
+        cls.writer.check_cache = {}
+
+        redis = cls.writer.redis
+        cls.writer.redis = CountingRedis(redis, latency)
+
+        try:
+            start = time.perf_counter()
+
+            for i in range(count):
+                cls.testapp.get('/{user}/temp/rec/record/mp_/http://httpbin.org/get?{name}={i}'.format(
+                                user=cls.anon_user, name=name, i=i))
+
+            elapsed = time.perf_counter() - start
+            calls = cls.writer.redis.count
+
+        finally:
+            cls.writer.redis = redis
+
+        return count / elapsed, calls / float(count)
+
+
+def main(args=None):
+    parser = ArgumentParser(description='Recorder per-response check throughput test')
+    parser.add_argument('--count', type=int, default=500,
+                        help='number of responses to record, per run')
+    parser.add_argument('--latency-ms', type=float, default=0.0,
+                        help='delay added to each Redis call made by the writer')
+    parser.add_argument('--lease-size', type=int, default=10000000,
+                        help='bytes of user space to lease, with caching on')
+
+    r = parser.parse_args(args=args)
+
+    BenchRecorder.setup_class()
+
+    try:
+        BenchRecorder.init_recording()
+
+        print('checks    responses/s  redis calls/response')
+
+        for name, cache_secs, lease_size in (('direct', 0, 0), ('cached', 10.0, r.lease_size)):
+            rate, calls = BenchRecorder.run_step(name, r.count, r.latency_ms / 1000.0, cache_secs, lease_size)
+
+            print('{0:8s}  {1:11.1f}  {2:20.2f}'.format(name, rate, calls))
+
+    finally:
+        BenchRecorder.teardown_class()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+"""Micro-benchmark of WAMLoader.find_archive_for_url() lookups.
+
+Compares the host-indexed lookup against a linear scan of all
+replay prefixes, over URLs as found in WARC-Source-URI headers of
+extracted and patched records, plus URLs not from any archive.
+
+Run from the package root with:
+
+    python -m test.bench_wamloader [--count N]
+"""
+from webrecorder.load.wamloader import WAMLoader
+
+from argparse import ArgumentParser
+from tempfile import NamedTemporaryFile
+
+import os
+import random
+import time
+import yaml
+
+
+# ============================================================================
+WEBARCHIVES = [
+    ('ia', 'https://web.archive.org/web/{timestamp}id_/{url}', False),
+    ('perma', 'https://perma-archives.org/warc/{timestamp}id_/{url}', False),
+    ('ait', 'https://wayback.archive-it.org/{collection}/{timestamp}id_/{url}', True),
+    ('loc', 'https://webarchive.loc.gov/all/{timestamp}id_/{url}', False),
+    ('rhiz', 'https://webenact.rhizome.org/{collection}/{timestamp}id_/{url}', True),
+    ('uk_wa', 'https://www.webarchive.org.uk/wayback/archive/{timestamp}id_/{url}', False),
+    ('pt_wa', 'http://arquivo.pt/wayback/{timestamp}id_/{url}', False),
+    ('is_wa', 'http://wayback.vefsafn.is/wayback/{timestamp}id_/{url}', False),
+    ('si_wa', 'http://nukrobi2.nuk.uni-lj.si:8080/wayback/{timestamp}id_/{url}', False),
+    ('ee_wa', 'http://veebiarhiiv.digar.ee/a/{timestamp}id_/{url}', False),
+    ('sg_wa', 'http://eresources.nlb.gov.sg/webarchives/wayback/{timestamp}id_/{url}', False),
+    ('uk_na', 'http://webarchive.nationalarchives.gov.uk/{timestamp}id_/{url}', False),
+    ('uk_parl', 'http://webarchive.parliament.uk/{timestamp}id_/{url}', False),
+    ('proni', 'http://webarchive.proni.gov.uk/{timestamp}id_/{url}', False),
+    ('eu_wa_coll', 'http://collection.europarchive.org/{collection}/{timestamp}id_/{url}', True),
+    ('nara', 'https://webharvest.gov/{collection}/{timestamp}id_/{url}', True),
+    ('cat_wa', 'http://padi.cat:8080/wayback/{timestamp}id_/{url}', False),
+    ('cz_wa', 'http://wayback.webarchiv.cz/wayback/{timestamp}id_/{url}', False),
+    ('hr_wa', 'http://haw.nsk.hr/wayback/{timestamp}id_/{url}', False),
+    ('ca_wa', 'http://webarchive.bac-lac.gc.ca:8080/wayback/{timestamp}id_/{url}', False),
+    ('nz_wa', 'https://ndhadeliver.natlib.govt.nz/webarchive/{timestamp}id_/{url}', False),
+    ('au_wa', 'https://webarchive.nla.gov.au/awa/{timestamp}id_/{url}', False),
+    ('de_ba', 'https://webarchiv.bundestag.de/archive/{timestamp}id_/{url}', False),
+    ('lu_wa', 'https://wayback.webarchive.lu/wayback/{timestamp}id_/{url}', False),
+    ('swa', 'https://www.stanford.edu/wayback/{timestamp}id_/{url}', False),
+    ('yorku', 'https://wayback.archive-it.org/5835/{timestamp}id_/{url}', False),
+]
+
+SITES = ['example.com', 'www.iana.org', 'en.wikipedia.org', 'www.nytimes.com',
+         'twitter.com', 'www.bbc.co.uk', 'github.com', 'www.gov.uk']
+
+
+# ============================================================================
+def write_webarchives(out):
+    webarchives = {}
+    for pk, replay, has_colls in WEBARCHIVES:
+        webarchive = {'name': pk,
+                      'apis': {'wayback': {'replay': {'raw': replay}}}}
+
+        if has_colls:
+            webarchive['collections'] = '[\\d]+'
+
+        webarchives[pk] = webarchive
+
+    yaml.dump({'webarchives': webarchives}, out, encoding='utf-8')
+
+
+def make_urls(count, archive_ratio=0.8):
+    rand = random.Random(4242)
+    urls = []
+
+    for i in range(count):
+        url = 'http://{0}/page/{1}?q={2}'.format(rand.choice(SITES), i, rand.randint(0, 1000))
+        if rand.random() < archive_ratio:
+            pk, replay, has_colls = rand.choice(WEBARCHIVES)
+            replay = replay.replace('{collection}', str(rand.randint(1000, 9999)))
+            replay = replay.replace('{timestamp}', '2017{0:010d}'.format(i))
+            url = replay.replace('{url}', url)
+
+        urls.append(url)
+
+    return urls
+
+
+def find_archive_linear(loader, url):
+    schemeless_url = loader.STRIP_SCHEME.sub('', url)
+    for pk, info in loader.replay_info.items():
+        if schemeless_url.startswith(info['replay_prefix']):
+            orig_url = schemeless_url[len(info['replay_prefix']):]
+            if info.get('parse_collection'):
+                coll, orig_url = orig_url.split('/', 1)
+                id_ = pk + ':' + coll
+            else:
+                id_ = pk
+
+            return pk, orig_url, id_
+
+
+def time_lookups(func, urls):
+    start = time.perf_counter()
+    for url in urls:
+        func(url)
+
+    return time.perf_counter() - start
+
+
+def main(args=None):
+    parser = ArgumentParser(description='WAMLoader lookup micro-benchmark')
+    parser.add_argument('--count', type=int, default=200000,
+                        help='number of URLs to look up')
+
+    r = parser.parse_args(args=args)
+
+    with NamedTemporaryFile(suffix='.yaml', delete=False) as out:
+        write_webarchives(out)
+
+    try:
+        loader = WAMLoader(webarchives_file=out.name)
+    finally:
+        os.remove(out.name)
+
+    urls = make_urls(r.count)
+
+    for url in urls[:10000]:
+        assert loader.find_archive_for_url(url) == find_archive_linear(loader, url), url
+
+    linear = time_lookups(lambda url: find_archive_linear(loader, url), urls)
+    indexed = time_lookups(loader.find_archive_for_url, urls)
+
+    print('{0} archives, {1} urls'.format(len(loader.replay_info), len(urls)))
+    print('linear scan: {0:.3f}s ({1:.2f} us/lookup)'.format(linear, linear * 1e6 / len(urls)))
+    print('indexed:     {0:.3f}s ({1:.2f} us/lookup)'.format(indexed, indexed * 1e6 / len(urls)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+"""Load test of the client websockets held open by one app worker.
+
+Opens websockets to a single in-process app server in steps and,
+for each step, reports the memory used, the CPU time spent while
+all sockets sit idle, the delay until every socket gets a status
+push after the recording grows, and the delay until a client
+message sent on every socket has been handled.
+
+Run from the package root with:
+
+    python -m test.bench_websock [--count N] [--step N] [--idle-secs N]
+"""
+from .testutils import FullStackTests
+from webrecorder.fullstackrunner import FullStackRunner
+from webrecorder.models import User
+
+from argparse import ArgumentParser
+
+import gevent
+import json
+import requests
+import resource
+import time
+import websocket
+
+
+# ============================================================================
+class BenchWebSock(FullStackTests):
+    @classmethod
+    def custom_init(cls, kwargs):
+        cls.runner = FullStackRunner(app_port=0, env_params=cls.runner_env_params)
+        cls.app_port = cls.runner.app_serv.port
+
+        cls.sesh = requests.session()
+
+    @classmethod
+    def init_recording(cls):
+        url = 'http://localhost:{0}'.format(cls.app_port)
+
+        res = cls.sesh.post(url + '/api/v1/auth/anon_user')
+        cls.anon_user = res.json()['user']['username']
+
+        cls.set_uuids('Recording', ['rec'])
+
+        cls.sesh.post(url + '/api/v1/collections?user={0}'.format(cls.anon_user), json={'title': 'temp'})
+        cls.sesh.post(url + '/api/v1/recordings?user={0}&coll=temp'.format(cls.anon_user), json={})
+
+        cls.rec_info_key = cls.get_coll_rec_obj('temp', 'rec')[1].info_key
+
+    @classmethod
+    def connect(cls):
+        ws = websocket.WebSocket()
+        ws.connect('ws://localhost:{0}/_client_ws?user={1}&coll=temp&rec=rec&type=record'.format(cls.app_port, cls.anon_user),
+                   header=['Cookie: __test_sesh=' + cls.sesh.cookies['__test_sesh']])
+
+        # initial status
+        ws.recv()
+        return ws
+
+    @classmethod
+    def time_status_push(cls, sockets):
+        start = time.perf_counter()
+        size = cls.redis.hincrby(cls.rec_info_key, 'size', 1)
+
+        def wait_status(ws):
+            while json.loads(ws.recv())['size'] != size:
+                pass
+
+        gevent.joinall([gevent.spawn(wait_status, ws) for ws in sockets], raise_error=True)
+        return time.perf_counter() - start
+
+    @classmethod
+    def time_client_msg(cls, sockets, step):
+        keys = []
+        start = time.perf_counter()
+
+        for i, ws in enumerate(sockets):
+            url = 'http://example.com/{0}/{1}'.format(step, i)
+            keys.append(User.URL_SKIP_KEY.format(user=cls.anon_user, url=url))
+            ws.send(json.dumps({'ws_type': 'skipreq', 'url': url}))
+
+        while not all(cls.redis.exists(key) for key in keys):
+            gevent.sleep(0.001)
+
+        return time.perf_counter() - start
+
+
+def main(args=None):
+    parser = ArgumentParser(description='Websocket load test')
+    parser.add_argument('--count', type=int, default=1000,
+                        help='max number of websockets to open')
+    parser.add_argument('--step', type=int, default=250,
+                        help='number of websockets to open per step')
+    parser.add_argument('--idle-secs', type=float, default=5.0,
+                        help='seconds to measure idle CPU time for, per step')
+
+    r = parser.parse_args(args=args)
+
+    resource.setrlimit(resource.RLIMIT_NOFILE, (r.count * 4 + 256,) * 2)
+
+    BenchWebSock.setup_class(init_anon=False)
+
+    try:
+        BenchWebSock.init_recording()
+
+        sockets = []
+        print('sockets  rss (MB)  idle cpu (ms/s)  status push (ms)  client msg (ms)')
+
+        while len(sockets) < r.count:
+            sockets.extend(BenchWebSock.connect() for i in range(r.step))
+
+            cpu_start = time.process_time()
+            gevent.sleep(r.idle_secs)
+            idle_cpu = (time.process_time() - cpu_start) / r.idle_secs
+
+            push = BenchWebSock.time_status_push(sockets)
+            client_msg = BenchWebSock.time_client_msg(sockets, len(sockets))
+            rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+            print('{0:7d}  {1:8.1f}  {2:15.1f}  {3:16.1f}  {4:15.1f}'.format(
+                  len(sockets), rss, idle_cpu * 1000, push * 1000, client_msg * 1000))
+
+        for ws in sockets:
+            ws.close()
+
+    finally:
+        BenchWebSock.teardown_class()
+
+
+if __name__ == '__main__':
+    main()
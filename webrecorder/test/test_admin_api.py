@@ -23,6 +23,10 @@ class TestAdminAPI(FullStackTests):
         # no permissions, just display 404
         assert res.json == {'error': 'not_found'}
 
+    def test_no_auth_admin_index_cache(self):
+        res = self.testapp.get('/api/v1/admin/index_cache', status=404)
+        assert res.json == {'error': 'not_found'}
+
     def test_no_auth_client_archives(self):
         res = self.testapp.get('/api/v1/client_archives')
 
@@ -74,6 +78,15 @@ class TestAdminAPI(FullStackTests):
         # raw key, not converted to int
         assert self.redis.hgetall('h:defaults') == {'max_anon_size': '1000000000', 'max_size': '7000000000'}
 
+    def test_api_index_cache(self):
+        res = self.testapp.get('/api/v1/admin/index_cache')
+        assert res.json == {'index_cache': {'cdxj_hits': 0,
+                                            'cdxj_misses': 0,
+                                            'evictions': 0,
+                                            'size': 0,
+                                            'max_size': 0,
+                                            'collections': 0}}
+
     def test_api_users(self):
         res = self.testapp.get('/api/v1/admin/users')
         assert [user['username'] for user in res.json['users']] == ['adminuser', 'test']
@@ -35,6 +35,7 @@ class TestTempContent(FullStackTests):
         'r:{rec}:_pc',
         'c:{coll}:warc',
         'c:{coll}:p',
+        'c:{coll}:rp:{rec}',
         'c:{coll}:info',
         'c:{coll}:recs',
         'u:{user}:info',
@@ -110,7 +111,7 @@ class TestTempContent(FullStackTests):
         cls.pages.append(page_id)
 
     def _assert_rec_keys(self, user, coll_name, rec_list, url='', replay_coll=True, del_q=False,
-                         check_stats=False):
+                         check_stats=False, coll_cdxj=True):
         exp_keys = []
 
         coll = self.temp_coll
@@ -123,7 +124,9 @@ class TestTempContent(FullStackTests):
             exp_keys.extend(self._get_redis_keys(self.REDIS_KEYS, user, coll, rec))
 
         if replay_coll:
-            exp_keys.append('c:{coll}:cdxj'.format(user=user, coll=coll))
+            if coll_cdxj:
+                exp_keys.append('c:{coll}:cdxj'.format(user=user, coll=coll))
+                exp_keys.append('c:{coll}:cdxj:m'.format(user=user, coll=coll))
             exp_keys.append(Stats.REPLAY_TEMP_KEY)
 
         if self.downloaded:
@@ -617,7 +620,8 @@ class TestTempContent(FullStackTests):
 
         self.sleep_try(0.1, 10.0, assert_one_warc)
 
-        self._assert_rec_keys(user, 'temp', ['my-rec2'], del_q=True, check_stats=True)
+        # collection index evicted on delete
+        self._assert_rec_keys(user, 'temp', ['my-rec2'], del_q=True, check_stats=True, coll_cdxj=False)
 
         res = self.testapp.delete('/api/v1/recording/my-recording?user={user}&coll=temp'.format(user=self.anon_user), status=404)
 
@@ -0,0 +1,171 @@
+from .testutils import FullStackTests
+
+from webrecorder.models import Collection, User
+
+from bottle import http_date
+from mock import patch
+
+
+# ============================================================================
+class TestConditionalAPI(FullStackTests):
+    @classmethod
+    def setup_class(cls):
+        super(TestConditionalAPI, cls).setup_class(extra_config_file='test_api_conditional_config.yaml')
+
+    def _get_etag(self, url, **kwargs):
+        res = self._anon_get(url, **kwargs)
+        assert res.headers['ETag'].startswith('W/"')
+        assert res.headers['Cache-Control'] == 'private, no-cache'
+        return res, res.headers['ETag']
+
+    def _assert_not_modified(self, url, etag):
+        res = self._anon_get(url, headers={'If-None-Match': etag}, status=304)
+        assert res.text == ''
+        assert res.headers['ETag'] == etag
+        return res
+
+    def test_init(self):
+        res = self.testapp.post_json('/api/v1/collections?user={user}'.format(user=self.anon_user), params={'title': 'Temp'})
+        assert res.json['collection']['id'] == 'temp'
+
+        res = self._anon_post('/api/v1/recordings?user={user}&coll=temp', params={'desc': 'Rec'})
+        self.add_rec_id(res.json['recording']['id'])
+
+    def test_coll_not_modified(self):
+        url = '/api/v1/collection/temp?user={user}'
+        res, etag = self._get_etag(url)
+        assert res.json['collection']['title'] == 'Temp'
+
+        res = self._assert_not_modified(url, etag)
+
+        # collection and owner entries read once, not serialized
+        assert res.headers['X-WR-Redis-Calls'] == '2'
+
+        res = self._anon_get(url, headers={'If-None-Match': '"other", ' + etag}, status=304)
+
+        res = self._anon_get(url, headers={'If-None-Match': '"other"'})
+        assert res.headers['ETag'] == etag
+        assert res.json['collection']['title'] == 'Temp'
+
+    def test_coll_modified_page_added(self):
+        url = '/api/v1/collection/temp?user={user}'
+        res, etag = self._get_etag(url)
+        assert res.json['collection']['pages'] == []
+
+        page = {'title': 'Example', 'url': 'http://example.com/', 'timestamp': '2016010203000000'}
+        self._anon_post('/api/v1/recording/{rec_id_0}/pages?user={user}&coll=temp', params=page)
+
+        res = self._anon_get(url, headers={'If-None-Match': etag})
+        assert res.headers['ETag'] != etag
+        assert [page['url'] for page in res.json['collection']['pages']] == ['http://example.com/']
+
+        self._assert_not_modified(url, res.headers['ETag'])
+
+    def test_coll_modified_query(self):
+        res, etag = self._get_etag('/api/v1/collection/temp?user={user}')
+        res, other_etag = self._get_etag('/api/v1/recordings?user={user}&coll=temp')
+
+        assert etag != other_etag
+
+    def test_recording_modified(self):
+        url = '/api/v1/recording/{rec_id_0}?user={user}&coll=temp'
+        res, etag = self._get_etag(url)
+        assert res.json['recording']['desc'] == 'Rec'
+
+        self._assert_not_modified(url, etag)
+
+        self._anon_post(url, params={'desc': 'New Desc'})
+
+        res = self._anon_get(url, headers={'If-None-Match': etag})
+        assert res.json['recording']['desc'] == 'New Desc'
+
+        url = '/api/v1/recordings?user={user}&coll=temp'
+        res, etag = self._get_etag(url)
+        assert [rec['desc'] for rec in res.json['recordings']] == ['New Desc']
+
+        self._assert_not_modified(url, etag)
+
+    def test_lists_and_page_bookmarks_modified(self):
+        lists_url = '/api/v1/lists?user={user}&coll=temp'
+        page_bookmarks_url = '/api/v1/collection/temp/page_bookmarks?user={user}'
+
+        res, lists_etag = self._get_etag(lists_url)
+        assert res.json['lists'] == []
+
+        res, page_bookmarks_etag = self._get_etag(page_bookmarks_url)
+        assert res.json['page_bookmarks'] == {}
+
+        self._assert_not_modified(lists_url, lists_etag)
+        self._assert_not_modified(page_bookmarks_url, page_bookmarks_etag)
+
+        res = self._anon_post(lists_url, params={'title': 'New List'})
+        list_id = res.json['list']['id']
+
+        res = self._anon_get(lists_url, headers={'If-None-Match': lists_etag})
+        assert [blist['title'] for blist in res.json['lists']] == ['New List']
+        lists_etag = res.headers['ETag']
+
+        res = self._anon_get('/api/v1/collection/temp?user={user}')
+        page_id = res.json['collection']['pages'][0]['id']
+
+        bookmark = {'url': 'http://example.com/', 'timestamp': '2016010203000000',
+                    'title': 'Example', 'page_id': page_id}
+
+        res = self._anon_post('/api/v1/list/{0}/bookmarks?user={{user}}&coll=temp'.format(list_id), params=bookmark)
+        bid = res.json['bookmark']['id']
+
+        res = self._anon_get(page_bookmarks_url, headers={'If-None-Match': page_bookmarks_etag})
+        assert res.json['page_bookmarks'] == {page_id: {bid: list_id}}
+
+        res = self._anon_get(lists_url, headers={'If-None-Match': lists_etag})
+        assert [len(blist['bookmarks']) for blist in res.json['lists']] == [1]
+
+    def test_if_modified_since(self):
+        coll, rec = self.get_coll_rec(self.anon_user, 'temp', None)
+        info_key = Collection.INFO_KEY.format(coll=coll)
+
+        # collection and owner updated before current second
+        for key in ('updated_at', Collection.REVISED_AT_KEY):
+            self.redis.hset(info_key, key, 1500000000)
+
+        self.redis.hset(User.INFO_KEY.format(user=self.anon_user), 'updated_at', 1400000000)
+
+        url = '/api/v1/collection/temp?user={user}'
+        res, etag = self._get_etag(url)
+        assert res.headers['Last-Modified'] == http_date(1500000000)
+
+        res = self._anon_get(url, headers={'If-Modified-Since': http_date(1500000000)}, status=304)
+        res = self._anon_get(url, headers={'If-Modified-Since': http_date(1499999999)})
+        assert res.json['collection']['title'] == 'Temp'
+
+        # etag takes precedence
+        res = self._anon_get(url, headers={'If-Modified-Since': http_date(1500000000),
+                                           'If-None-Match': '"other"'})
+        assert res.json['collection']['title'] == 'Temp'
+
+        # modified in current second, no last modified date
+        self._anon_post('/api/v1/collection/temp?user={user}', params={'desc': 'New Desc'})
+
+        res = self._anon_get(url, headers={'If-Modified-Since': http_date(1500000000)})
+        assert res.json['collection']['desc'] == 'New Desc'
+        assert 'Last-Modified' not in res.headers
+
+    def test_api_cache_shared(self):
+        url = '/api/v1/collection/temp?user={user}'
+        res, etag = self._get_etag(url)
+
+        key = 'api:' + etag[3:-1]
+        assert self.redis.ttl(key) > 0
+
+        # served from cache, without serializing collection
+        with patch('webrecorder.models.Collection.serialize', side_effect=AssertionError):
+            res = self._anon_get(url)
+
+        assert res.headers['ETag'] == etag
+        assert res.json['collection']['title'] == 'Temp'
+        assert res.json['collection']['desc'] == 'New Desc'
+
+    def test_not_found_no_access(self):
+        self.testapp.reset()
+        self._anon_get('/api/v1/collection/temp?user={user}', status=404)
+        self._anon_get('/api/v1/lists?user={user}&coll=temp', status=404)
@@ -0,0 +1,86 @@
+from pywb.warcserver.test.testutils import FakeRedisTests, BaseTestClass
+
+from webrecorder.rec.webrecrecorder import CDXJBatchWriter
+from webrecorder.models.stats import Stats
+from webrecorder.utils import today_str
+
+
+# ============================================================================
+class TestCDXJBatchWriter(FakeRedisTests, BaseTestClass):
+    KEYS = ['r:test:cdxj', 'c:test:cdxj']
+
+    def setup_method(self):
+        self.redis.flushdb()
+        self.batches = []
+
+    def get_writer(self, batch_size):
+        return CDXJBatchWriter(self.redis, self.KEYS, batch_size,
+                               batch_callback=self.batches.append)
+
+    def cdxj_lines(self, count):
+        return [b'com,example)/' + str(i).encode('utf-8') + b' 2019 {}' for i in range(count)]
+
+    def test_flush_at_batch_size(self):
+        writer = self.get_writer(3)
+
+        lines = self.cdxj_lines(3)
+        writer.write(b'\n'.join(lines[:2]) + b'\n')
+
+        # below batch size, nothing written yet
+        assert self.batches == []
+        assert self.redis.zcard(self.KEYS[0]) == 0
+
+        writer.write(lines[2] + b'\n')
+
+        assert self.batches == [lines]
+        assert writer.count == 3
+        for key in self.KEYS:
+            assert self.redis.zrange(key, 0, -1) == lines
+
+    def test_final_partial_batch(self):
+        writer = self.get_writer(3)
+
+        lines = self.cdxj_lines(5)
+        data = b'\n'.join(lines)
+
+        # split mid-line, last line without trailing newline
+        writer.write(data[:10])
+        writer.write(data[10:])
+
+        assert self.batches == [lines[:3]]
+        assert self.redis.zcard(self.KEYS[0]) == 3
+
+        writer.close()
+
+        assert self.batches == [lines[:3], lines[3:]]
+        assert writer.count == 5
+        for key in self.KEYS:
+            assert self.redis.zrange(key, 0, -1) == lines
+
+    def test_callback_per_batch(self):
+        writer = self.get_writer(2)
+
+        lines = self.cdxj_lines(7)
+        for line in lines:
+            writer.write(line + b'\n')
+
+        writer.close()
+
+        assert [len(batch) for batch in self.batches] == [2, 2, 2, 1]
+        assert writer.count == 7
+
+        # empty close does not call back
+        writer.close()
+        assert len(self.batches) == 4
+
+    def test_incr_sources_no_user(self):
+        cdx = b'com,example)/ 2019 {"orig_source_id": "src", "length": "100"}'
+
+        stats = Stats(self.redis)
+        stats.incr_sources({'sources': 'src'}, [cdx])
+
+        assert self.redis.hget(Stats.SOURCES_KEY.format('src'), today_str()) is None
+
+        stats.incr_sources({'sources': 'src', 'param.user': 'test'}, [cdx])
+
+        assert self.redis.hget(Stats.SOURCES_KEY.format('src'), today_str()) == b'100'
@@ -0,0 +1,239 @@
+from .testutils import FullStackTests
+
+from webrecorder.load.cdxjindexsource import iter_cdxj_range, iter_summary_blocks, CDXJFileCache
+from webrecorder.models import Recording
+
+from pywb.utils.loaders import BlockLoader
+
+from itertools import count
+from mock import patch
+
+import gevent
+import gzip
+import os
+import pytest
+
+
+# ============================================================================
+REC_CDXJ = 'r:500:cdxj'
+REC_INFO = 'r:500:info'
+REC_2_CDXJ = 'r:501:cdxj'
+
+COLL_CDXJ = 'c:100:cdxj'
+
+
+# ============================================================================
+class BaseCDXJFileIndex(FullStackTests):
+    @classmethod
+    def setup_class(cls):
+        super(BaseCDXJFileIndex, cls).setup_class(extra_config_file='test_cdxj_file_index_config.yaml',
+                                                  storage_worker=True)
+
+        cls.set_uuids('Recording', count(500))
+        cls.set_uuids('Collection', count(100))
+
+    def test_record_1(self):
+        res = self.testapp.get('/_new/temp/rec/record/mp_/http://httpbin.org/get?food=bar')
+        res = res.follow()
+        res.charset = 'utf-8'
+
+        assert '"food": "bar"' in res.text, res.text
+
+        for i in range(3):
+            res = self.testapp.get('/{user}/temp/500/record/mp_/http://httpbin.org/get?a={i}'.format(user=self.anon_user, i=i))
+
+        assert len(self.redis.zrange(REC_CDXJ, 0, -1)) == 4
+
+    def test_commit(self):
+        self.params = {}
+
+        def assert_committed():
+            res = self.testapp.post_json('/api/v1/collection/temp/commit?user={user}'.format(user=self.anon_user), params=self.params)
+            self.params = res.json
+            assert self.params['success'] == True
+
+        self.sleep_try(0.2, 10.0, assert_committed)
+
+        assert not self.redis.exists(REC_CDXJ)
+        assert self.redis.hget(REC_INFO, Recording.INDEX_FILE_KEY)
+
+    def test_record_2_open(self):
+        res = self.testapp.get('/_new/temp/rec-2/record/mp_/http://httpbin.org/get?bood=far')
+        res = res.follow()
+        res.charset = 'utf-8'
+
+        assert '"bood": "far"' in res.text, res.text
+
+        assert self.redis.exists(REC_2_CDXJ)
+
+    def test_replay_committed_and_open(self):
+        res = self.testapp.get('/{user}/temp/mp_/http://httpbin.org/get?food=bar'.format(user=self.anon_user))
+        res.charset = 'utf-8'
+
+        assert '"food": "bar"' in res.text, res.text
+
+        res = self.testapp.get('/{user}/temp/mp_/http://httpbin.org/get?bood=far'.format(user=self.anon_user))
+        res.charset = 'utf-8'
+
+        assert '"bood": "far"' in res.text, res.text
+
+        # committed recording not loaded back into Redis
+        assert not self.redis.exists(COLL_CDXJ)
+        assert not self.redis.exists(REC_CDXJ)
+
+    def test_replay_not_found(self):
+        res = self.testapp.get('/{user}/temp/mp_/http://httpbin.org/get?food=baz'.format(user=self.anon_user), status=404)
+
+
+# ============================================================================
+class TestCDXJFileIndex(BaseCDXJFileIndex):
+    @pytest.fixture(scope='class')
+    def sorted_file(self):
+        filename = os.path.join(self.warcs_dir, 'sorted.cdxj')
+        with open(filename, 'wt') as fh:
+            fh.write('com,example)/ 2017 {}\ncom,example)/a 2017 {}\ncom,example)/a 2018 {}\ncom,example)/b 2017 {}')
+
+        return CDXJFileCache().get(filename)
+
+    @pytest.mark.parametrize('key, end_key, count', [
+        (b'com,example)/a', b'com,example)/a!', 2),
+        (b'com,example)/', b'com,example)0', 4),
+        (b'com,example)/b', b'com,example)/b!', 1),
+        (b'a', b'b', 0),
+        (b'com,example)/c', b'com,example)/c!', 0),
+    ])
+    def test_iter_range(self, sorted_file, key, end_key, count):
+        lines = list(iter_cdxj_range(sorted_file, key, end_key))
+        assert len(lines) == count
+        assert all(line.startswith(key) for line in lines)
+        assert lines == sorted(lines)
+
+    def get_remote_urls(self, count):
+        urls = []
+        for i in range(count):
+            filename = os.path.join(self.warcs_dir, 'remote-{0}.cdxj'.format(i))
+            with open(filename, 'wt') as fh:
+                fh.write('com,example)/ 2017 {}\n')
+
+            urls.append('file://' + filename)
+
+        return urls
+
+    def test_download_cache_budget(self):
+        cache_dir = os.path.join(self.root_dir, 'cdxj-cache-budget')
+        urls = self.get_remote_urls(3)
+        file_size = os.path.getsize(urls[0][len('file://'):])
+
+        # one file mapped, two kept downloaded
+        file_cache = CDXJFileCache(max_open=1, cache_dir=cache_dir,
+                                   max_download_size=file_size * 2)
+
+        mm = file_cache.get(urls[0])
+        file_cache.get(urls[1])
+
+        # evicted mapping still downloaded, not downloaded again
+        with patch.object(file_cache.loader, 'load', side_effect=AssertionError):
+            file_cache.get(urls[0])
+
+        assert len(os.listdir(cache_dir)) == 2
+
+        # least recently used download removed, mapping still readable
+        file_cache.get(urls[2])
+
+        assert list(file_cache.downloads.keys()) == [urls[0], urls[2]]
+        assert len(os.listdir(cache_dir)) == 2
+        assert file_cache.download_size == file_size * 2
+        assert mm[:13] == b'com,example)/'
+
+    def test_download_once(self):
+        cache_dir = os.path.join(self.root_dir, 'cdxj-cache-once')
+        url = self.get_remote_urls(1)[0]
+
+        file_cache = CDXJFileCache(cache_dir=cache_dir)
+        orig_load = file_cache.loader.load
+
+        def slow_load(url):
+            gevent.sleep(0.1)
+            return orig_load(url)
+
+        with patch.object(file_cache.loader, 'load', side_effect=slow_load) as load:
+            jobs = [gevent.spawn(file_cache.get, url) for i in range(5)]
+            gevent.joinall(jobs)
+
+        assert load.call_count == 1
+        assert all(job.value[:13] == b'com,example)/' for job in jobs)
+
+        # no partial downloads left
+        assert len(os.listdir(cache_dir)) == 1
+
+    def test_replay_committed_and_open(self):
+        with patch('webrecorder.load.cdxjindexsource.iter_cdxj_range', wraps=iter_cdxj_range) as iter_range:
+            super(TestCDXJFileIndex, self).test_replay_committed_and_open()
+
+        assert iter_range.call_count == 2
+
+
+# ============================================================================
+class TestCDXJBlockIndex(BaseCDXJFileIndex):
+    @classmethod
+    def setup_class(cls):
+        super(TestCDXJBlockIndex, cls).setup_class()
+
+        cls.block_lines_mock = patch('webrecorder.models.recording.Recording.CDXJ_BLOCK_LINES', 1)
+        cls.block_lines_mock.start()
+
+    @classmethod
+    def teardown_class(cls):
+        cls.block_lines_mock.stop()
+
+        super(TestCDXJBlockIndex, cls).teardown_class()
+
+    @pytest.mark.parametrize('key, end_key, blocks', [
+        (b'com,example)/a', b'com,example)/a!', [(0, 10), (10, 10), (20, 10)]),
+        (b'com,example)/', b'com,example)0', [(0, 10), (10, 10), (20, 10), (30, 10)]),
+        (b'com,example)/b', b'com,example)/b!', [(20, 10), (30, 10)]),
+        (b'a', b'b', []),
+        (b'com,example)/c', b'com,example)/c!', [(30, 10)]),
+    ])
+    def test_iter_summary_blocks(self, key, end_key, blocks):
+        filename = os.path.join(self.warcs_dir, 'sorted.idx')
+        with open(filename, 'wt') as fh:
+            fh.write('com,example)/ 2017\tpart\t0\t10\t1\ncom,example)/a 2017\tpart\t10\t10\t2\n')
+            fh.write('com,example)/a 2018\tpart\t20\t10\t3\ncom,example)/b 2017\tpart\t30\t10\t4\n')
+
+        assert list(iter_summary_blocks(CDXJFileCache().get(filename), key, end_key)) == blocks
+
+    def test_commit(self):
+        super(TestCDXJBlockIndex, self).test_commit()
+
+        index_file, summary_file = self.redis.hmget(REC_INFO, [Recording.INDEX_FILE_KEY, Recording.INDEX_SUMMARY_KEY])
+
+        assert index_file.endswith('.cdxj.gz')
+        assert summary_file.endswith('.idx')
+
+        with gzip.open(CDXJFileCache().get_location(index_file), 'rt') as fh:
+            lines = fh.read().rstrip().split('\n')
+
+        with open(CDXJFileCache().get_location(summary_file), 'rt') as fh:
+            summary = fh.read().rstrip().split('\n')
+
+        assert len(lines) == 4
+        assert len(summary) == 4
+        assert lines == sorted(lines)
+
+        assert [line.split('\t')[0] for line in summary] == [' '.join(line.split(' ')[:2]) for line in lines]
+
+    def test_replay_committed_and_open(self):
+        with patch('pywb.utils.loaders.BlockLoader.load', autospec=True,
+                   side_effect=BlockLoader.load) as load:
+            super(TestCDXJBlockIndex, self).test_replay_committed_and_open()
+
+        # only ranges of the compressed index read, each less than the full index
+        index_file = self.redis.hget(REC_INFO, Recording.INDEX_FILE_KEY)
+        index_size = os.path.getsize(CDXJFileCache().get_location(index_file))
+
+        index_loads = [call[0] for call in load.call_args_list if call[0][1].endswith('.cdxj.gz')]
+        assert len(index_loads) > 0
+
+        for _, url, offset, length in index_loads:
+            assert length < index_size
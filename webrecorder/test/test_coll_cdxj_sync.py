@@ -0,0 +1,113 @@
+from .testutils import FullStackTests
+
+from webrecorder.models import Collection
+
+from mock import patch
+
+
+# ============================================================================
+class TestCollCDXJSync(FullStackTests):
+    @classmethod
+    def setup_class(cls):
+        super(TestCollCDXJSync, cls).setup_class()
+
+        cls.redis_cls = type(cls.redis)
+
+    def get_coll(self):
+        coll, rec = self.get_coll_rec(self.anon_user, 'temp', 'rec')
+        return coll
+
+    def get_keys(self):
+        coll = self.get_coll()
+        return (Collection.COLL_CDXJ_KEY.format(coll=coll),
+                Collection.COLL_CDXJ_MERGED_KEY.format(coll=coll))
+
+    def record(self, rec, query):
+        self.set_uuids('Recording', [rec])
+        res = self.testapp.get('/_new/temp/{rec}/record/mp_/http://httpbin.org/get?{query}'.format(rec=rec, query=query))
+        res = res.follow()
+        res.charset = 'utf-8'
+
+        assert query.replace('=', '": "') in res.text, res.text
+
+    def replay(self, query):
+        res = self.testapp.get('/{user}/temp/mp_/http://httpbin.org/get?{query}'.format(user=self.anon_user, query=query))
+        res.charset = 'utf-8'
+
+        assert query.replace('=', '": "') in res.text, res.text
+
+    def no_rebuild(self, merged=None):
+        orig_zunionstore = self.redis_cls.zunionstore
+
+        # only merging into the loaded index, not rebuilding from all recordings
+        def zunionstore(redis, dest, keys, *args, **kwargs):
+            assert keys[0] == dest, 'full rebuild'
+            if merged is not None:
+                merged.extend(keys[1:])
+
+            return orig_zunionstore(redis, dest, keys, *args, **kwargs)
+
+        return patch.object(self.redis_cls, 'zunionstore', new=zunionstore)
+
+    def test_replay_load_all(self):
+        self.record('rec', 'food=bar')
+
+        self.replay('food=bar')
+
+        coll_key, merged_key = self.get_keys()
+        assert len(self.redis.zrange(coll_key, 0, -1)) == 1
+
+        gen = self.redis.hget('c:{coll}:info'.format(coll=self.get_coll()), '@cdxj_gen')
+        assert self.redis.hgetall(merged_key) == {'rec': '1', '@cdxj_gen': gen}
+        assert self.redis.ttl(merged_key) > 0
+
+    def test_replay_warm(self):
+        coll_key, merged_key = self.get_keys()
+
+        with self.no_rebuild():
+            self.replay('food=bar')
+
+        assert len(self.redis.zrange(coll_key, 0, -1)) == 1
+
+    def test_new_recording_merged(self):
+        coll_key, merged_key = self.get_keys()
+
+        # recorded while coll index not loaded
+        self.redis.delete(coll_key, merged_key)
+        self.record('rec2', 'bood=far')
+
+        self.replay('bood=far')
+        assert len(self.redis.zrange(coll_key, 0, -1)) == 2
+
+        # new recording, lines not yet in coll index
+        self.record('rec3', 'zood=baz')
+        self.redis.zremrangebylex(coll_key, '[org,httpbin)/get?zood', '(org,httpbin)/get?zoodz')
+        assert len(self.redis.zrange(coll_key, 0, -1)) == 2
+
+        # only new recording merged, server-side
+        merged = []
+        with self.no_rebuild(merged):
+            self.replay('zood=baz')
+
+        assert merged == ['r:rec3:cdxj']
+
+        assert len(self.redis.zrange(coll_key, 0, -1)) == 3
+        assert set(self.redis.hkeys(merged_key)) == {'rec', 'rec2', 'rec3', '@cdxj_gen'}
+
+    def test_delete_evicts(self):
+        coll_key, merged_key = self.get_keys()
+
+        res = self.testapp.delete('/api/v1/recording/rec3?user={user}&coll=temp'.format(user=self.anon_user))
+        assert res.json == {'deleted_id': 'rec3'}
+
+        assert not self.redis.exists(coll_key)
+        assert not self.redis.exists(merged_key)
+
+        self.replay('bood=far')
+
+        assert len(self.redis.zrange(coll_key, 0, -1)) == 2
+        assert set(self.redis.hkeys(merged_key)) == {'rec', 'rec2', '@cdxj_gen'}
+
+    def test_info_gen_not_serialized(self):
+        res = self.testapp.get('/api/v1/collection/temp?user={user}'.format(user=self.anon_user))
+        assert '@cdxj_gen' not in res.json['collection']
@@ -3,6 +3,8 @@ import os
 
 from .testutils import FullStackTests
 
+from mock import patch
+
 
 # ============================================================================
 class TestWebRecCollsAPI(FullStackTests):
@@ -66,6 +68,13 @@ class TestWebRecCollsAPI(FullStackTests):
         assert 'lists' not in colls[0]
         #assert colls[0]['download_url'] == 'http://localhost:80/{user}/temp/$download'.format(user=self.anon_user)
 
+    def test_list_anon_collections_batch_loaded(self):
+        # collections are loaded in one pipeline, not with a load() each
+        with patch('webrecorder.models.base.RedisUniqueComponent.load', side_effect=AssertionError):
+            res = self.testapp.get('/api/v1/collections?user={user}'.format(user=self.anon_user))
+
+        assert [coll['title'] for coll in res.json['collections']] == ['Temp']
+
     def test_error_no_title(self):
         res = self.testapp.post_json('/api/v1/collections?user={user}'.format(user=self.anon_user), status=400)
 
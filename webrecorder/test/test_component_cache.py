@@ -0,0 +1,91 @@
+from .testutils import FullStackTests
+
+from webrecorder.models import Collection
+from webrecorder.models.base import BaseAccess, ComponentCache
+
+from mock import patch
+
+
+# ============================================================================
+class CacheAccess(BaseAccess):
+    def __init__(self):
+        self.component_cache = ComponentCache()
+
+
+# ============================================================================
+class TestComponentCache(FullStackTests):
+    @classmethod
+    def setup_class(cls):
+        super(TestComponentCache, cls).setup_class(extra_config_file='test_component_cache_config.yaml')
+
+    def test_create_coll(self):
+        res = self.testapp.post_json('/api/v1/collections?user={user}'.format(user=self.anon_user), params={'title': 'Temp'})
+
+        assert res.json['collection']['id'] == 'temp'
+        assert int(res.headers['X-WR-Redis-Calls']) > 0
+
+    def test_get_coll_redis_calls(self):
+        res = self.testapp.get('/api/v1/collection/temp?user={user}'.format(user=self.anon_user))
+
+        assert res.json['collection']['title'] == 'Temp'
+        # collection and owner entries read once, in one pipeline
+        assert res.headers['X-WR-Redis-Calls'] == '2'
+
+    def test_read_once_per_request(self):
+        coll, _ = self.get_coll_rec(self.anon_user, 'temp', None)
+
+        access = CacheAccess()
+        collection = Collection(my_id=coll, redis=self.redis, access=access)
+        assert collection.get_prop('title') == 'Temp'
+        assert collection.size == 0
+
+        # new objects for same component are served from cache
+        other = Collection(my_id=coll, redis=self.redis, access=access)
+        with patch.object(self.redis, 'hgetall', side_effect=AssertionError):
+            assert other.get_prop('title') == 'Temp'
+            assert other.is_public() == False
+            other.load()
+            assert other.size == 0
+
+        # size always read from redis
+        assert access.component_cache.reads == 3
+        assert access.component_cache.hits == 2
+
+    def test_write_invalidates(self):
+        coll, _ = self.get_coll_rec(self.anon_user, 'temp', None)
+
+        access = CacheAccess()
+        collection = Collection(my_id=coll, redis=self.redis, access=access)
+        assert collection.get_prop('title') == 'Temp'
+
+        other = Collection(my_id=coll, redis=self.redis, access=access)
+        other.set_prop('title', 'New Title')
+        other.incr_size(100)
+
+        assert access.component_cache.is_cached(collection.info_key) == False
+
+        assert collection.size == 100
+        assert Collection(my_id=coll, redis=self.redis, access=access).get_prop('title') == 'New Title'
+
+        assert access.component_cache.reads == 3
+        assert access.component_cache.writes == 3
+        assert access.component_cache.redis_calls == 6
+
+    def test_force_update_bypasses_cache(self):
+        coll, _ = self.get_coll_rec(self.anon_user, 'temp', None)
+
+        access = CacheAccess()
+        collection = Collection(my_id=coll, redis=self.redis, access=access)
+        size = collection.size
+        assert collection.get_prop('title') == 'New Title'
+
+        # write outside of component methods
+        self.redis.hincrby(collection.info_key, 'size', 50)
+
+        assert collection.size == size + 50
+        assert Collection(my_id=coll, redis=self.redis, access=access).size == size + 50
+
+        # cached entry refreshed
+        other = Collection(my_id=coll, redis=self.redis, access=access)
+        other.load()
+        assert other.get_prop('size') == size + 50
@@ -0,0 +1,81 @@
+from .testutils import FullStackTests
+from webrecorder.models.usermanager import CLIUserManager
+
+from webrecorder.models import Collection
+
+from six.moves.urllib.parse import quote
+from mock import patch, MagicMock
+import os
+
+
+# ============================================================================
+class TestDownloadAccelRedirect(FullStackTests):
+    @classmethod
+    def setup_class(cls):
+        super(TestDownloadAccelRedirect, cls).setup_class(extra_config_file='test_download_accel_config.yaml',
+                                                          init_anon=False)
+
+        cls.user_manager = CLIUserManager()
+        cls.user_manager.create_user('test@example.com', 'test', 'TestTest456', 'archivist', 'Test User')
+
+        cls.warc_path = os.path.join(cls.warcs_dir, 'example data.warc.gz')
+        with open(cls.warc_path, 'wb') as fh:
+            fh.write(b'WARC/1.0\r\n')
+
+    def test_wasapi_download_accel_redirect(self):
+        user = self.user_manager.all_users['test']
+        collection = user.get_collection_by_name('default-collection')
+
+        self.redis.hset(collection.get_warc_key(), 'example.warc.gz', 'local+file://' + self.warc_path)
+
+        self.testapp.authorization = ('Basic', ('test', 'TestTest456'))
+        res = self.testapp.get('/api/v1/download/test/default-collection/example.warc.gz')
+        self.testapp.authorization = None
+
+        # file sent by nginx, not by the app
+        assert res.headers['X-Accel-Redirect'] == '/_x_accel' + quote(self.warc_path)
+        assert res.headers['Content-Disposition'] == "attachment; filename*=UTF-8''example.warc.gz"
+        assert 'Transfer-Encoding' not in res.headers
+        assert res.body == b''
+
+    def test_wasapi_download_local_warc_in_s3_coll(self):
+        user = self.user_manager.all_users['test']
+        collection = user.get_collection_by_name('default-collection')
+
+        self.redis.hset(collection.get_warc_key(), 'example.warc.gz', 'local+file://' + self.warc_path)
+
+        storage = MagicMock()
+        storage.get_remote_presigned_url.return_value = 'https://s3.example.com/example.warc.gz?sig'
+
+        self.testapp.authorization = ('Basic', ('test', 'TestTest456'))
+        with patch.object(Collection, 'get_storage', return_value=storage):
+            res = self.testapp.get('/api/v1/download/test/default-collection/example.warc.gz')
+        self.testapp.authorization = None
+
+        # not yet committed, not redirected to s3
+        assert res.headers['X-Accel-Redirect'] == '/_x_accel' + quote(self.warc_path)
+        assert storage.get_remote_presigned_url.call_count == 0
+
+    def test_wasapi_download_remote_warc_in_s3_coll(self):
+        user = self.user_manager.all_users['test']
+        collection = user.get_collection_by_name('default-collection')
+
+        self.redis.hset(collection.get_warc_key(), 'remote.warc.gz', 's3://bucket/remote.warc.gz')
+
+        storage = MagicMock()
+        storage.get_remote_presigned_url.return_value = 'https://s3.example.com/remote.warc.gz?sig'
+
+        self.testapp.authorization = ('Basic', ('test', 'TestTest456'))
+        with patch.object(Collection, 'get_storage', return_value=storage):
+            res = self.testapp.get('/api/v1/download/test/default-collection/remote.warc.gz')
+        self.testapp.authorization = None
+
+        assert res.status_int in (302, 303)
+        assert res.headers['Location'] == 'https://s3.example.com/remote.warc.gz?sig'
+
+    def test_wasapi_download_not_found(self):
+        self.testapp.authorization = ('Basic', ('test', 'TestTest456'))
+        res = self.testapp.get('/api/v1/download/test/default-collection/other.warc.gz', status=404)
+        self.testapp.authorization = None
+
+        assert res.json == {'error': 'file_not_found'}
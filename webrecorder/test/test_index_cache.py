@@ -0,0 +1,128 @@
+from .testutils import FullStackTests
+
+from webrecorder.models import Collection
+from webrecorder.models.indexcache import IndexCache
+
+from mock import patch
+
+
+# ============================================================================
+class TestIndexCache(FullStackTests):
+    @classmethod
+    def setup_class(cls):
+        super(TestIndexCache, cls).setup_class(extra_config_file='test_index_cache_config.yaml')
+
+    def get_coll(self):
+        coll, rec = self.get_coll_rec(self.anon_user, 'temp', 'rec')
+        return coll
+
+    def replay(self):
+        res = self.testapp.get('/{user}/temp/mp_/http://httpbin.org/get?food=bar'.format(user=self.anon_user))
+        res.charset = 'utf-8'
+
+        assert '"food": "bar"' in res.text, res.text
+
+    def add_coll_index(self, coll, count):
+        key = Collection.COLL_CDXJ_KEY.format(coll=coll)
+        for i in range(count):
+            self.redis.zadd(key, 0, 'com,example)/{0} 20180102030405 {{}}'.format(i))
+
+        IndexCache(self.redis).update_size(coll)
+
+    def test_record(self):
+        self.set_uuids('Recording', ['rec'])
+        res = self.testapp.get('/_new/temp/rec/record/mp_/http://httpbin.org/get?food=bar')
+        res = res.follow()
+        res.charset = 'utf-8'
+
+        assert '"food": "bar"' in res.text, res.text
+
+    def test_replay_miss(self):
+        self.replay()
+
+        stats = IndexCache(self.redis).get_stats()
+        assert stats['cdxj_misses'] == 1
+        assert stats['cdxj_hits'] == 0
+        assert stats['collections'] == 1
+        assert stats['size'] > 0
+
+        # no fixed expiry
+        assert self.redis.ttl(Collection.COLL_CDXJ_KEY.format(coll=self.get_coll())) == -1
+
+    def test_replay_hit(self):
+        self.replay()
+
+        stats = IndexCache(self.redis).get_stats()
+        assert stats['cdxj_misses'] == 1
+        assert stats['cdxj_hits'] == 1
+
+    def test_evict_lru(self):
+        self.add_coll_index('old', 100)
+        self.add_coll_index('new', 100)
+
+        coll = self.get_coll()
+        sizes = self.redis.hgetall(IndexCache.SIZE_KEY)
+        assert int(sizes['old']) > 100 * IndexCache.ENTRY_OVERHEAD
+
+        # replayed collection most recently used
+        self.replay()
+
+        # room for all but one of the other collections
+        budget = int(sizes[coll]) + int(sizes['new']) + 1
+
+        with patch.object(IndexCache, 'MAX_SIZE', budget):
+            IndexCache(self.redis).update_size(coll)
+
+        assert not self.redis.exists(Collection.COLL_CDXJ_KEY.format(coll='old'))
+        assert self.redis.exists(Collection.COLL_CDXJ_KEY.format(coll='new'))
+        assert self.redis.exists(Collection.COLL_CDXJ_KEY.format(coll=coll))
+
+        stats = IndexCache(self.redis).get_stats()
+        assert stats['evictions'] == 1
+        assert stats['collections'] == 2
+        assert stats['size'] == int(sizes[coll]) + int(sizes['new'])
+
+    def test_evict_not_current(self):
+        coll = self.get_coll()
+
+        with patch.object(IndexCache, 'MAX_SIZE', 1):
+            IndexCache(self.redis).update_size(coll)
+
+        # all others evicted, current collection kept even if over budget
+        assert not self.redis.exists(Collection.COLL_CDXJ_KEY.format(coll='new'))
+        assert self.redis.exists(Collection.COLL_CDXJ_KEY.format(coll=coll))
+
+        assert self.redis.zrange(IndexCache.LRU_KEY, 0, -1) == [coll]
+
+        # reloaded after eviction
+        self.redis.delete(Collection.COLL_CDXJ_KEY.format(coll=coll))
+
+        self.replay()
+
+        stats = IndexCache(self.redis).get_stats()
+        assert stats['evictions'] == 2
+        assert stats['cdxj_misses'] == 2
+
+    def test_update_size_concurrent_reload(self):
+        self.add_coll_index('other', 10)
+
+        cache = IndexCache(self.redis)
+        pipeline_cls = type(self.redis.pipeline())
+        orig_multi = pipeline_cls.multi
+        reloads = []
+
+        # another worker reloads the same collection while the size is updated
+        def multi(pi):
+            if not reloads:
+                reloads.append(1)
+                old_size = int(self.redis.hget(IndexCache.SIZE_KEY, 'other'))
+                self.redis.hset(IndexCache.SIZE_KEY, 'other', old_size + 500)
+                self.redis.hincrby(IndexCache.STATS_KEY, 'size', 500)
+
+            return orig_multi(pi)
+
+        with patch.object(pipeline_cls, 'multi', new=multi):
+            cache.update_size('other')
+
+        sizes = self.redis.hgetall(IndexCache.SIZE_KEY)
+        assert cache.get_stats()['size'] == sum(int(size) for size in sizes.values())
@@ -0,0 +1,43 @@
+from webrecorder.utils import iter_json
+
+import json
+
+
+# ============================================================================
+class TestIterJSON(object):
+    def test_plain_value(self):
+        value = {'a': [1, 2, {'b': 'Описание'}], 'c': None}
+        assert list(iter_json(value)) == [json.dumps(value)]
+
+    def test_iterators(self):
+        consumed = []
+
+        def gen(name, count):
+            for i in range(count):
+                consumed.append(name)
+                yield {'id': i}
+
+        value = {'title': 'Example',
+                 'pages': gen('pages', 3),
+                 'recordings': [{'id': 'rec', 'pages': gen('rec', 2)}],
+                 'lists': gen('lists', 0)}
+
+        chunks = iter_json(value)
+
+        # first chunk sent before any iterator is consumed
+        assert next(chunks) == '{"title":"Example","pages":'
+        assert consumed == []
+
+        rest = ''.join(chunks)
+        assert consumed == ['pages', 'pages', 'pages', 'rec', 'rec']
+
+        assert json.loads('{"title":"Example","pages":' + rest) == {
+            'title': 'Example',
+            'pages': [{'id': 0}, {'id': 1}, {'id': 2}],
+            'recordings': [{'id': 'rec', 'pages': [{'id': 0}, {'id': 1}]}],
+            'lists': []}
+
+    def test_chunk_size(self):
+        chunks = list(iter_json((str(i) * 10 for i in range(100)), chunk_size=100))
+        assert all(len(chunk) >= 100 for chunk in chunks[1:-1])
+        assert json.loads(''.join(chunks)) == [str(i) * 10 for i in range(100)]
@@ -502,6 +502,28 @@ class TestListsAnonUserAPI(FullStackTests):
 
         assert res.json == {'page_bookmarks': {self.ID_1: {'111': '1003', '101': '1002'}}}
 
+    def test_page_bookmarks_maintained(self):
+        no_rebuild = patch.object(BookmarkList, 'get_bookmarks', side_effect=AssertionError('full rebuild'))
+
+        with no_rebuild:
+            res = self._add_bookmark('1002', title='An Example 3', url='http://example.com/испытание/test',
+                                     page_id=self.ID_1)
+
+            assert res.json['bookmark']['id'] == '112'
+
+            res = self.testapp.get(self._format('/api/v1/collection/temp/page_bookmarks?user={user}&rec=rec'))
+
+            assert res.json == {'page_bookmarks': {self.ID_1: {'111': '1003', '101': '1002', '112': '1002'}}}
+
+            res = self.testapp.delete(self._format('/api/v1/bookmark/112?user={user}&coll=temp&list=1002'))
+
+            res = self.testapp.get(self._format('/api/v1/collection/temp/page_bookmarks?user={user}'))
+
+            assert res.json == {'page_bookmarks': {self.ID_1: {'111': '1003', '101': '1002'}}}
+
+        res = self.testapp.get(self._format('/api/v1/collection/temp?user={user}'))
+        assert '@p_to_b_idx' not in res.json['collection']
+
     def test_coll_info_with_lists(self):
         res = self.testapp.get(self._format('/api/v1/collection/temp?user={user}'))
 
@@ -619,10 +641,10 @@ class TestListsAnonUserAPI(FullStackTests):
     # Stats
     # ========================================================================
     def test_stats(self):
-        assert self.redis.hget(Stats.BOOKMARK_ADD_KEY, today_str()) == '11'
+        assert self.redis.hget(Stats.BOOKMARK_ADD_KEY, today_str()) == '12'
         assert self.redis.hget(Stats.BOOKMARK_MOD_KEY, today_str()) == '1'
 
         # only includes explicit deletions or from list deletion
-        assert self.redis.hget(Stats.BOOKMARK_DEL_KEY, today_str()) == '3'
+        assert self.redis.hget(Stats.BOOKMARK_DEL_KEY, today_str()) == '4'
 
 
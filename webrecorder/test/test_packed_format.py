@@ -0,0 +1,75 @@
+from webrecorder.models.packed import PackedFormat
+
+import json
+
+
+# ============================================================================
+class TestPackedFormat(object):
+    FORMAT = PackedFormat({1: ('url', 'timestamp', 'title', 'browser')})
+
+    def test_pack_known_fields(self):
+        obj = {'url': 'http://example.com/', 'timestamp': '2018', 'title': 'Example', 'browser': '', 'id': 'abc'}
+
+        value = self.FORMAT.pack(obj)
+        assert value == 'http://example.com/\x1f2018\x1fExample\x1f\x1f1'
+
+        obj.pop('id')
+        assert self.FORMAT.unpack(value) == obj
+
+    def test_pack_extra_fields_and_nulls(self):
+        obj = {'url': 'http://example.com/', 'title': 'Example', 'browser': None, 'desc': 'Описание'}
+
+        value = self.FORMAT.pack(obj)
+        assert value == ('http://example.com/\x1f\x1fExample\x1f\x1f1'
+                         '{"browser":null,"desc":"\\u041e\\u043f\\u0438\\u0441\\u0430\\u043d\\u0438\\u0435","":["timestamp"]}')
+
+        assert self.FORMAT.unpack(value) == obj
+
+        # trailing missing fields dropped
+        obj = {'url': 'http://example.com/', 'timestamp': '2018'}
+
+        value = self.FORMAT.pack(obj)
+        assert value == 'http://example.com/\x1f2018\x1f1'
+
+        assert self.FORMAT.unpack(value) == obj
+
+    def test_pack_non_string_and_separator(self):
+        obj = {'url': 'http://example.com/', 'timestamp': 2018, 'title': 'A\x1fB', 'browser': 'chrome:60'}
+
+        value = self.FORMAT.pack(obj)
+        assert value.count('\x1f') == 4
+
+        assert self.FORMAT.unpack(value) == obj
+
+    def test_unpack_legacy(self):
+        obj = {'url': 'http://example.com/', 'timestamp': '2018', 'title': 'A\x1fB', 'id': 'abc'}
+        assert self.FORMAT.unpack(json.dumps(obj)) == obj
+
+        assert not self.FORMAT.is_packed(json.dumps(obj))
+        assert self.FORMAT.is_packed(self.FORMAT.pack(obj))
+
+    def test_unpack_older_version(self):
+        new_format = PackedFormat({1: ('url', 'timestamp', 'title', 'browser'),
+                                   2: ('url', 'title')})
+
+        value = self.FORMAT.pack({'url': 'http://example.com/', 'timestamp': '2018'})
+        assert not new_format.is_packed(value)
+        assert new_format.unpack(value) == {'url': 'http://example.com/', 'timestamp': '2018'}
+
+        assert new_format.pack({'url': 'http://example.com/', 'timestamp': '2018'}) == 'http://example.com/\x1f2{"timestamp":"2018"}'
+
+    def test_unpack_all(self):
+        values = [self.FORMAT.pack({'url': 'http://example.com/a', 'timestamp': '', 'title': '', 'browser': ''}),
+                  None,
+                  json.dumps({'url': 'http://example.com/b'}),
+                  self.FORMAT.pack({})]
+
+        assert self.FORMAT.unpack_all(values) == [{'url': 'http://example.com/a', 'timestamp': '', 'title': '', 'browser': ''},
+                                                  None,
+                                                  {'url': 'http://example.com/b'},
+                                                  {}]
+
+        assert self.FORMAT.pack({}) == '\x1f1{"":["url"]}'
+
+        assert self.FORMAT.unpack_all([None, None]) == [None, None]
+        assert self.FORMAT.unpack_all([]) == []
@@ -1,5 +1,9 @@
 from .testutils import FullStackTests
 
+from webrecorder.models import Recording
+
+from mock import patch
+
 import os
 import gevent
 
@@ -252,3 +256,20 @@ class TestPending(FullStackTests):
         assert int(self.redis.hget('c:{0}:info'.format(coll), 'size')) == TestPending.size
         assert int(self.redis.hget('u:{0}:info'.format(self.anon_user), 'size')) == TestPending.size
 
+
+    def test_record_large_pending_size_coalesced(self):
+        self.set_uuids('Recording', ['rec-c'])
+        url = 'http://httpbin.org/stream-bytes/102400?chunk_size=1024'
+        res = self.testapp.get('/_new/temp/rec-c/record/mp_/' + url)
+
+        # pending size added in a few large increments, not per write
+        with patch.object(Recording, 'inc_pending_size', autospec=True,
+                          side_effect=Recording.inc_pending_size) as inc_pending_size:
+            res = res.follow()
+
+        assert len(res.body) == 102400
+        assert 0 < inc_pending_size.call_count < 5
+
+        # pending size and count should be 0
+        assert self.get_pending_count('rec-c') == 0
+        assert self.get_pending_size('rec-c') == 0
@@ -0,0 +1,139 @@
+from .testutils import FullStackTests
+
+from webrecorder.models import User, Recording
+from webrecorder.models.base import BaseAccess
+from webrecorder.rec.webrecrecorder import SkipCheckingMultiFileWARCWriter
+
+
+# ============================================================================
+class TestRecordCheckCache(FullStackTests):
+    @classmethod
+    def setup_class(cls):
+        super(TestRecordCheckCache, cls).setup_class(extra_config_file='test_record_check_cache_config.yaml')
+
+        cls.user_key = 'u:{user}:info'.format(user=cls.anon_user)
+
+    @property
+    def check_cache(self):
+        return self.runner.rec_serv.server.application.wr.writer.check_cache
+
+    @property
+    def rec_redis(self):
+        # fakeredis only delivers messages published on the same instance
+        return self.runner.rec_serv.server.application.wr.redis
+
+    def get_cdx_len(self):
+        coll, rec = self.get_coll_rec(self.anon_user, 'temp', 'rec')
+        return len(self.redis.zrange('r:{rec}:cdxj'.format(rec=rec), 0, -1))
+
+    def record(self, query):
+        res = self.testapp.get('/{user}/temp/rec/record/mp_/http://httpbin.org/get?{query}'.format(user=self.anon_user, query=query))
+        res.charset = 'utf-8'
+
+        assert query.replace('=', '": "') in res.text, res.text
+
+    def wait_invalidated(self, key):
+        def assert_invalidated():
+            assert key not in self.check_cache
+
+        self.sleep_try(0.1, 2.0, assert_invalidated)
+
+    def test_record_1(self):
+        self.set_uuids('Recording', ['rec'])
+        res = self.testapp.get('/_new/temp/rec/record/mp_/http://httpbin.org/get?food=bar')
+        res = res.follow()
+        res.charset = 'utf-8'
+
+        assert '"food": "bar"' in res.text, res.text
+
+        assert self.get_cdx_len() == 1
+
+        coll, rec = self.get_coll_rec(self.anon_user, 'temp', 'rec')
+        assert self.check_cache['r:{rec}:open'.format(rec=rec)][1] == True
+        assert 0 < self.check_cache[self.user_key][1] < 1000000
+
+    def test_record_within_lease(self):
+        # user size not re-checked while the leased space lasts
+        curr_size = int(self.redis.hget(self.user_key, 'size'))
+        self.redis.hset(self.user_key, 'max_size', curr_size + 10)
+
+        self.record('bood=far')
+
+        assert self.get_cdx_len() == 2
+
+    def test_dont_record_max_size_changed(self):
+        curr_size = int(self.redis.hget(self.user_key, 'size'))
+        self.redis.hset(self.user_key, 'max_size', curr_size + 10)
+
+        self.rec_redis.publish('rec_check_changed', self.user_key)
+        self.wait_invalidated(self.user_key)
+
+        self.record('bood=far2')
+
+        assert self.get_cdx_len() == 2
+
+    def test_skip_url_invalidated(self):
+        self.redis.hset(self.user_key, 'max_size', 1000000000)
+        self.rec_redis.publish('rec_check_changed', self.user_key)
+        self.wait_invalidated(self.user_key)
+
+        url = 'http://httpbin.org/get?skip=1'
+        skip_key = 'us:{user}:s:{url}'.format(user=self.anon_user, url=url)
+
+        self.record('skip=1')
+        assert self.check_cache[skip_key][1] == False
+
+        user = User(my_id=self.anon_user, redis=self.rec_redis, access=BaseAccess())
+        user.mark_skip_url(url)
+
+        self.wait_invalidated(skip_key)
+
+        self.record('skip=1')
+        assert self.check_cache[skip_key][1] == True
+
+        assert self.get_cdx_len() == 4
+
+    def test_dont_record_closed(self):
+        coll, rec = self.get_coll_rec(self.anon_user, 'temp', 'rec')
+        Recording(my_id=rec, redis=self.rec_redis, access=BaseAccess()).set_closed()
+
+        self.wait_invalidated('r:{rec}:open'.format(rec=rec))
+
+    def get_writer(self):
+        wr = self.runner.rec_serv.server.application.wr
+        return SkipCheckingMultiFileWARCWriter(dir_template=self.warcs_dir,
+                                               redis=self.redis,
+                                               key_template=wr.info_keys['rec'],
+                                               config=wr.config)
+
+    def test_reserve_two_writers(self):
+        user_key = 'u:reserve-user:info'
+        params = {'param.user': 'reserve-user'}
+
+        self.redis.hmset(user_key, {'size': 0, 'max_size': 1500000})
+
+        writer_1 = self.get_writer()
+        writer_2 = self.get_writer()
+
+        # first writer reserves a full lease, second only the rest
+        assert writer_1._reserve_size(params, 100)
+        assert writer_2._reserve_size(params, 100)
+
+        reserved = self.redis.hgetall('u:reserve-user:qr')
+        assert int(reserved[writer_1.writer_id].split(':')[0]) == 1000000
+        assert int(reserved[writer_2.writer_id].split(':')[0]) == 500000
+
+        # remaining space is leased, can't exceed max size
+        assert writer_2._reserve_size(params, 499900)
+
+        # written responses added to user size once indexed
+        self.redis.hincrby(user_key, 'size', 100 + 100 + 499900)
+
+        assert not writer_2._reserve_size(params, 100)
+
+        # unused part released on invalidation, can be reserved by other writer
+        writer_1.invalidate_check(user_key)
+        assert writer_1.writer_id not in self.redis.hgetall('u:reserve-user:qr')
+
+        assert writer_2._reserve_size(params, 100)
+        assert not writer_1._reserve_size(params, 1000000)
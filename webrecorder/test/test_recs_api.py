@@ -1,9 +1,13 @@
 from datetime import datetime
+import json
 import os
 
 from .testutils import FullStackTests
 
+from webrecorder.models import Collection
+
 from itertools import count
+from mock import patch
 
 
 # ============================================================================
@@ -148,6 +152,40 @@ class TestWebRecRecAPI(FullStackTests):
         assert {'id': self.ID_1, 'rec': 'rec-a', 'title': 'Example', 'url': 'http://example.com/', 'timestamp': '2016010203000000'} in res.json['pages']
         assert {'id': self.ID_2, 'rec': 'rec-a', 'title': 'Example', 'url': 'http://example.com/foo/bar', 'timestamp': '2015010203000000'} in res.json['pages']
 
+    def test_page_list_paginated(self):
+        res = self._anon_get('/api/v1/recording/{rec_id_0}/pages?user={user}&coll=temp&limit=2')
+
+        # ordered by timestamp, then page id
+        assert [page['id'] for page in res.json['pages']] == [self.ID_2, self.ID_1]
+        assert res.json['cursor']
+
+        res = self.testapp.get('/api/v1/recording/{rec}/pages'.format(rec=self.rec_ids[0]),
+                               params={'user': self.anon_user, 'coll': 'temp', 'limit': 2,
+                                       'cursor': res.json['cursor']})
+
+        assert [page['id'] for page in res.json['pages']] == [self.ID_3]
+        assert res.json['cursor'] == None
+
+    def test_page_list_invalid_limit(self):
+        res = self._anon_get('/api/v1/recording/{rec_id_0}/pages?user={user}&coll=temp&limit=x', status=400)
+        assert res.json == {'error': 'invalid_limit'}
+
+    def test_num_pages(self):
+        res = self._anon_get('/api/v1/recording/{rec_id_0}/num_pages?user={user}&coll=temp')
+        assert res.json == {'count': 3}
+
+    def test_rec_pages_index_built_for_existing(self):
+        coll, rec = self.get_coll_rec(self.anon_user, 'temp', self.rec_ids[0])
+
+        # pages added before recording page index
+        self.redis.delete('c:{coll}:rp:{rec}'.format(coll=coll, rec=rec))
+        self.redis.hdel('c:{coll}:info'.format(coll=coll), '@rec_pages_idx')
+
+        res = self._anon_get('/api/v1/recording/{rec_id_0}/pages?user={user}&coll=temp')
+        assert len(res.json['pages']) == 3
+
+        assert self.redis.zcard('c:{coll}:rp:{rec}'.format(coll=coll, rec=rec)) == 3
+
     def test_coll_page_list(self):
         res = self._anon_get('/api/v1/collection/temp?user={user}')
 
@@ -155,6 +193,41 @@ class TestWebRecRecAPI(FullStackTests):
         assert {'id': self.ID_1, 'rec': 'rec-a', 'title': 'Example', 'url': 'http://example.com/', 'timestamp': '2016010203000000'} in res.json['collection']['pages']
         assert {'id': self.ID_2, 'rec': 'rec-a', 'title': 'Example', 'url': 'http://example.com/foo/bar', 'timestamp': '2015010203000000'} in res.json['collection']['pages']
 
+    def test_coll_page_list_batched(self):
+        with patch.object(Collection, 'PAGES_BATCH_SIZE', 2):
+            res = self._anon_get('/api/v1/collection/temp?user={user}')
+
+        assert res.content_type == 'application/json'
+        assert sorted(page['id'] for page in res.json['collection']['pages']) == sorted([self.ID_1, self.ID_2, self.ID_3])
+        assert '@rec_pages_idx' not in res.json['collection']
+
+    def test_pages_packed_and_legacy(self):
+        coll, rec = self.get_coll_rec(self.anon_user, 'temp', self.rec_ids[0])
+        pages_key = 'c:{coll}:p'.format(coll=coll)
+
+        assert self.redis.hget(pages_key, self.ID_1) == 'http://example.com/\x1f2016010203000000\x1fExample\x1frec-a\x1f1'
+
+        res = self._anon_get('/api/v1/recording/{rec_id_0}/pages?user={user}&coll=temp')
+        pages = res.json['pages']
+
+        # stored as plain json, before packing
+        self.redis.hset(pages_key, self.ID_1, json.dumps({'url': 'http://example.com/',
+                                                          'timestamp': '2016010203000000',
+                                                          'title': 'Example',
+                                                          'rec': 'rec-a',
+                                                          'id': self.ID_1}))
+
+        res = self._anon_get('/api/v1/recording/{rec_id_0}/pages?user={user}&coll=temp')
+        assert res.json['pages'] == pages
+
+        assert Collection.PAGE_FORMAT.repack_hash(self.redis, pages_key) == 1
+        assert Collection.PAGE_FORMAT.repack_hash(self.redis, pages_key) == 0
+
+        assert self.redis.hget(pages_key, self.ID_1) == 'http://example.com/\x1f2016010203000000\x1fExample\x1frec-a\x1f1'
+
+        res = self._anon_get('/api/v1/recording/{rec_id_0}/pages?user={user}&coll=temp')
+        assert res.json['pages'] == pages
+
     def _test_page_delete(self):
         params = {'url': 'http://example.com/foo/bar', 'timestamp': '2015010203000000'}
         res = self._anon_delete('/api/v1/recording/{rec_id_0}/pages?user={user}&coll=temp', params=params)
@@ -203,4 +276,7 @@ class TestWebRecRecAPI(FullStackTests):
 
         assert len(res.json['collection']['pages']) == 0
 
+        coll, rec = self.get_coll_rec(self.anon_user, 'temp', None)
+        assert not self.redis.exists('c:{coll}:rp:rec-a'.format(coll=coll))
+
 
@@ -773,7 +773,10 @@ class TestRegisterMigrate(FullStackTests):
             Stats.REPLAY_USER_KEY,
             Stats.DOWNLOADS_USER_COUNT_KEY,
             Stats.DOWNLOADS_USER_SIZE_KEY,
-            Stats.DELETE_USER_KEY
+            Stats.DELETE_USER_KEY,
+            Stats.COMMIT_COUNT_KEY,
+            Stats.COMMIT_SIZE_KEY,
+            Stats.COMMIT_STATUS_KEY
         }
 
     def test_login_4_no_such_user(self):
@@ -0,0 +1,155 @@
+import os
+import hashlib
+import tempfile
+
+from fakeredis import FakeStrictRedis
+
+from webrecorder.rec.storage.s3 import S3Storage
+
+
+# ============================================================================
+class FakeS3(object):
+    """ In-memory stand-in for the S3 client API used by S3Storage
+    """
+    def __init__(self):
+        self.objects = {}
+        self.uploads = {}
+        self.part_calls = []
+        self.fail_parts = {}
+        self.kms = False
+
+    def _etag(self, data):
+        # with SSE-KMS, ETag is not the MD5 of the data
+        if self.kms:
+            return '"' + hashlib.md5(b'kms' + data).hexdigest() + '"'
+
+        return '"' + hashlib.md5(data).hexdigest() + '"'
+
+    def _response(self, data):
+        res = {'ETag': self._etag(data)}
+        if self.kms:
+            res['ServerSideEncryption'] = 'aws:kms'
+        return res
+
+    def put_object(self, Bucket, Key, Body, ContentMD5):
+        self.objects[Key] = Body
+        return self._response(Body)
+
+    def create_multipart_upload(self, Bucket, Key):
+        upload_id = 'upload-' + str(len(self.uploads))
+        self.uploads[upload_id] = {}
+        return {'UploadId': upload_id}
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body, ContentMD5):
+        self.part_calls.append(PartNumber)
+        if self.fail_parts.get(PartNumber):
+            self.fail_parts[PartNumber] -= 1
+            raise Exception('Part Failed')
+
+        self.uploads[UploadId][PartNumber] = Body
+        return self._response(Body)
+
+    def list_parts(self, Bucket, Key, UploadId):
+        parts = self.uploads[UploadId]
+        return {'Parts': [{'PartNumber': num, 'ETag': self._etag(data)}
+                          for num, data in sorted(parts.items())]}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+        parts = self.uploads.pop(UploadId)
+        nums = [part['PartNumber'] for part in MultipartUpload['Parts']]
+        self.objects[Key] = b''.join(parts[num] for num in nums)
+
+        # multipart ETag computed from the part ETags as sent
+        for part in MultipartUpload['Parts']:
+            assert part['ETag'] == self._etag(parts[part['PartNumber']])
+
+        digests = b''.join(bytes.fromhex(part['ETag'].strip('"')) for part in MultipartUpload['Parts'])
+        return {'ETag': '"' + hashlib.md5(digests).hexdigest() + '-' + str(len(nums)) + '"'}
+
+    def head_object(self, Bucket, Key):
+        raise AssertionError('HEAD not expected')
+
+
+# ============================================================================
+class TestS3Upload(object):
+    @classmethod
+    def setup_class(cls):
+        os.environ['S3_ROOT'] = 's3://test-bucket/storage/'
+
+        cls.redis = FakeStrictRedis(decode_responses=True)
+        cls.redis.flushdb()
+
+        cls.storage = S3Storage(cls.redis)
+        cls.storage.s3 = FakeS3()
+
+        cls.storage.MULTIPART_THRESHOLD = 100
+        cls.storage.PART_SIZE = 40
+
+        cls.data = os.urandom(230)
+
+        with tempfile.NamedTemporaryFile(suffix='.warc.gz', delete=False) as fh:
+            fh.write(cls.data)
+            cls.filename = fh.name
+
+    @classmethod
+    def teardown_class(cls):
+        os.remove(cls.filename)
+        del os.environ['S3_ROOT']
+
+    def test_put_object(self):
+        self.storage.MULTIPART_THRESHOLD = 1000
+        assert self.storage.do_upload('small.warc.gz', self.filename)
+        self.storage.MULTIPART_THRESHOLD = 100
+
+        assert self.storage.s3.objects['small.warc.gz'] == self.data
+
+        kind, etag, size = self.storage.get_checksum_and_size('s3://test-bucket/small.warc.gz')
+        assert kind == 'md5'
+        assert etag == hashlib.md5(self.data).hexdigest()
+        assert size == 230
+
+    def test_multipart_retry_failed_parts(self):
+        s3 = self.storage.s3
+
+        # part 3 fails on every attempt
+        s3.fail_parts[3] = self.storage.PART_RETRIES
+
+        assert self.storage.do_upload('large.warc.gz', self.filename) == False
+
+        assert sorted(s3.part_calls) == [1, 2, 3, 3, 3, 4, 5, 6]
+        assert 'large.warc.gz' not in s3.objects
+        assert self.redis.get('s3:mp:large.warc.gz')
+
+        # only the failed part is uploaded again
+        s3.part_calls = []
+        assert self.storage.do_upload('large.warc.gz', self.filename)
+
+        assert s3.part_calls == [3]
+        assert s3.objects['large.warc.gz'] == self.data
+        assert not self.redis.exists('s3:mp:large.warc.gz')
+
+        kind, etag, size = self.storage.get_checksum_and_size('s3://test-bucket/large.warc.gz')
+        assert kind == 's3etag'
+        assert etag.endswith('-6')
+        assert size == 230
+
+    def test_kms_encrypted(self):
+        s3 = self.storage.s3
+        s3.kms = True
+
+        try:
+            self.storage.MULTIPART_THRESHOLD = 1000
+            assert self.storage.do_upload('kms-small.warc.gz', self.filename)
+            self.storage.MULTIPART_THRESHOLD = 100
+
+            assert s3.objects['kms-small.warc.gz'] == self.data
+
+            # parts not retried, although ETags are not MD5 checksums
+            s3.part_calls = []
+            assert self.storage.do_upload('kms-large.warc.gz', self.filename)
+
+            assert sorted(s3.part_calls) == [1, 2, 3, 4, 5, 6]
+            assert s3.objects['kms-large.warc.gz'] == self.data
+        finally:
+            s3.kms = False
+            self.storage.MULTIPART_THRESHOLD = 100
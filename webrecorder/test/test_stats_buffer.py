@@ -0,0 +1,101 @@
+from .testutils import FullStackTests
+
+from webrecorder.models.stats import Stats, StatsBuffer
+from webrecorder.utils import today_str
+
+from mock import patch
+
+
+# ============================================================================
+class TestStatsBuffer(FullStackTests):
+    @classmethod
+    def setup_class(cls):
+        super(TestStatsBuffer, cls).setup_class()
+
+        cls.flush_mock = patch('webrecorder.models.stats.StatsBuffer.FLUSH_SECS', 0.5)
+        cls.flush_mock.start()
+
+    @classmethod
+    def teardown_class(cls):
+        cls.flush_mock.stop()
+        StatsBuffer.buffers.clear()
+
+        super(TestStatsBuffer, cls).teardown_class()
+
+    def test_record(self):
+        res = self.testapp.get('/_new/temp/rec/record/mp_/http://httpbin.org/get?food=bar')
+        res = self.testapp.get(res.headers['Location'])
+        res.charset = 'utf-8'
+
+        assert '"food": "bar"' in res.text, res.text
+
+        def assert_capture_stats():
+            assert int(self.redis.hget(Stats.ALL_CAPTURE_TEMP_KEY, today_str())) > 0
+
+        self.sleep_try(0.1, 5.0, assert_capture_stats)
+
+    def test_replay_stats_buffered(self):
+        res = self.testapp.get('/{user}/temp/mp_/http://httpbin.org/get?food=bar'.format(user=self.anon_user))
+        res.charset = 'utf-8'
+
+        assert '"food": "bar"' in res.text, res.text
+
+        # not yet written
+        assert self.redis.hget(Stats.REPLAY_TEMP_KEY, today_str()) is None
+
+        def assert_replay_stats():
+            assert int(self.redis.hget(Stats.REPLAY_TEMP_KEY, today_str())) > 0
+
+        self.sleep_try(0.1, 2.0, assert_replay_stats)
+
+    def test_buffer_delete(self):
+        buff = StatsBuffer(self.redis)
+
+        with buff as pi:
+            pi.hincrby('st:test', 'a', 2)
+            pi.expire('st:test', 60)
+
+        # pending counters dropped, stored counters deleted on flush
+        self.redis.hset('st:test', 'c', 1)
+
+        with buff as pi:
+            pi.delete('st:test')
+            pi.hincrby('st:test', 'b', 1)
+
+        assert self.redis.hgetall('st:test') == {'c': '1'}
+
+        buff.flush()
+
+        assert self.redis.hgetall('st:test') == {'b': '1'}
+        assert self.redis.ttl('st:test') > 0
+
+    def test_buffer_max_events(self):
+        buff = StatsBuffer(self.redis)
+
+        with patch.object(StatsBuffer, 'MAX_EVENTS', 3):
+            for i in range(3):
+                with buff as pi:
+                    pi.incrby('st:test-count', 1)
+                    pi.sadd('st:test-set', str(i))
+
+        assert self.redis.get('st:test-count') == '3'
+        assert self.redis.smembers('st:test-set') == {'0', '1', '2'}
+        assert buff.num_events == 0
+
+    def test_rate_limit_not_buffered(self):
+        params = {'param.user': 'test', 'param.ip': '127.0.0.2'}
+
+        with patch.object(Stats, 'RATE_LIMIT_TTL', 3600):
+            stats = Stats(self.redis)
+            rate_limit_key = stats.get_rate_limit_key(params)
+
+            stats.incr_record(params, 100)
+
+        # rate limit counter written directly, usage stats buffered
+        assert self.redis.get(rate_limit_key) == '100'
+        assert self.redis.ttl(rate_limit_key) > 0
+        assert self.redis.hget(Stats.ALL_CAPTURE_USER_KEY, today_str()) is None
+
+        StatsBuffer.buffers[self.redis].flush()
+
+        assert self.redis.hget(Stats.ALL_CAPTURE_USER_KEY, today_str()) == '100'
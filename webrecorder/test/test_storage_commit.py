@@ -1,13 +1,19 @@
 from .testutils import FullStackTests
+from webrecorder.models import Collection
+from webrecorder.models.base import BaseAccess
 from webrecorder.models.usermanager import CLIUserManager
 from webrecorder.utils import today_str
 
 import os
+import shutil
 import boto3
 import pytest
 import base64
+import hashlib
 import requests
 
+from mock import patch
+
 from urllib.parse import urlsplit
 from itertools import count
 
@@ -103,6 +109,21 @@ class BaseStorageCommit(FullStackTests):
         for key in result:
             self.assert_warc_key(result[key])
 
+    def test_commit_status(self):
+        def assert_committed():
+            status = self.redis.hgetall('st:commit-status')
+            assert status['queue'] == '0'
+            assert int(status['bytes']) > 0
+            assert int(status['workers']) > 0
+
+        self.sleep_try(0.5, 10.0, assert_committed)
+
+        assert int(self.redis.hget('st:commit-count', today_str())) >= 2
+        assert int(self.redis.hget('st:commit-size', today_str())) > 0
+
+        # no unfinished uploads remaining
+        assert list(self.redis.scan_iter('w:*:up')) == []
+
     def test_replay_1(self):
         def assert_replay():
             res = self.testapp.get('/test/default-collection/mp_/http://httpbin.org/get?food=bar')
@@ -137,6 +158,39 @@ class BaseStorageCommit(FullStackTests):
 
         self.assert_wasapi_locations(res.json['files'][0], verify_only=False)
 
+    def test_wasapi_checksum_catalog(self):
+        assert self.redis.hlen('c:{0}:wsum'.format(COLL_ID)) == 1
+
+        # checksums listed from catalog, not recomputed from storage
+        with patch('webrecorder.rec.storage.local.LocalFileStorage.get_checksum_and_size', side_effect=AssertionError), \
+             patch('webrecorder.rec.storage.s3.S3Storage.get_checksum_and_size', side_effect=AssertionError):
+            res = self.testapp.get('/api/v1/download/webdata', params={'user': 'test'})
+
+        assert len(res.json['files']) == 1
+        assert res.json['files'][0]['checksums']
+
+    def test_wasapi_list_paged(self):
+        params = {'user': 'test', 'page_size': 1}
+        res = self.testapp.get('/api/v1/download/webdata', params=params)
+
+        assert res.json['count'] == 1
+        assert len(res.json['files']) == 1
+        assert res.json['next'] is None
+        assert res.json['previous'] is None
+
+        params['page'] = 2
+        res = self.testapp.get('/api/v1/download/webdata', params=params)
+
+        assert res.json['count'] == 1
+        assert res.json['files'] == []
+        assert res.json['include-extra'] == False
+        assert 'page=1' in res.json['previous']
+        assert 'page_size=1' in res.json['previous']
+
+        params['page'] = 'x'
+        res = self.testapp.get('/api/v1/download/webdata', params=params, status=400)
+        assert res.json['error'] == 'invalid_page'
+
     def test_create_new_coll(self):
         # Collection
         params = {'title': 'Another Coll'}
@@ -210,6 +264,53 @@ class TestLocalStorageCommit(BaseStorageCommit):
 
         return check
 
+    def test_resume_uploaded_file(self):
+        collection = Collection(my_id='999', redis=self.redis, access=BaseAccess())
+        collection.set_prop('created_at', collection._get_now())
+
+        filename = 'resume.cdxj'
+        full_filename = os.path.join(self.warcs_dir, filename)
+        with open(full_filename, 'wt') as fh:
+            fh.write('com,example)/ 20180101000000 {}\n')
+
+        # uploaded before committer restart, but not finalized
+        storage = collection.get_storage()
+        target_url = storage.get_target_url(collection, 'indexes', filename)
+        os.makedirs(os.path.dirname(target_url))
+        shutil.copyfile(full_filename, target_url)
+
+        self.redis.hmset('w:{0}:up'.format(full_filename), {'target': target_url,
+                                                            'size': os.path.getsize(full_filename)})
+
+        with patch.object(storage, 'upload_file', side_effect=AssertionError):
+            assert collection.commit_file(filename, full_filename, 'indexes', direct_delete=True)
+
+        assert not os.path.isfile(full_filename)
+        assert not self.redis.exists('w:{0}:up'.format(full_filename))
+
+        shutil.rmtree(os.path.join(self.storage_dir, collection.get_dir_path()))
+
+    def test_checksum_computed_on_upload(self):
+        collection = Collection(my_id='998', redis=self.redis, access=BaseAccess())
+        collection.set_prop('created_at', collection._get_now())
+
+        filename = 'checksum.warc.gz'
+        full_filename = os.path.join(self.warcs_dir, filename)
+        with open(full_filename, 'wb') as fh:
+            fh.write(b'WARC/1.0\r\n' * 1000)
+
+        expected = hashlib.md5(b'WARC/1.0\r\n' * 1000).hexdigest()
+
+        # committed file not read again for checksum
+        with patch('webrecorder.rec.storage.local.LocalFileStorage.get_checksum_and_size', side_effect=AssertionError):
+            assert collection.commit_file(filename, full_filename, 'warcs', direct_delete=True)
+
+        assert collection.get_warc_checksums([filename]) == [{'kind': 'md5',
+                                                              'checksum': expected,
+                                                              'size': 10000}]
+
+        shutil.rmtree(os.path.join(self.storage_dir, collection.get_dir_path()))
+
     def assert_deleted(self):
         storage_dir = os.path.join(self.storage_dir, today_str())
 
@@ -231,6 +332,7 @@ class TestLocalStorageCommit(BaseStorageCommit):
 
         downloaded = self.testapp.get(locations[0])
         assert len(downloaded.body) == int(downloaded.headers['Content-Length'])
+        assert 'Transfer-Encoding' not in downloaded.headers
         result = self.redis.hgetall('c:{coll}:warc'.format(coll=COLL_ID))
         assert downloaded.headers['Content-Disposition'].startswith("attachment; filename*=UTF-8''" + list(result.keys())[0])
 
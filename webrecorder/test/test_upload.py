@@ -21,6 +21,8 @@ from warcio import ArchiveIterator
 from webrecorder.standalone.webrecorder_player import webrecorder_player
 
 from webrecorder.standalone.serializefakeredis import FakeRedisSerializer, DATABASES
+from webrecorder.models.importer import IndexWorkerImporter
+from concurrent.futures.process import BrokenProcessPool
 
 from mock import patch
 
@@ -325,7 +327,7 @@ class TestUpload(FullStackTests):
         assert res.json['coll_title'] == 'Temporary Collection'
         assert res.json['filename'] == 'example2.warc.gz'
         assert res.json['files'] == 1
-        assert res.json['total_size'] == 6490
+        assert res.json['total_size'] == 5192
         assert res.json['done'] == False
 
         def assert_finished():
@@ -506,7 +508,7 @@ class TestPlayerUpload(BaseWRTests):
             return None
 
     @contextmanager
-    def run_player(self, filename, cache_dir=None):
+    def run_player(self, filename, cache_dir=None, extra_args=None):
         player = None
         env_backup = dict(os.environ)
         try:
@@ -517,6 +519,9 @@ class TestPlayerUpload(BaseWRTests):
                 cmd.append('--cache-dir')
                 cmd.append(cache_dir)
 
+            if extra_args:
+                cmd.extend(extra_args)
+
             player = webrecorder_player(cmd, embed=True)
             port = player.app_serv.port
 
@@ -655,3 +660,73 @@ class TestPlayerUpload(BaseWRTests):
         if cache_dir:
             assert os.path.isfile(os.path.join(self.warcs_dir, 'example.com.har.warc'))
 
+    def test_player_upload_index_processes(self):
+        player_filename = os.path.join(self.get_curr_dir(), 'warcs', 'example.com.gz.warc')
+        extra_args = [os.path.join(self.get_curr_dir(), 'warcs', 'temp-example.warc'),
+                      os.path.join(self.get_curr_dir(), 'warcs', 'example.com.har'),
+                      '--index-processes', '2']
+
+        with self.run_player(player_filename, extra_args=extra_args) as port:
+            self.sleep_try(0.5, 10.0, self.assert_finished(port))
+
+            res = requests.get('http://localhost:{0}/_upload/@INIT?user=local'.format(port))
+            assert res.json()['total_files'] == 3
+            assert res.json()['files'] == 0
+
+            res = requests.get('http://localhost:{0}/api/v1/collection/collection?user=local'.format(port))
+            data = res.json()
+
+            res = requests.get('http://localhost:{0}/local/collection/mp_/http://example.com/'.format(port))
+            assert 'Example Domain' in res.text, res.text
+
+        collection = data['collection']
+        assert collection['title'] == 'Web Archive Collection'
+
+        # pages imported in order of files
+        assert [page['url'] for page in collection['pages']] == ['http://example.com/',
+                                                                 'http://example.com/',
+                                                                 'https://example.com/']
+
+        assert len(collection['lists']) == 1
+        assert collection['lists'][0]['slug'] == 'pages-detected'
+        assert len(collection['lists'][0]['bookmarks']) == 1
+
+    def test_player_upload_index_processes_broken(self):
+        player_filename = os.path.join(self.get_curr_dir(), 'warcs', 'example.com.gz.warc')
+        extra_args = [os.path.join(self.get_curr_dir(), 'warcs', 'temp-example.warc'),
+                      '--index-processes', '2']
+
+        def broken_map(func, args):
+            raise BrokenProcessPool('worker died')
+            yield
+
+        # all files parsed in player process instead
+        with patch('webrecorder.models.importer.ProcessPoolExecutor.map', side_effect=broken_map):
+            with self.run_player(player_filename, extra_args=extra_args) as port:
+                self.sleep_try(0.5, 10.0, self.assert_finished(port))
+
+                res = requests.get('http://localhost:{0}/_upload/@INIT?user=local'.format(port))
+                assert res.json()['total_files'] == 2
+                assert res.json()['files'] == 0
+
+                res = requests.get('http://localhost:{0}/local/collection/mp_/http://example.com/'.format(port))
+                assert 'Example Domain' in res.text, res.text
+
+    def test_index_worker_removes_temp_files(self):
+        class CDXJWriter(object):
+            pass
+
+        worker = IndexWorkerImporter(CDXJWriter, 10)
+        created = []
+
+        def parse_uploaded(stream, size, filename):
+            created.append(worker._cdxj_temp_file())
+            raise Exception('parse failed')
+
+        filename = os.path.join(self.get_curr_dir(), 'warcs', 'temp-example.warc')
+
+        with patch.object(worker, 'parse_uploaded', side_effect=parse_uploaded):
+            assert worker.parse_file(filename, 'temp-example.warc') is None
+
+        assert len(created) == 1
+        assert not os.path.isfile(created[0].name)
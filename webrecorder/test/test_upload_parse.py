@@ -0,0 +1,103 @@
+from webrecorder.models.importer import IndexWorkerImporter
+from webrecorder.rec.webrecrecorder import CDXJIndexer
+
+from warcio.warcwriter import WARCWriter
+from warcio.statusandheaders import StatusAndHeaders
+
+from io import BytesIO
+import os
+
+
+# ============================================================================
+class TestUploadParse(object):
+    PAGES = ['http://example.com/zzz', 'http://example.com/aaa', 'http://example.com/mmm']
+
+    def write_response(self, writer, url, mime, body):
+        headers = StatusAndHeaders('200 OK', [('Content-Type', mime)], protocol='HTTP/1.1')
+        record = writer.create_warc_record(url, 'response',
+                                           payload=BytesIO(body),
+                                           http_headers=headers)
+        writer.write_record(record)
+        return record
+
+    def write_post(self, writer, url, data):
+        response = self.write_response(writer, url, 'application/json', b'{"ok": true}')
+
+        headers = StatusAndHeaders('POST /form HTTP/1.1',
+                                   [('Host', 'example.com'),
+                                    ('Content-Type', 'application/x-www-form-urlencoded'),
+                                    ('Content-Length', str(len(data)))],
+                                   is_http_request=True)
+
+        request = writer.create_warc_record(url, 'request',
+                                            payload=BytesIO(data),
+                                            http_headers=headers)
+
+        request.rec_headers.add_header('WARC-Concurrent-To',
+                                       response.rec_headers.get_header('WARC-Record-ID'))
+        writer.write_record(request)
+
+    def write_warc(self, tmpdir):
+        filename = str(tmpdir.join('upload.warc.gz'))
+
+        with open(filename, 'wb') as fh:
+            writer = WARCWriter(fh, gzip=True)
+
+            self.write_post(writer, 'http://example.com/form', b'foo=bar')
+
+            for url in self.PAGES:
+                self.write_response(writer, url, 'text/html', b'<html>' + url.encode('utf-8') + b'</html>')
+
+            self.write_response(writer, 'http://example.com/image.png', 'image/png', b'PNG')
+
+        return filename
+
+    def parse(self, filename, max_detect_pages):
+        worker = IndexWorkerImporter(CDXJIndexer, max_detect_pages)
+        infos = worker.parse_file(filename, os.path.basename(filename))
+        assert infos is not None
+        assert len(infos) == 1
+        return infos[0]
+
+    def read_cdxj(self, info):
+        try:
+            with open(info['cdxj'], 'rt') as fh:
+                return fh.read().rstrip().split('\n')
+        finally:
+            os.remove(info['cdxj'])
+
+    def test_request_response_joined(self, tmpdir):
+        info = self.parse(self.write_warc(tmpdir), 0)
+
+        lines = self.read_cdxj(info)
+
+        # one line per response, the request is merged into its response
+        assert len(lines) == 5
+
+        post_lines = [line for line in lines if line.startswith('com,example)/form')]
+        assert len(post_lines) == 1
+        assert '__wb_method=post' in post_lines[0]
+        assert 'foo=bar' in post_lines[0]
+
+    def test_detected_pages_warc_order(self, tmpdir):
+        info = self.parse(self.write_warc(tmpdir), 0)
+        self.read_cdxj(info)
+
+        # pages are detected while reading, in WARC order, not in urlkey order
+        assert [page['url'] for page in info['detected_pages']] == self.PAGES
+
+        for page in info['detected_pages']:
+            assert page['title'] == page['url']
+            assert page['timestamp']
+
+    def test_max_detect_pages(self, tmpdir):
+        info = self.parse(self.write_warc(tmpdir), 1)
+        self.read_cdxj(info)
+
+        # as with the previous index scan, detection stops once the limit is exceeded
+        assert [page['url'] for page in info['detected_pages']] == self.PAGES[:2]
+
+        info = self.parse(self.write_warc(tmpdir), 2)
+        self.read_cdxj(info)
+
+        assert [page['url'] for page in info['detected_pages']] == self.PAGES
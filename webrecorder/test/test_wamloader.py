@@ -0,0 +1,73 @@
+from webrecorder.load.wamloader import WAMLoader
+
+from .bench_wamloader import find_archive_linear, make_urls, write_webarchives
+
+import pytest
+import yaml
+
+
+# ============================================================================
+WEBARCHIVES = {
+    'webarchives': {
+        'ait': {'apis': {'wayback': {'replay': {'raw': 'https://wayback.archive-it.org/{collection}/{timestamp}id_/{url}'}}},
+                'collections': '[\\d]+'},
+
+        'ait_single': {'apis': {'wayback': {'replay': {'raw': 'https://wayback.archive-it.org/5835/{timestamp}id_/{url}'}}}},
+
+        'ia': {'apis': {'wayback': {'replay': {'raw': 'https://web.archive.org/web/{timestamp}id_/{url}'}}}},
+
+        'no_host': {'apis': {'wayback': {'replay': {'raw': 'http://web.arch{url}'}}}},
+
+        'no_replay': {'apis': {'memento': {}}},
+    }
+}
+
+
+# ============================================================================
+class TestWAMLoader(object):
+    @pytest.fixture(scope='class')
+    def loader(self, tmpdir_factory):
+        filename = str(tmpdir_factory.mktemp('wam').join('webarchives.yaml'))
+        with open(filename, 'wt') as fh:
+            yaml.dump(WEBARCHIVES, fh)
+
+        return WAMLoader(webarchives_file=filename)
+
+    def test_load(self, loader):
+        assert list(loader.replay_info.keys()) == ['ait', 'ait_single', 'ia', 'no_host']
+
+        assert loader.replay_info['ia']['replay_prefix'] == 'web.archive.org/web/'
+
+        assert sorted(loader.host_prefixes.keys()) == ['wayback.archive-it.org', 'web.archive.org']
+        assert [pk for _, _, pk in loader.other_prefixes] == ['no_host']
+
+    def test_find_archive(self, loader):
+        res = loader.find_archive_for_url('https://web.archive.org/web/2017id_/http://example.com/')
+        assert res == ('ia', '2017id_/example.com/', 'ia')
+
+        res = loader.find_archive_for_url('http://wayback.archive-it.org/1234/2017id_/https://example.com/')
+        assert res == ('ait', '2017id_/example.com/', 'ait:1234')
+
+        assert loader.find_archive_for_url('http://example.com/') is None
+
+    def test_find_archive_first_loaded(self, loader):
+        # both match, first loaded archive is returned
+        res = loader.find_archive_for_url('https://wayback.archive-it.org/5835/2017id_/http://example.com/')
+        assert res == ('ait', '2017id_/example.com/', 'ait:5835')
+
+        # archive on host loaded before prefix without host is returned
+        res = loader.find_archive_for_url('https://web.archive.org/web/2017id_/http://example.com/')
+        assert res[0] == 'ia'
+
+        res = loader.find_archive_for_url('http://web.archive.com/')
+        assert res == ('no_host', 'ive.com/', 'no_host')
+
+    def test_same_as_linear_scan(self, tmpdir):
+        filename = str(tmpdir.join('webarchives.yaml'))
+        with open(filename, 'wb') as fh:
+            write_webarchives(fh)
+
+        loader = WAMLoader(webarchives_file=filename)
+
+        for url in make_urls(2000):
+            assert loader.find_archive_for_url(url) == find_archive_linear(loader, url)
@@ -1,12 +1,33 @@
 from .testutils import FullStackTests
 from webrecorder.fullstackrunner import FullStackRunner
+from webrecorder.models import User
+from webrecorder.models.base import BaseAccess
+from webrecorder.models.dynstats import DynStats
+from webrecorder.websockcontroller import StatusPublisher, GeventWebSockHandler
+
+import webrecorder.maincontroller
 
 import os
 import gevent
+import gevent.queue
+import pytest
 import websocket
 import requests
 import json
 
+from mock import patch
+
+
+# ============================================================================
+class MockWebSockHandler(object):
+    def __init__(self, user, collection, recording):
+        self.user = user
+        self.collection = collection
+        self.recording = recording
+        self.type_ = 'record'
+        self.sesh_id = 'sesh'
+        self.stats_urls = []
+
 
 # ============================================================================
 class TestWS(FullStackTests):
@@ -88,6 +109,52 @@ class TestWS(FullStackTests):
 
         self.sleep_try(0.2, 10.0, assert_not_pending)
 
+    def test_ws_client_msg_no_delay(self):
+        url = 'http://example.com/skip'
+        key = User.URL_SKIP_KEY.format(user=self.anon_user, url=url)
+
+        self.ws.send(json.dumps({'ws_type': 'skipreq', 'url': url}))
+
+        def assert_skipped():
+            assert self.redis.exists(key)
+
+        # handled as soon as received, not on next status update
+        self.sleep_try(0.01, 0.5, assert_skipped)
+
+    def test_shared_status(self):
+        user = User(my_id=self.anon_user, redis=self.redis, access=BaseAccess())
+        collection, recording = self.get_coll_rec_obj('temp', 'rec')
+
+        dyn_stats = DynStats(self.redis, webrecorder.maincontroller.load_wr_config())
+        publisher = StatusPublisher(self.redis, dyn_stats, 60.0)
+
+        ws_handlers = [MockWebSockHandler(user, collection, recording) for i in range(3)]
+
+        shared_status = [publisher.subscribe(ws_handler) for ws_handler in ws_handlers]
+        assert len(publisher.statuses) == 1
+
+        # status read once in one pipeline, for all websockets
+        with patch.object(self.redis, 'pipeline', wraps=self.redis.pipeline) as pipeline:
+            statuses = [json.loads(shared_status[0].get_status(ws_handler)) for ws_handler in ws_handlers]
+
+        assert pipeline.call_count == 1
+        assert statuses == [statuses[0]] * 3
+        assert statuses[0]['size'] == recording.size
+        assert statuses[0]['pending_size'] == 0
+
+        # per-session stats added from shared status
+        ws_handlers[0].stats_urls = ['http://example.com/']
+        stats_key = dyn_stats.get_dyn_stats_keys(user, collection, recording, 'sesh', ws_handlers[0].stats_urls)[0]
+        self.redis.hset(stats_key, 'ia', 2)
+
+        assert json.loads(shared_status[0].get_status(ws_handlers[0]))['stats'] == {'ia': 2}
+        assert 'stats' not in json.loads(shared_status[0].get_status(ws_handlers[1]))
+
+        for ws_handler in ws_handlers:
+            publisher.unsubscribe(ws_handler, shared_status[0])
+
+        assert publisher.statuses == {}
+
     def test_ws_replay(self):
         replay_ws = websocket.WebSocket()
         replay_ws.connect('ws://localhost:{0}/_client_ws?user={user}&coll=temp'.format(self.app_port, user=self.anon_user),
@@ -132,3 +199,21 @@ class TestWS(FullStackTests):
         ex_ws.close()
         self.ws.close()
 
+    def test_ws_messages_before_close(self):
+        class MockWS(object):
+            closed = False
+
+        handler = GeventWebSockHandler.__new__(GeventWebSockHandler)
+        handler._ws = MockWS()
+        handler.q = gevent.queue.Queue()
+        handler.ws_closed = False
+
+        handler.q.put(('ws', b'first'))
+        handler.q.put(('ws', b'last'))
+        handler.q.put(('closed', None))
+
+        # messages before close still returned
+        assert handler._wait_events(0.1) == [('ws', b'first'), ('ws', b'last')]
+
+        with pytest.raises(OSError):
+            handler._wait_events(0.1)
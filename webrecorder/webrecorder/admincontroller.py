@@ -14,6 +14,7 @@ from re import sub
 
 from webrecorder.basecontroller import BaseController, wr_api_spec
 from webrecorder.models import Stats, User
+from webrecorder.models.indexcache import IndexCache
 
 from datetime import datetime, timedelta
 
@@ -67,6 +68,9 @@ class AdminController(BaseController):
         'Num Uploads': Stats.UPLOADS_COUNT_KEY,
         'Uploaded Size': Stats.UPLOADS_SIZE_KEY,
 
+        'Num Files Committed': Stats.COMMIT_COUNT_KEY,
+        'Committed Size': Stats.COMMIT_SIZE_KEY,
+
         'Bookmarks Added': Stats.BOOKMARK_ADD_KEY,
         'Bookmarks Changed': Stats.BOOKMARK_MOD_KEY,
         'Bookmarks Deleted': Stats.BOOKMARK_DEL_KEY,
@@ -620,6 +624,12 @@ class AdminController(BaseController):
 
             return {'user': user.serialize()}
 
+        @self.app.get('/api/v1/admin/index_cache')
+        @self.admin_view
+        def api_index_cache():
+            """API endpoint for warm collection index cache counters"""
+            return {'index_cache': IndexCache(self.redis).get_stats()}
+
         # Grafana Stats APIs
         wr_api_spec.set_curr_tag('Stats')
 
@@ -113,7 +113,27 @@ class WRAPISpec(object):
         'order': {'type': 'array',
                   'items': {'type': 'string'},
                   'description': 'an array of existing ids in new order'
-                  }
+                  },
+
+        'page': {'description': 'Page of results, starting at 1',
+                 'required': False,
+                 'schema': {'type': 'integer'}
+                 },
+
+        'page_size': {'description': 'Number of results per page',
+                      'required': False,
+                      'schema': {'type': 'integer'}
+                      },
+
+        'cursor': {'description': 'Cursor returned with previous page of results',
+                   'required': False,
+                   'schema': {'type': 'string'}
+                   },
+
+        'limit': {'description': 'Max number of results, all if not set',
+                  'required': False,
+                  'schema': {'type': 'integer'}
+                  },
     }
 
     all_responses = {
@@ -124,6 +144,9 @@ class WRAPISpec(object):
                     'schema': {
                         'type': 'object',
                         'properties': {
+                            'count': {'type': 'integer'},
+                            'next': {'type': 'string', 'nullable': True},
+                            'previous': {'type': 'string', 'nullable': True},
                             'files': {
                                 'type': 'array',
                                 'items': {
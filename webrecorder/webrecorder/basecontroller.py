@@ -1,11 +1,15 @@
+import hashlib
+import json
 import os
+import time
 
-from bottle import request, HTTPError, redirect as bottle_redirect, response
+from bottle import request, HTTPError, redirect as bottle_redirect, response, http_date, parse_date
 from functools import wraps
 from six.moves.urllib.parse import quote, urlencode
 
-from webrecorder.utils import sanitize_tag, sanitize_title, get_bool
+from webrecorder.utils import sanitize_tag, sanitize_title, get_bool, iter_json
 from webrecorder.models import User
+from webrecorder.models.base import RedisUniqueComponent
 
 from webrecorder.apiutils import api_decorator, wr_api_spec
 
@@ -15,6 +19,8 @@ class BaseController(object):
     SKIP_REDIR_LOCK_KEY = '__skip:{id}:{url}'
     SKIP_REDIR_LOCK_TTL = 10
 
+    API_CACHE_KEY = 'api:{etag}'
+
     def __init__(self, *args, **kwargs):
         self.app = kwargs['app']
         self.jinja_env = kwargs['jinja_env']
@@ -29,6 +35,9 @@ class BaseController(object):
         self.content_host = os.environ.get('CONTENT_HOST', '')
         self.cache_template = self.config.get('cache_template')
 
+        self.api_cache_secs = int(self.config.get('api_cache_secs', 0))
+        self.api_cache_max_size = int(self.config.get('api_cache_max_size', 1000000))
+
         self.anon_disabled = get_bool(os.environ.get('ANON_DISABLED'))
 
         self.allow_beta_features_role = os.environ.get('ALLOW_BETA_FEATURES_ROLE', 'beta-archivist')
@@ -165,6 +174,128 @@ class BaseController(object):
         except:
             self._raise_error(400, 'not_allowed')
 
+    def conditional_api_response(self, get_result, collection, *comps, stream=False):
+        """Return JSON API result, or an empty 304 response if the ETag or
+        Last-Modified date sent by the client still match. Both are derived
+        from the entries of the collection and other components read in one
+        round-trip, so that unchanged collections are not serialized again.
+
+        If api_cache_secs is set, encoded results are also cached in Redis,
+        keyed by ETag, and shared between clients.
+
+        :param get_result: function returning API result
+        :param Collection collection: collection
+        :param comps: other components the result depends on, eg. recording
+        :param bool stream: whether to encode result incrementally
+
+        :returns: API result, encoded API result or empty string
+        """
+        etag, last_modified = self.get_api_stamp(collection, *comps)
+
+        response.set_header('ETag', 'W/"{0}"'.format(etag))
+        response.set_header('Cache-Control', 'private, no-cache')
+
+        # changes within the same second can't be told apart by date
+        if last_modified >= int(time.time()):
+            last_modified = None
+        else:
+            response.set_header('Last-Modified', http_date(last_modified))
+
+        if self._is_not_modified(etag, last_modified):
+            response.status = 304
+            return ''
+
+        key = self.API_CACHE_KEY.format(etag=etag) if self.api_cache_secs else None
+
+        if key:
+            body = self.redis.get(key)
+            if body is not None:
+                response.content_type = 'application/json'
+                return body
+
+        result = get_result()
+
+        if stream:
+            response.content_type = 'application/json'
+            chunks = iter_json(result)
+            return self._cache_api_chunks(key, chunks) if key else chunks
+
+        if not key:
+            return result
+
+        body = json.dumps(result)
+        if len(body) <= self.api_cache_max_size:
+            self.redis.setex(key, self.api_cache_secs, body)
+
+        response.content_type = 'application/json'
+        return body
+
+    def get_api_stamp(self, collection, *comps):
+        """Return ETag and Last-Modified time of API result for current
+        request and access, derived from collection and other components.
+
+        :param Collection collection: collection
+        :param comps: other components the result depends on
+
+        :returns: ETag and time of last update
+        :rtype: tuple
+        """
+        comps = [collection] + list(comps)
+        RedisUniqueComponent.load_batch(collection.redis, comps)
+
+        self.access.assert_can_read_coll(collection)
+
+        view = [request.path, request.query_string,
+                self.access.is_coll_owner(collection),
+                self.access.can_write_coll(collection)]
+
+        digest = hashlib.sha1(json.dumps(view).encode('utf-8'))
+        last_modified = 0
+
+        for comp in comps:
+            data, updated_at = comp.get_update_stamp()
+            digest.update(comp.info_key.encode('utf-8'))
+            digest.update(json.dumps(data, sort_keys=True).encode('utf-8'))
+            last_modified = max(last_modified, updated_at)
+
+        return digest.hexdigest(), last_modified
+
+    def _is_not_modified(self, etag, last_modified):
+        if_none_match = request.environ.get('HTTP_IF_NONE_MATCH')
+        if if_none_match:
+            for tag in if_none_match.split(','):
+                tag = tag.strip()
+                if tag.startswith('W/'):
+                    tag = tag[2:]
+
+                if tag == '*' or tag.strip('"') == etag:
+                    return True
+
+            return False
+
+        if_modified_since = request.environ.get('HTTP_IF_MODIFIED_SINCE')
+        if if_modified_since and last_modified:
+            since = parse_date(if_modified_since.split(';')[0].strip())
+            return bool(since and since >= last_modified)
+
+        return False
+
+    def _cache_api_chunks(self, key, chunks):
+        buff = []
+        size = 0
+
+        for chunk in chunks:
+            yield chunk
+
+            if buff is not None:
+                size += len(chunk)
+                buff.append(chunk)
+                if size > self.api_cache_max_size:
+                    buff = None
+
+        if buff is not None:
+            self.redis.setex(key, self.api_cache_secs, ''.join(buff))
+
     def _raise_error(self, code, message='not_found'):
         result = {'error': message}
         #result.update(kwargs)
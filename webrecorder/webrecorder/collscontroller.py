@@ -103,8 +103,11 @@ class CollsController(BaseController):
                   resp='collection')
         def get_collection(coll_name):
             user = self.get_user(api=True, redir_check=False)
+            user, collection = self.load_user_coll(user=user, coll_name=coll_name)
 
-            return self.get_collection_info(coll_name, user=user)
+            return self.conditional_api_response(
+                lambda: self.serialize_collection_info(user, collection, coll_name, stream=True),
+                collection, user, stream=True)
 
         @self.app.delete('/api/v1/collection/<coll_name>')
         @self.api(query=['user'],
@@ -197,17 +200,20 @@ class CollsController(BaseController):
         def get_page_bookmarks(coll_name):
             user, collection = self.load_user_coll(coll_name=coll_name)
 
-            rec = request.query.get('rec')
-            if rec:
-                recording = collection.get_recording(rec)
-                if not recording:
-                    return {'page_bookmarks': {}}
+            def get_page_bookmarks_result():
+                rec = request.query.get('rec')
+                if rec:
+                    recording = collection.get_recording(rec)
+                    if not recording:
+                        return {'page_bookmarks': {}}
 
-                rec_pages = collection.list_rec_pages(recording)
-            else:
-                rec_pages = None
+                    rec_pages = collection.list_rec_pages(recording)
+                else:
+                    rec_pages = None
+
+                return {'page_bookmarks': collection.get_all_page_bookmarks(rec_pages)}
 
-            return {'page_bookmarks': collection.get_all_page_bookmarks(rec_pages)}
+            return self.conditional_api_response(get_page_bookmarks_result, collection)
 
         # DAT
         @self.app.post('/api/v1/collection/<coll_name>/dat/share')
@@ -291,11 +297,16 @@ class CollsController(BaseController):
     def get_collection_info(self, coll_name, user=None, include_pages=False):
         user, collection = self.load_user_coll(user=user, coll_name=coll_name)
 
+        return self.serialize_collection_info(user, collection, coll_name,
+                                              include_pages=include_pages)
+
+    def serialize_collection_info(self, user, collection, coll_name, include_pages=False, stream=False):
         result = {'collection': collection.serialize(include_rec_pages=include_pages,
                                                      include_lists=True,
                                                      include_recordings=True,
                                                      include_pages=True,
-                                                     check_slug=coll_name)}
+                                                     check_slug=coll_name,
+                                                     stream=stream)}
 
         result['user'] = user.my_id
         result['size_remaining'] = user.get_size_remaining()
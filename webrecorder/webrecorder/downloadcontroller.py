@@ -8,15 +8,19 @@ from webrecorder.basecontroller import BaseController
 from webrecorder import __version__
 from webrecorder.apiutils import wr_api_spec
 from webrecorder.models.stats import Stats
+from webrecorder.models.recording import Recording
 from webrecorder.utils import get_bool
 from webrecorder.rec.storage import LocalFileStorage
+from webrecorder.rec.storage.storagepaths import strip_prefix
 
 from bottle import response, request
-from six.moves.urllib.parse import quote
+from six.moves.urllib.parse import quote, urlencode
 from six import iteritems
 from collections import OrderedDict
+from itertools import groupby
 import gevent
 import json
+import os
 
 
 # ============================================================================
@@ -34,6 +38,11 @@ class DownloadController(BaseController):
 
         self.download_chunk_encoded = config['download_chunk_encoded']
 
+        self.download_accel_redirect = config.get('download_accel_redirect')
+
+        self.wasapi_page_size = int(config.get('wasapi_page_size', 100))
+        self.wasapi_max_page_size = int(config.get('wasapi_max_page_size', 1000))
+
     def init_routes(self):
         wr_api_spec.set_curr_tag('WASAPI (Downloads)')
 
@@ -51,7 +60,7 @@ class DownloadController(BaseController):
 
         @self.app.get('/api/v1/download/webdata')
         @self.api(
-            query=['?user', '?collection'],
+            query=['?user', '?collection', '?page', '?page_size'],
             resp='wasapi_list',
             description='List all files available for download, their locations and checksums, per WASAPI spec'
         )
@@ -172,7 +181,11 @@ class DownloadController(BaseController):
 
                 for n, warc_path in recording.iter_all_files():
                     try:
-                        fh = loader.load(warc_path)
+                        local_path = self.get_local_path(warc_path)
+                        if local_path:
+                            fh = open(local_path, 'rb')
+                        else:
+                            fh = loader.load(warc_path)
                     except Exception:
                         print('Skipping invalid ' + warc_path)
                         continue
@@ -226,6 +239,13 @@ class DownloadController(BaseController):
         # some clients use collection rather than coll_name so we must check for both
         coll_name = request.query.getunicode('collection')
 
+        try:
+            page = max(int(request.query.get('page', 1)), 1)
+            page_size = int(request.query.get('page_size', self.wasapi_page_size))
+            page_size = min(max(page_size, 1), self.wasapi_max_page_size)
+        except ValueError:
+            self._raise_error(400, 'invalid_page')
+
         user = self._get_wasapi_user()
 
         self.access.assert_is_curr_user(user)
@@ -242,50 +262,112 @@ class DownloadController(BaseController):
         else:
             colls = user.get_collections()
 
+        # list file names only, look up details just for files in requested page
+        all_files = []
+
+        for collection in colls:
+            recordings = sorted(collection.get_recordings(), key=lambda recording: recording.my_id)
+
+            pi = self.redis.pipeline(transaction=False)
+            for recording in recordings:
+                pi.smembers(Recording.REC_WARC_KEY.format(rec=recording.my_id))
+
+            for recording, names in zip(recordings, pi.execute()):
+                all_files.extend((collection, recording, name) for name in sorted(names))
+
+        page_files = all_files[(page - 1) * page_size:page * page_size]
+
         files = []
         download_path = self.get_origin() + '/api/v1/download/{user}/{coll}/{filename}'
         local_storage = LocalFileStorage(self.redis)
+        rec_status = {}
+
+        for collection, coll_files in groupby(page_files, key=lambda entry: entry[0]):
+            coll_files = list(coll_files)
+            names = [name for _, _, name in coll_files]
 
-        for collection in colls:
             commit_storage = collection.get_storage()
+            full_warc_paths = self.redis.hmget(collection.get_warc_key(), names)
+            checksums = collection.get_warc_checksums(names)
 
-            for recording in collection.get_recordings():
-                is_committed = recording.is_fully_committed()
-                is_open = not is_committed and recording.get_pending_count() > 0
+            for (_, recording, name), full_warc_path, checksum in zip(coll_files, full_warc_paths, checksums):
+                if recording.my_id not in rec_status:
+                    is_committed = recording.is_fully_committed()
+                    is_open = not is_committed and recording.get_pending_count() > 0
+                    rec_status[recording.my_id] = (is_committed, is_open)
+
+                is_committed, is_open = rec_status[recording.my_id]
                 storage = commit_storage if is_committed else local_storage
 
-                for name, path in recording.iter_all_files(include_index=False):
-                    full_warc_path = collection.get_warc_path(name)
-
-                    local_download = download_path.format(user=user.name, coll=collection.name, filename=name)
-                    remote_download_url = storage.get_remote_presigned_url(full_warc_path)
-
-                    # if remote download url exists (eg. for s3), include that first
-                    # always include local download url as well
-                    if remote_download_url and is_committed:
-                        locations = [remote_download_url, local_download]
-                    else:
-                        locations = [local_download]
-
-                    # add .open if current pending requests, checksum will likely change
-                    if is_open:
-                        name += '.open'
-
-                    kind, check_sum, size = storage.get_checksum_and_size(full_warc_path)
-                    files.append({
-                        'content-type': 'application/warc',
-                        'filetype': 'application/warc',
-                        'filename': name,
-                        'size': size,
-                        'recording': recording.my_id,
-                        'recording_date': recording.get_prop('created_at'),
-                        'collection': collection.name,
-                        'checksums': {kind: check_sum},
-                        'locations': locations,
-                        'is_active': not is_committed
-                    })
-
-        return {'files': files, 'include-extra': len(files) > 0}
+                local_download = download_path.format(user=user.name, coll=collection.name, filename=name)
+                remote_download_url = storage.get_remote_presigned_url(full_warc_path)
+
+                # if remote download url exists (eg. for s3), include that first
+                # always include local download url as well
+                if remote_download_url and is_committed:
+                    locations = [remote_download_url, local_download]
+                else:
+                    locations = [local_download]
+
+                kind, check_sum, size = self.get_catalog_checksum(collection, storage, name,
+                                                                  full_warc_path, checksum, is_committed)
+
+                # add .open if current pending requests, checksum will likely change
+                if is_open:
+                    name += '.open'
+
+                files.append({
+                    'content-type': 'application/warc',
+                    'filetype': 'application/warc',
+                    'filename': name,
+                    'size': size,
+                    'recording': recording.my_id,
+                    'recording_date': recording.get_prop('created_at'),
+                    'collection': collection.name,
+                    'checksums': {kind: check_sum},
+                    'locations': locations,
+                    'is_active': not is_committed
+                })
+
+        return {'count': len(all_files),
+                'next': self._get_wasapi_page_url(page + 1, page_size) if page * page_size < len(all_files) else None,
+                'previous': self._get_wasapi_page_url(page - 1, page_size) if page > 1 else None,
+                'files': files,
+                'include-extra': len(files) > 0}
+
+    def get_catalog_checksum(self, collection, storage, name, full_warc_path, entry, is_committed):
+        """Return checksum and size of WARC from collection catalog.
+        If not yet catalogued, or if an uncommitted WARC has changed since,
+        compute checksum and add to catalog.
+
+        :param Collection collection: collection
+        :param BaseStorage storage: storage of WARC
+        :param str name: WARC name
+        :param str full_warc_path: WARC path or URL
+        :param entry: catalogued checksum and size
+        :type: dict or None
+        :param bool is_committed: whether WARC is committed to storage
+
+        :returns: kind of checksum, checksum and size
+        :rtype: tuple
+        """
+        if entry:
+            if is_committed:
+                return entry['kind'], entry['checksum'], entry['size']
+
+            local_path = self.get_local_path(full_warc_path)
+            if local_path and os.path.getsize(local_path) == entry['size']:
+                return entry['kind'], entry['checksum'], entry['size']
+
+        kind, check_sum, size = storage.get_checksum_and_size(full_warc_path)
+        collection.set_warc_checksum(name, kind, check_sum, size)
+        return kind, check_sum, size
+
+    def _get_wasapi_page_url(self, page, page_size):
+        params = dict(request.query.decode())
+        params['page'] = page
+        params['page_size'] = page_size
+        return self.get_origin() + request.path + '?' + urlencode(params)
 
     def wasapi_download(self, username, coll_name, filename):
         user = self._get_wasapi_user(username)
@@ -308,8 +390,20 @@ class DownloadController(BaseController):
         if not warc_path:
             self._raise_error(404, 'file_not_found')
 
+        # if committed to remote storage, download from there directly
+        storage = collection.get_storage()
+        if storage and self.is_committed_warc(collection, filename, warc_path):
+            remote_url = storage.get_remote_presigned_url(warc_path)
+            if remote_url:
+                return self.redirect(remote_url)
+
         response.headers['Content-Type'] = 'application/octet-stream'
         response.headers['Content-Disposition'] = "attachment; filename*=UTF-8''" + filename
+
+        local_path = self.get_local_path(warc_path)
+        if local_path:
+            return self.send_local_file(local_path)
+
         response.headers['Transfer-Encoding'] = 'chunked'
 
         loader = BlockLoader()
@@ -324,3 +418,58 @@ class DownloadController(BaseController):
                 yield chunk
 
         return read_all(fh)
+
+    def is_committed_warc(self, collection, filename, warc_path):
+        """Return whether WARC is committed to remote storage, either
+        already stored remotely or part of a fully committed recording.
+
+        :param Collection collection: collection
+        :param str filename: WARC name
+        :param str warc_path: WARC path or URL
+
+        :returns: whether WARC is committed
+        :rtype: bool
+        """
+        if warc_path.startswith('s3://'):
+            return True
+
+        recordings = list(collection.get_recordings())
+
+        pi = self.redis.pipeline(transaction=False)
+        for recording in recordings:
+            pi.sismember(Recording.REC_WARC_KEY.format(rec=recording.my_id), filename)
+
+        for recording, is_member in zip(recordings, pi.execute()):
+            if is_member:
+                return recording.is_fully_committed()
+
+        return False
+
+    def get_local_path(self, warc_path):
+        """Return local path of WARC, if stored locally.
+
+        :param str warc_path: WARC path or URL
+
+        :returns: local path or None
+        :rtype: str or None
+        """
+        local_path = strip_prefix(warc_path)
+        if '://' in local_path or not os.path.isfile(local_path):
+            return None
+
+        return local_path
+
+    def send_local_file(self, local_path):
+        """Send local file without copying it through Python, via nginx
+        X-Accel-Redirect if configured, otherwise via wsgi.file_wrapper.
+
+        :param str local_path: local path
+
+        :returns: file or empty body
+        """
+        if self.download_accel_redirect:
+            response.headers['X-Accel-Redirect'] = self.download_accel_redirect + quote(local_path)
+            return ''
+
+        response.headers['Content-Length'] = os.path.getsize(local_path)
+        return open(local_path, 'rb')
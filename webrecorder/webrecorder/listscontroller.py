@@ -18,12 +18,15 @@ class ListsController(BaseController):
 
             include_bookmarks = request.query.getunicode('include_bookmarks') or 'all'
 
-            lists = collection.get_lists()
+            def get_lists_result():
+                lists = collection.get_lists()
 
-            return {
-                'lists': [blist.serialize(include_bookmarks=include_bookmarks)
-                          for blist in lists]
-            }
+                return {
+                    'lists': [blist.serialize(include_bookmarks=include_bookmarks)
+                              for blist in lists]
+                }
+
+            return self.conditional_api_response(get_lists_result, collection)
 
         @self.app.post('/api/v1/lists')
         @self.api(query=['user', 'coll', 'include_bookmarks'],
@@ -49,8 +52,10 @@ class ListsController(BaseController):
 
             include_bookmarks = request.query.getunicode('include_bookmarks') or 'all'
 
-            return {'list': blist.serialize(check_slug=list_id,
-                                            include_bookmarks=include_bookmarks)}
+            return self.conditional_api_response(
+                lambda: {'list': blist.serialize(check_slug=list_id,
+                                                 include_bookmarks=include_bookmarks)},
+                collection, blist)
 
         @self.app.post('/api/v1/list/<list_id>')
         @self.api(query=['user', 'coll'],
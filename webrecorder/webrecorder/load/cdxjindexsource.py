@@ -0,0 +1,403 @@
+from pywb.warcserver.index.indexsource import RedisIndexSource
+from pywb.warcserver.index.cdxobject import CDXObject
+
+from pywb.utils.format import res_template
+from pywb.utils.loaders import BlockLoader
+
+from webrecorder.rec.storage.storagepaths import strip_prefix
+from webrecorder.models import Recording, Collection
+from webrecorder.utils import iter_index_lines
+
+from collections import OrderedDict
+from contextlib import closing
+
+import gevent.event
+import hashlib
+import heapq
+import logging
+import mmap
+import os
+import shutil
+import tempfile
+
+logger = logging.getLogger('wr.io')
+
+
+# ============================================================================
+def find_first_line(mm, key):
+    """Return offset of the first line not less than key in a sorted,
+    newline-separated buffer.
+
+    :param mmap mm: sorted CDXJ lines
+    :param bytes key: search key
+
+    :returns: offset of the first line >= key, or size of buffer
+    :rtype: int
+    """
+    lo = 0
+    hi = len(mm)
+
+    # all lines starting before lo are < key, all starting at or after hi are >= key
+    while lo < hi:
+        mid = (lo + hi) // 2
+
+        i = mm.rfind(b'\n', lo, mid)
+        start = i + 1 if i >= 0 else lo
+
+        end = mm.find(b'\n', start)
+        if end < 0:
+            end = len(mm)
+
+        if mm[start:end] < key:
+            lo = end + 1
+        else:
+            hi = start
+
+    return lo
+
+
+def iter_cdxj_range(mm, key, end_key):
+    """Yield lines in [key, end_key) of a sorted, newline-separated
+    buffer, without moving the buffer's file position.
+
+    :param mmap mm: sorted CDXJ lines
+    :param bytes key: start key (inclusive)
+    :param bytes end_key: end key (exclusive)
+
+    :returns: CDXJ lines
+    :rtype: generator
+    """
+    size = len(mm)
+    pos = find_first_line(mm, key)
+
+    while pos < size:
+        end = mm.find(b'\n', pos)
+        if end < 0:
+            end = size
+
+        line = mm[pos:end]
+        if line >= end_key:
+            break
+
+        if line:
+            yield line
+
+        pos = end + 1
+
+
+def iter_summary_blocks(mm, key, end_key):
+    """Yield offset and length of each compressed block that may contain
+    lines in [key, end_key), from a sorted ZipNum summary buffer.
+
+    :param mmap mm: summary lines
+    :param bytes key: start key (inclusive)
+    :param bytes end_key: end key (exclusive)
+
+    :returns: block offset and length
+    :rtype: int and int
+    """
+    size = len(mm)
+    pos = find_first_line(mm, key)
+
+    # previous block may contain lines matching key
+    if pos > 0:
+        pos = mm.rfind(b'\n', 0, pos - 1) + 1
+
+    while pos < size:
+        end = mm.find(b'\n', pos)
+        if end < 0:
+            end = size
+
+        line = mm[pos:end]
+        if line >= end_key:
+            break
+
+        if line:
+            fields = line.split(b'\t')
+            yield int(fields[2]), int(fields[3])
+
+        pos = end + 1
+
+
+# ============================================================================
+class CDXJFileCache(object):
+    """Memory-mapped committed CDXJ files, most recently used first.
+    Index files not on the local filesystem are downloaded to cache_dir
+    once, then mapped.
+
+    Downloaded files are kept, least recently used first, within their own
+    size budget, independent of the number of files kept mapped. Each file
+    is downloaded by one lookup at a time, other lookups of the same file
+    wait for it.
+
+    :ivar int max_open: maximum number of files kept mapped
+    :ivar str cache_dir: directory for downloaded index files
+    :ivar int max_download_size: maximum total size of downloaded files
+    :ivar OrderedDict downloads: path and size of downloaded files, by index file URL
+    :ivar int download_size: total size of downloaded files
+    :ivar dict pending: event set once download is done, by index file URL
+    """
+    def __init__(self, max_open=256, cache_dir=None, max_download_size=1000000000):
+        self.max_open = max_open
+        self.cache_dir = cache_dir or os.path.join(tempfile.gettempdir(), 'wr-cdxj-cache')
+        self.max_download_size = max_download_size
+
+        self.files = OrderedDict()
+        self.loader = BlockLoader()
+
+        self.downloads = OrderedDict()
+        self.download_size = 0
+        self.pending = {}
+
+    def get(self, url):
+        """Return memory-mapped index file.
+
+        :param str url: index file URL or path
+
+        :returns: mapped file, None if empty
+        :rtype: mmap or None
+        """
+        mm = self.files.pop(url, None)
+        if mm is None:
+            try:
+                mm = self._map_file(self._get_local_path(url))
+            except FileNotFoundError:
+                # download removed by another process, download again
+                self._remove_download(url)
+                mm = self._map_file(self._get_local_path(url))
+
+            # not closed explicitly, as lookups in progress may still hold the mapping
+            if len(self.files) >= self.max_open:
+                self.files.popitem(last=False)
+
+            self._prune_downloads(exclude=url)
+
+        self.files[url] = mm
+        return mm
+
+    def get_location(self, url):
+        """Return local path of index file, if on the local filesystem,
+        otherwise its URL.
+
+        :param str url: index file URL or path
+
+        :returns: path or URL
+        :rtype: str
+        """
+        path = strip_prefix(url)
+        if '://' not in path and os.path.isfile(path):
+            return path
+
+        return url
+
+    def _get_local_path(self, url):
+        location = self.get_location(url)
+        if '://' not in location:
+            return location
+
+        while True:
+            entry = self.downloads.get(url)
+            if entry:
+                self.downloads.move_to_end(url)
+                return entry[0]
+
+            # already being downloaded by another lookup, wait for it
+            event = self.pending.get(url)
+            if not event:
+                break
+
+            event.wait()
+
+        path = os.path.join(self.cache_dir, hashlib.sha1(url.encode('utf-8')).hexdigest() + '.cdxj')
+
+        # downloaded by earlier process
+        if os.path.isfile(path):
+            self._add_download(url, path)
+            return path
+
+        event = gevent.event.Event()
+        self.pending[url] = event
+
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+            logger.debug('CDXJ Index: Downloading {0} -> {1}'.format(url, path))
+
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+
+            try:
+                with closing(self.loader.load(url)) as src:
+                    with open(fd, 'wb') as dest:
+                        shutil.copyfileobj(src, dest)
+
+                os.rename(tmp_path, path)
+            except Exception:
+                os.remove(tmp_path)
+                raise
+
+            self._add_download(url, path)
+            return path
+
+        finally:
+            self.pending.pop(url, None)
+            event.set()
+
+    def _add_download(self, url, path):
+        """Add downloaded file to download cache.
+
+        :param str url: index file URL
+        :param str path: downloaded file path
+        """
+        size = os.path.getsize(path)
+        self.downloads[url] = (path, size)
+        self.download_size += size
+
+    def _remove_download(self, url):
+        """Remove file downloaded for index file URL, if any.
+        An existing mapping of the file remains readable.
+
+        :param str url: index file URL
+        """
+        entry = self.downloads.pop(url, None)
+        if not entry:
+            return
+
+        path, size = entry
+        self.download_size -= size
+
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _prune_downloads(self, exclude=None):
+        """Remove least recently used downloaded files until total size
+        is within budget. Files being downloaded or just resolved for a
+        lookup are kept.
+
+        :param str exclude: index file URL not to remove
+        """
+        if self.download_size <= self.max_download_size:
+            return
+
+        for url in list(self.downloads.keys()):
+            if self.download_size <= self.max_download_size:
+                break
+
+            if url == exclude or url in self.pending:
+                continue
+
+            self._remove_download(url)
+
+    def _map_file(self, path):
+        with open(path, 'rb') as fh:
+            if not os.fstat(fh.fileno()).st_size:
+                return None
+
+            return mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+# ============================================================================
+class CDXJFileIndexSource(RedisIndexSource):
+    """Collection index, merged from the sorted CDXJ file of each committed
+    recording and the Redis CDXJ index of each recording not yet committed.
+
+    For recordings with a compressed block index, only the summary is mapped,
+    and just the blocks matching a lookup are read, with one ranged read
+    per run of adjacent blocks.
+
+    An existing collection CDXJ Redis key (eg. for external collections)
+    is used as is.
+    """
+    def __init__(self, redis, file_cache=None):
+        super(CDXJFileIndexSource, self).__init__(redis=redis,
+                                                  key_template=Collection.COLL_CDXJ_KEY)
+
+        self.file_cache = file_cache or CDXJFileCache()
+        self.blk_loader = BlockLoader()
+
+    def load_index(self, params):
+        coll_cdxj_key = res_template(Collection.COLL_CDXJ_KEY, params)
+        if self.redis.exists(coll_cdxj_key):
+            return self.load_key_index(coll_cdxj_key, params)
+
+        recs = list(self.redis.smembers(res_template(Collection.RECS_KEY, params)))
+
+        # recordings not yet committed are read from Redis, the rest from file
+        pi = self.redis.pipeline(transaction=False)
+        for rec in recs:
+            pi.exists(Recording.CDXJ_KEY.format(rec=rec))
+            pi.hmget(Recording.INFO_KEY.format(rec=rec),
+                     [Recording.INDEX_FILE_KEY, Recording.INDEX_SUMMARY_KEY])
+
+        res = pi.execute()
+
+        key = params['key']
+        end_key = params['end_key']
+
+        sources = []
+
+        for rec, exists, (index_file, summary_file) in zip(recs, res[::2], res[1::2]):
+            if exists:
+                lines = self.redis.zrangebylex(Recording.CDXJ_KEY.format(rec=rec),
+                                               b'[' + key, b'(' + end_key)
+
+                sources.append([line.encode('utf-8') if isinstance(line, str) else line
+                                for line in lines])
+
+            elif index_file:
+                try:
+                    mm = self.file_cache.get(summary_file or index_file)
+                except Exception as e:
+                    logger.error('CDXJ Index: Could not load {0}: {1}'.format(summary_file or index_file, e))
+                    continue
+
+                if mm is None:
+                    continue
+
+                if summary_file:
+                    sources.append(self.load_blocks(index_file, mm, key, end_key))
+                else:
+                    sources.append(iter_cdxj_range(mm, key, end_key))
+
+        def do_load(sources):
+            for line in heapq.merge(*sources):
+                yield CDXObject(line)
+
+        return do_load(sources)
+
+    def load_blocks(self, index_file, summary, key, end_key):
+        """Yield lines in [key, end_key) from the compressed blocks
+        listed in the summary.
+
+        :param str index_file: compressed block index URL or path
+        :param mmap summary: mapped summary file
+        :param bytes key: start key (inclusive)
+        :param bytes end_key: end key (exclusive)
+
+        :returns: CDXJ lines
+        :rtype: generator
+        """
+        location = self.file_cache.get_location(index_file)
+
+        ranges = []
+        for offset, length in iter_summary_blocks(summary, key, end_key):
+            if ranges and ranges[-1][0] + ranges[-1][1] == offset:
+                ranges[-1][1] += length
+            else:
+                ranges.append([offset, length])
+
+        for offset, length in ranges:
+            reader = self.blk_loader.load(location, offset, length)
+            try:
+                for line in iter_index_lines(reader):
+                    if line >= end_key:
+                        return
+
+                    if line >= key:
+                        yield line
+            finally:
+                reader.close()
+
+    def __str__(self):
+        return 'cdxj-file'
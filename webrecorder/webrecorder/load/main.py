@@ -16,6 +16,7 @@ from pywb.utils.loaders import load_yaml_config
 from webrecorder.utils import load_wr_config, init_logging
 
 from webrecorder.load.wamsourceloader import WAMSourceLoader
+from webrecorder.load.cdxjindexsource import CDXJFileIndexSource, CDXJFileCache
 
 from webrecorder.models import Recording, Collection
 
@@ -62,9 +63,17 @@ class WRWarcServer(object):
                                             redis_url=rec_url,
                                             redis=redis)
 
-        coll_redis_source = RedisIndexSource(timeout=timeout,
-                                             redis_url=coll_url,
-                                             redis=redis)
+        if Collection.CDXJ_FILE_INDEX:
+            file_cache = CDXJFileCache(max_open=int(config['coll_cdxj_file_max_open']),
+                                       cache_dir=config['coll_cdxj_file_cache_dir'],
+                                       max_download_size=int(config['coll_cdxj_file_cache_max_size']))
+
+            coll_redis_source = CDXJFileIndexSource(redis=redis,
+                                                    file_cache=file_cache)
+        else:
+            coll_redis_source = RedisIndexSource(timeout=timeout,
+                                                 redis_url=coll_url,
+                                                 redis=redis)
 
         live_rec = DefaultResourceHandler(
                         SimpleAggregator(
@@ -12,10 +12,14 @@ class WAMLoader(object):
 
     STRIP_SCHEME = re.compile(r'https?://')
 
-    def __init__(self):
+    def __init__(self, webarchives_file=None):
         self.replay_info = {}
 
-        webarchives_path = self.merge_webarchives()
+        # replay prefixes by host, and prefixes without a host, for lookup
+        self.host_prefixes = {}
+        self.other_prefixes = []
+
+        webarchives_path = webarchives_file or self.merge_webarchives()
 
         try:
             self.load_all(webarchives_path)
@@ -24,9 +28,18 @@ class WAMLoader(object):
 
     def find_archive_for_url(self, url):
         schemeless_url = self.STRIP_SCHEME.sub('', url)
-        for pk, info in self.replay_info.items():
-            if schemeless_url.startswith(info['replay_prefix']):
-                orig_url = schemeless_url[len(info['replay_prefix']):]
+
+        host = schemeless_url.partition('/')[0]
+        prefixes = self.host_prefixes.get(host, [])
+
+        # keep first-loaded order if prefixes without a host may also match
+        if self.other_prefixes:
+            prefixes = sorted(prefixes + self.other_prefixes)
+
+        for _, replay_prefix, pk in prefixes:
+            if schemeless_url.startswith(replay_prefix):
+                info = self.replay_info[pk]
+                orig_url = schemeless_url[len(replay_prefix):]
                 if info.get('parse_collection'):
                     coll, orig_url = orig_url.split('/', 1)
                     id_ = pk + ':' + coll
@@ -38,11 +51,30 @@ class WAMLoader(object):
     def load_all(self, webarchives_path):
         wa_file = load(webarchives_path)
         with closing(wa_file):
-            for doc in yaml.load_all(wa_file):
+            for doc in yaml.safe_load_all(wa_file):
                 webarchives = doc['webarchives']
                 for pk, webarchive in webarchives.items():
                     self.load_archive(pk, webarchive)
 
+        self.index_replay_prefixes()
+
+    def index_replay_prefixes(self):
+        """Index replay prefixes of loaded archives by host, so that
+        find_archive_for_url() only checks archives on the same host.
+        """
+        self.host_prefixes = {}
+        self.other_prefixes = []
+
+        for order, (pk, info) in enumerate(self.replay_info.items()):
+            replay_prefix = info['replay_prefix']
+            entry = (order, replay_prefix, pk)
+
+            if '/' in replay_prefix:
+                host = replay_prefix.partition('/')[0]
+                self.host_prefixes.setdefault(host, []).append(entry)
+            else:
+                self.other_prefixes.append(entry)
+
     def load_archive(self, pk, webarchive):
         if 'apis' not in webarchive:
             return False
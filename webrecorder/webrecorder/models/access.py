@@ -2,7 +2,7 @@
 from bottle import template, request, HTTPError
 
 from webrecorder.models.user import SessionUser
-from webrecorder.models.base import BaseAccess
+from webrecorder.models.base import BaseAccess, ComponentCache
 
 
 # ============================================================================
@@ -14,19 +14,25 @@ class SessionAccessCache(BaseAccess):
     :ivar Session sesh: session
     :ivar StrictRedis redis: Redis interface
     :ivar SessionUser _session_user: logged-in user
+    :ivar component_cache: per-request component cache
+    :type: ComponentCache or None
     """
     READ_PREFIX = 'r:'
     WRITE_PREFIX = 'w:'
 
-    def __init__(self, session, redis):
+    def __init__(self, session, redis, read_cache=False):
         """Initialize Webrecorder session access.
 
         :param Session session: Webrecorder session
         :param StrictRedis redis: Redis interface
+        :param bool read_cache: whether to cache component reads for this request
         """
         self.sesh = session
         self.redis = redis
 
+        if read_cache:
+            self.component_cache = ComponentCache()
+
         self._session_user = None
 
     @property
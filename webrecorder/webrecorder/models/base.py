@@ -82,6 +82,7 @@ class RedisUniqueComponent(object):
         :param str value: value
         """
         val = self.redis.hincrby(self.info_key, key, value)
+        self._invalidate_cached()
         self.data[key] = int(val)
         self.set_prop('updated_at', self._get_now())
 
@@ -149,10 +150,77 @@ class RedisUniqueComponent(object):
 
     def load(self):
         """Load Redis entries."""
-        self.data = self.redis.hgetall(self.info_key)
+        cache = self.get_component_cache()
+        if cache is not None:
+            data = cache.get(self.info_key)
+            if data is None:
+                data = self.redis.hgetall(self.info_key)
+                cache.set(self.info_key, data)
+        else:
+            data = self.redis.hgetall(self.info_key)
+
+        self._set_loaded_data(data)
+
+    def get_component_cache(self):
+        """Get per-request component cache of current access, if enabled.
+
+        :returns: component cache
+        :rtype: ComponentCache or None
+        """
+        return getattr(self.access, 'component_cache', None)
+
+    def _invalidate_cached(self):
+        """Invalidate cached Redis entries after write."""
+        cache = self.get_component_cache()
+        if cache is not None:
+            cache.invalidate(self.info_key)
+
+    def _set_loaded_data(self, data):
+        """Set loaded Redis entries.
+
+        :param dict data: Redis entries
+        """
+        self.data = data
         self._format_keys()
         self.loaded = True
 
+    @classmethod
+    def load_batch(cls, redis, comps):
+        """Load Redis entries of multiple components in one pipeline.
+
+        :param StrictRedis redis: Redis interface
+        :param list comps: Redis components
+
+        :returns: Redis components
+        :rtype: list
+        """
+        if not comps:
+            return comps
+
+        cache = comps[0].get_component_cache()
+        missing = []
+
+        for comp in comps:
+            data = cache.get(comp.info_key) if cache is not None else None
+            if data is not None:
+                comp._set_loaded_data(data)
+            else:
+                missing.append(comp)
+
+        if not missing:
+            return comps
+
+        pi = redis.pipeline(transaction=False)
+        for comp in missing:
+            pi.hgetall(comp.info_key)
+
+        for comp, data in zip(missing, pi.execute()):
+            if cache is not None:
+                cache.set(comp.info_key, data)
+            comp._set_loaded_data(data)
+
+        return comps
+
     def _format_keys(self):
         """Cast values of loaded entries to int."""
         for key in self.INT_KEYS:
@@ -207,6 +275,7 @@ class RedisUniqueComponent(object):
         """
         pi = pi or self.redis
         pi.hmset(self.info_key, self.data)
+        self._invalidate_cached()
 
     def serialize(self, include_duration=False, convert_date=True):
         """Serialize Redis entries.
@@ -250,7 +319,22 @@ class RedisUniqueComponent(object):
 
         :returns: attribute value or default value
         """
-        if not self.loaded:
+        cache = self.get_component_cache()
+        if cache is not None:
+            # bypass cache on forced update, entry may be changed outside of
+            # component methods (eg. by the recorder)
+            if force_update:
+                value = self.redis.hget(self.info_key, attr)
+                cache.refresh(self.info_key, attr, value)
+                self.data[attr] = value or default_val
+                if force_type:
+                    self.data[attr] = force_type(self.data[attr])
+
+            # read all entries once per request, re-read if invalidated by a write
+            elif not self.loaded:
+                self.load()
+
+        elif not self.loaded:
             if force_update or attr not in self.data:
                 self.data[attr] = self.redis.hget(self.info_key, attr) or default_val
                 if force_type:
@@ -267,6 +351,18 @@ class RedisUniqueComponent(object):
         """
         self.data[attr] = value
         self.redis.hset(self.info_key, attr, value)
+        self._invalidate_cached()
+
+    def get_update_stamp(self):
+        """Return loaded entries that are serialized, ie. not prefixed
+        with @, and time of last update, eg. to derive ETag and
+        Last-Modified date of API responses.
+
+        :returns: entries and time of last update
+        :rtype: tuple
+        """
+        data = {key: value for key, value in self.data.items() if not key.startswith('@')}
+        return data, int(self.data.get('updated_at') or 0)
 
     def mark_updated(self, ts=None):
         """Update Redis component's owner.
@@ -321,6 +417,8 @@ class RedisUniqueComponent(object):
             self.redis.delete(key)
             deleted = True
 
+        self._invalidate_cached()
+
         return deleted
 
     def get_owner(self):
@@ -574,10 +672,11 @@ class RedisNamedMap(object):
         """
         return int(self.redis.hlen(self.get_comp_map()))
 
-    def get_objects(self, cls):
+    def get_objects(self, cls, load=False):
         """Return Redis components in Redis hash.
 
         :param class cls: RedisUniqueComponent
+        :param bool load: whether to load Redis entries (in one pipeline)
 
         :returns: list of Redis components
         :rtype: list
@@ -588,6 +687,9 @@ class RedisNamedMap(object):
                         redis=self.redis,
                         access=self.comp.access) for name, val in all_objs.items()]
 
+        if load:
+            cls.load_batch(self.redis, obj_list)
+
         return obj_list
 
 
@@ -621,7 +723,7 @@ class RedisOrderedList(object):
         """Return sorted set elements.
 
         :param class cls: Redis component class
-        :param bool load: whether to load Redis entries
+        :param bool load: whether to load Redis entries (in one pipeline)
         :param int start: start index
         :param int end: stop index
 
@@ -637,11 +739,11 @@ class RedisOrderedList(object):
                       access=self.comp.access)
 
             obj.owner = self.comp
-            if load:
-                obj.load()
-
             obj_list.append(obj)
 
+        if load:
+            cls.load_batch(self.redis, obj_list)
+
         return obj_list
 
     def insert_ordered_object(self, obj, before_obj, owner=True):
@@ -822,7 +924,7 @@ class RedisUnorderedList(object):
         """Return set elements.
 
         :param class cls: Redis building block class
-        :param bool load: whether to load Redis entries
+        :param bool load: whether to load Redis entries (in one pipeline)
 
         :returns: set elements
         :rtype: list
@@ -837,11 +939,11 @@ class RedisUnorderedList(object):
                       access=self.comp.access)
 
             obj.owner = self.comp
-            if load:
-                obj.load()
-
             obj_list.append(obj)
 
+        if load:
+            cls.load_batch(self.redis, obj_list)
+
         return obj_list
 
     def add_object(self, obj, owner=True):
@@ -896,9 +998,95 @@ class RedisUnorderedList(object):
         return self.redis.smembers(self._list_key)
 
 
+# ============================================================================
+class ComponentCache(object):
+    """Per-request identity map and read-through cache of Redis component
+    entries, keyed by component key.
+
+    Entries are read from Redis at most once and invalidated on write.
+
+    :ivar dict entries: cached Redis entries
+    :ivar int reads: number of Redis reads
+    :ivar int writes: number of Redis writes
+    :ivar int hits: number of reads served from cache
+    """
+    def __init__(self):
+        """Initialize component cache."""
+        self.entries = {}
+        self.reads = 0
+        self.writes = 0
+        self.hits = 0
+
+    @property
+    def redis_calls(self):
+        """Read-only property number of Redis calls."""
+        return self.reads + self.writes
+
+    def is_cached(self, key):
+        """Return whether entries of component key are cached.
+
+        :param str key: component key
+
+        :returns: whether entries are cached
+        :rtype: bool
+        """
+        return key in self.entries
+
+    def get(self, key):
+        """Get copy of cached entries.
+
+        :param str key: component key
+
+        :returns: Redis entries or None if not cached
+        :rtype: dict or None
+        """
+        data = self.entries.get(key)
+        if data is None:
+            return None
+
+        self.hits += 1
+        return dict(data)
+
+    def set(self, key, data):
+        """Cache entries read from Redis.
+
+        :param str key: component key
+        :param dict data: Redis entries
+        """
+        self.reads += 1
+        self.entries[key] = dict(data)
+
+    def refresh(self, key, attr, value):
+        """Update cached entry with value read from Redis.
+
+        :param str key: component key
+        :param str attr: attribute name
+        :param str value: attribute value
+        """
+        self.reads += 1
+        data = self.entries.get(key)
+        if data is None:
+            return
+
+        if value is not None:
+            data[attr] = value
+        else:
+            data.pop(attr, None)
+
+    def invalidate(self, key):
+        """Invalidate cached entries after write.
+
+        :param str key: component key
+        """
+        self.writes += 1
+        self.entries.pop(key, None)
+
+
 # ============================================================================
 class BaseAccess(object):
     """Webrecorder access rights base class."""
+    component_cache = None
+
     def can_read_coll(self, collection, allow_superuser=True):
         """Return whether collection can be read.
 
@@ -1,21 +1,26 @@
+import json
 import logging
 import os
+import time
 import traceback
 from datetime import date
 
 import gevent
+import gevent.pool
 from pywb.utils.loaders import load
 from pywb.warcserver.index.cdxobject import CDXObject
 
 from webrecorder.models.auto import Auto
 from webrecorder.models.base import RedisNamedMap, RedisOrderedList, RedisUniqueComponent, RedisUnorderedList
 from webrecorder.models.datshare import DatShare
+from webrecorder.models.indexcache import IndexCache
 from webrecorder.models.list_bookmarks import BookmarkList
 from webrecorder.models.pages import PagesMixin
 from webrecorder.models.recording import Recording
+from webrecorder.models.stats import Stats
 from webrecorder.rec.storage import get_storage as get_global_storage
 from webrecorder.rec.storage.storagepaths import strip_prefix
-from webrecorder.utils import get_new_id, sanitize_title
+from webrecorder.utils import get_new_id, sanitize_title, iter_index_lines, redis_pipeline, get_bool
 
 logger = logging.getLogger('wr.io')
 
@@ -29,13 +34,22 @@ class Collection(PagesMixin, RedisUniqueComponent):
     :cvar str LIST_NAMES_KEY: list names Redis key
     :cvar str LIST_REDIR_KEY: list redirect Redis key
     :cvar str COLL_CDXJ_KEY: CDX index file Redis key
+    :cvar str COLL_CDXJ_MERGED_KEY: recordings merged into CDX index Redis key
     :cvar str CLOSE_WAIT_KEY: n.s.
     :cvar str COMMIT_WAIT_KEY: n.s.
+    :cvar str COMMIT_STATE_KEY: uploaded file (target URL and size) Redis key
     :cvar str INDEX_FILE_KEY: CDX index file
+    :cvar str CDXJ_GEN_KEY: generation of recordings in CDX index
+    :cvar str REVISION_KEY: revision, incremented on each change of serialized collection
+    :cvar str REVISED_AT_KEY: time of last revision
     :cvar int COMMIT_WAIT_SECS: wait for the given number of seconds
+    :cvar int COMMIT_STATE_SECS: TTL of uploaded file state
     :cvar str DEFAULT_COLL_DESC: default description
     :cvar str DEFAULT_STORE_TYPE: default Webrecorder storage
-    :cvar int COLL_CDXJ_TTL: TTL of CDX index file
+    :cvar int COLL_CDXJ_TTL: TTL of CDX index file, 0 if evicted by IndexCache
+    :cvar int CDXJ_LOAD_BATCH_SIZE: number of CDX index lines per ZADD
+    :cvar int CDXJ_LOAD_POOL_SIZE: max number of CDX index files loaded concurrently
+    :cvar bool CDXJ_FILE_INDEX: whether replay reads committed CDX index files directly
     :ivar RedisUnorderedList recs: recordings
     :ivar RedisOrderedList lists: n.s.
     :ivar RedisNamedMap list_names: n.s.
@@ -53,6 +67,7 @@ class Collection(PagesMixin, RedisUniqueComponent):
     AUTO_KEY = 'c:{coll}:autos'
 
     COLL_CDXJ_KEY = 'c:{coll}:cdxj'
+    COLL_CDXJ_MERGED_KEY = 'c:{coll}:cdxj:m'
 
     CLOSE_WAIT_KEY = 'c:{coll}:wait:{id}'
 
@@ -60,16 +75,30 @@ class Collection(PagesMixin, RedisUniqueComponent):
 
     COMMIT_WAIT_KEY = 'w:{filename}'
 
+    COMMIT_STATE_KEY = 'w:{filename}:up'
+
     INDEX_FILE_KEY = '@index_file'
 
+    CDXJ_GEN_KEY = '@cdxj_gen'
+
+    REVISION_KEY = '@rev'
+    REVISED_AT_KEY = '@rev_at'
+
     COMMIT_WAIT_SECS = 30
 
+    COMMIT_STATE_SECS = 604800
+
     DEFAULT_COLL_DESC = ''
 
     DEFAULT_STORE_TYPE = 'local'
 
     COLL_CDXJ_TTL = 1800
 
+    CDXJ_LOAD_BATCH_SIZE = 1000
+    CDXJ_LOAD_POOL_SIZE = 4
+
+    CDXJ_FILE_INDEX = False
+
     def __init__(self, **kwargs):
         """Initialize collection Redis building block."""
         super(Collection, self).__init__(**kwargs)
@@ -88,11 +117,22 @@ class Collection(PagesMixin, RedisUniqueComponent):
         """
         cls.COLL_CDXJ_TTL = int(config['coll_cdxj_ttl'])
 
+        # warm indexes evicted within memory budget instead of expiring
+        IndexCache.init_props(config)
+        if IndexCache.MAX_SIZE:
+            cls.COLL_CDXJ_TTL = 0
+
+        cls.CDXJ_LOAD_BATCH_SIZE = int(config.get('coll_cdxj_load_batch_size', cls.CDXJ_LOAD_BATCH_SIZE))
+        cls.CDXJ_LOAD_POOL_SIZE = int(config.get('coll_cdxj_load_pool_size', cls.CDXJ_LOAD_POOL_SIZE))
+
+        cls.CDXJ_FILE_INDEX = get_bool(config.get('coll_cdxj_file_index', cls.CDXJ_FILE_INDEX))
+
         cls.DEFAULT_STORE_TYPE = os.environ.get('DEFAULT_STORAGE', 'local')
 
         cls.DEFAULT_COLL_DESC = config['coll_desc']
 
         cls.COMMIT_WAIT_SECS = int(config['commit_wait_secs'])
+        cls.COMMIT_STATE_SECS = int(config.get('commit_state_secs', cls.COMMIT_STATE_SECS))
 
     def create_recording(self, **kwargs):
         """Create recording.
@@ -109,6 +149,8 @@ class Collection(PagesMixin, RedisUniqueComponent):
 
         self.recs.add_object(recording, owner=True)
 
+        self.mark_cdxj_changed(recording)
+
         return recording
 
     def move_recording(self, obj, new_collection):
@@ -289,6 +331,8 @@ class Collection(PagesMixin, RedisUniqueComponent):
 
         self.lists.insert_ordered_object(blist, before_blist)
 
+        self.mark_revised()
+
     def remove_list(self, blist):
         """Remove list of bookmarks from ordered list.
 
@@ -304,6 +348,8 @@ class Collection(PagesMixin, RedisUniqueComponent):
 
         self.list_names.remove_object(blist)
 
+        self.remove_page_bookmarks(blist.get_page_bookmarks())
+
         blist.delete_me()
 
         return True
@@ -411,6 +457,33 @@ class Collection(PagesMixin, RedisUniqueComponent):
             self._warc_key = Recording.COLL_WARC_KEY.format(coll=self.my_id)
         return self._warc_key
 
+    def get_warc_checksums(self, names):
+        """Returns the catalogued checksums and sizes of the supplied WARCs
+
+        :param list names: The WARC names
+        :return: A dictionary with kind, checksum and size for each WARC, or None if not catalogued
+        :rtype: list[dict|None]
+        """
+        if not names:
+            return []
+
+        entries = self.redis.hmget(Recording.COLL_WARC_CHECKSUM_KEY.format(coll=self.my_id), names)
+        return [json.loads(entry) if entry else None for entry in entries]
+
+    def set_warc_checksum(self, name, kind, checksum, size):
+        """Adds the checksum and size of the supplied WARC to the catalog
+
+        :param str name: The WARC name
+        :param str kind: The kind of checksum
+        :param str checksum: The checksum
+        :param int size: The size of the WARC
+        """
+        if not checksum:
+            return
+
+        entry = json.dumps({'kind': kind, 'checksum': checksum, 'size': size})
+        self.redis.hset(Recording.COLL_WARC_CHECKSUM_KEY.format(coll=self.my_id), name, entry)
+
     def get_warc_path(self, name):
         """Returns the full path or URL to the WARC for the supplied recording name
 
@@ -488,12 +561,16 @@ class Collection(PagesMixin, RedisUniqueComponent):
                     self.redis.sadd(rec_warc_key, filename)
 
                 # CDX
-                index_files = files.get('indexes', [])
-                if index_files:
-                    index_filename = os.path.join(coll_dir, 'indexes', index_files[0])
+                for index_file in files.get('indexes', []):
+                    index_filename = os.path.join(coll_dir, 'indexes', index_file)
+
+                    # block index summary
+                    if index_file.endswith('.idx'):
+                        recording.set_prop(recording.INDEX_SUMMARY_KEY, index_filename)
+                        continue
 
                     with open(index_filename, 'rb') as fh:
-                        self.add_cdxj(fh.read())
+                        self.add_cdxj(b'\n'.join(iter_index_lines(fh)))
 
                     recording.set_prop(recording.INDEX_FILE_KEY, index_filename)
 
@@ -533,8 +610,27 @@ class Collection(PagesMixin, RedisUniqueComponent):
                         include_bookmarks='first',
                         convert_date=True,
                         check_slug=False,
-                        include_files=False):
+                        include_files=False,
+                        stream=False):
+        """Serialize collection.
+
+        If stream is set, pages, recording pages and lists are returned
+        as generators, read from Redis in batches while being encoded,
+        eg. with iter_json().
+
+        :param bool include_recordings: whether to include recordings
+        :param bool include_lists: whether to include lists of bookmarks
+        :param bool include_rec_pages: whether to include pages of each recording
+        :param bool include_pages: whether to include pages
+        :param str include_bookmarks: bookmarks to include in each list
+        :param bool convert_date: whether to convert date
+        :param check_slug: slug to check collection slug against, if any
+        :param bool include_files: whether to include WARC and CDX index filenames
+        :param bool stream: whether to return pages and lists as generators
 
+        :returns: collection
+        :rtype: dict
+        """
         data = super(Collection, self).serialize(convert_date=convert_date)
         data['id'] = self.name
 
@@ -549,8 +645,12 @@ class Collection(PagesMixin, RedisUniqueComponent):
 
             duration = 0
             for recording in recordings:
-                rec_data = recording.serialize(include_pages=include_rec_pages,
+                rec_data = recording.serialize(include_pages=include_rec_pages and not stream,
                                                include_files=include_files)
+
+                if include_rec_pages and stream:
+                    rec_data['pages'] = self.iter_rec_pages(recording)
+
                 rec_serialized.append(rec_data)
                 duration += rec_data.get('duration', 0)
 
@@ -561,8 +661,10 @@ class Collection(PagesMixin, RedisUniqueComponent):
 
         if include_lists:
             lists = self.get_lists(load=True, public_only=False)
-            data['lists'] = [blist.serialize(include_bookmarks=include_bookmarks,
-                                             convert_date=convert_date) for blist in lists]
+            lists = (blist.serialize(include_bookmarks=include_bookmarks,
+                                     convert_date=convert_date) for blist in lists)
+
+            data['lists'] = lists if stream else list(lists)
 
         if not data.get('desc'):
             data['desc'] = self.DEFAULT_COLL_DESC.format(self.name)
@@ -578,12 +680,55 @@ class Collection(PagesMixin, RedisUniqueComponent):
 
         if include_pages:
             if is_owner or data['public_index']:
-                data['pages'] = self.list_pages()
+                data['pages'] = self.iter_pages() if stream else self.list_pages()
 
         data.pop('num_downloads', '')
+        data.pop(self.CDXJ_GEN_KEY, '')
+        data.pop(self.REC_PAGES_INDEXED_KEY, '')
+        data.pop(self.PAGE_BOOKMARKS_INDEXED_KEY, '')
+        data.pop(self.REVISION_KEY, '')
+        data.pop(self.REVISED_AT_KEY, '')
 
         return data
 
+    def mark_updated(self, ts=None):
+        """Update collection and its owner, and increment revision.
+
+        :param ts: timestamp
+        :type: int or None
+        """
+        self.mark_revised()
+        super(Collection, self).mark_updated(ts)
+
+    def mark_revised(self, pi=None):
+        """Increment revision, after any change of serialized collection,
+        including its recordings, lists, bookmarks and pages.
+
+        :param pi: Redis interface, eg. pipeline of the change
+        :type: StrictRedis or None
+        """
+        if pi is None:
+            with redis_pipeline(self.redis) as pi:
+                self.mark_revised(pi)
+            return
+
+        pi.hincrby(self.info_key, self.REVISION_KEY, 1)
+        pi.hset(self.info_key, self.REVISED_AT_KEY, self._get_now())
+        self._invalidate_cached()
+
+    def get_update_stamp(self):
+        """Return loaded entries that are serialized, including revision,
+        and time of last update or revision.
+
+        :returns: entries and time of last update
+        :rtype: tuple
+        """
+        data, updated_at = super(Collection, self).get_update_stamp()
+        data[self.REVISION_KEY] = self.data.get(self.REVISION_KEY)
+
+        revised_at = int(self.data.get(self.REVISED_AT_KEY) or 0)
+        return data, max(updated_at, revised_at)
+
     def remove_recording(self, recording, delete=False):
         self.access.assert_can_admin_coll(self)
 
@@ -600,11 +745,15 @@ class Collection(PagesMixin, RedisUniqueComponent):
         if user:
             user.incr_size(-recording.size)
 
+        self.mark_revised()
+
+        # lines of removed recording can't be told apart, reload on next replay
+        self.evict_coll_index()
+
         if delete:
             storage = self.get_storage()
             return recording.delete_me(storage)
 
-        self.sync_coll_index(exists=True, do_async=True)
         return {}
 
     def delete_me(self):
@@ -634,6 +783,8 @@ class Collection(PagesMixin, RedisUniqueComponent):
         if DatShare.dat_share:
             DatShare.dat_share.unshare(self)
 
+        IndexCache(self.redis).remove(self.my_id)
+
         return errs
 
     def get_storage(self):
@@ -722,17 +873,44 @@ class Collection(PagesMixin, RedisUniqueComponent):
             return False
 
         commit_wait = self.COMMIT_WAIT_KEY.format(filename=full_filename)
+        commit_state = self.COMMIT_STATE_KEY.format(filename=full_filename)
 
-        if self.redis.set(commit_wait, '1', ex=self.COMMIT_WAIT_SECS, nx=True):
+        size = os.path.getsize(full_filename)
+
+        # if already uploaded and unchanged, eg. before committer restart, don't upload again
+        target_url, uploaded_size, kind, checksum = self.redis.hmget(commit_state, ['target', 'size',
+                                                                                 'kind', 'checksum'])
+        if uploaded_size != str(size):
+            target_url = None
+            kind = checksum = None
+
+        if not target_url and self.redis.set(commit_wait, '1', ex=self.COMMIT_WAIT_SECS, nx=True):
             if not storage.upload_file(user, self, None,
                                        filename, full_filename, obj_type):
 
                 self.redis.delete(commit_wait)
                 return False
 
+            target_url = storage.get_target_url(self, obj_type, filename)
+
+            commit_info = {'target': target_url, 'size': size}
+
+            # checksum computed during upload, if any
+            upload_checksum = storage.get_upload_checksum(target_url)
+            if upload_checksum:
+                kind, checksum = upload_checksum
+                commit_info['kind'] = kind
+                commit_info['checksum'] = checksum
+
+            with redis_pipeline(self.redis) as pi:
+                pi.hmset(commit_state, commit_info)
+                pi.expire(commit_state, self.COMMIT_STATE_SECS)
+
+            Stats(self.redis).incr_commit(size)
+
         # already uploaded, see if it is accessible
         # if so, finalize and delete original
-        remote_url = storage.get_upload_url(filename)
+        remote_url = storage.get_upload_url(filename, target_url)
         if not remote_url:
             logger.debug('File Commit: Not Yet Available: {0}'.format(full_filename))
             return False
@@ -741,6 +919,16 @@ class Collection(PagesMixin, RedisUniqueComponent):
             update_prop = update_prop or filename
             self.redis.hset(update_key, update_prop, remote_url)
 
+        self.redis.delete(commit_state)
+
+        # catalog checksum once, for WASAPI listing
+        # only read file again if checksum not computed during upload
+        if obj_type == 'warcs':
+            if checksum:
+                self.set_warc_checksum(filename, kind, checksum, size)
+            else:
+                self.set_warc_checksum(filename, *storage.get_checksum_and_size(remote_url))
+
         # just in case, if remote_url is actually same as original (local file double-commit?), just return
         if remote_url == orig_full_filename:
             logger.debug('File Already Committed: {0}'.format(remote_url))
@@ -765,36 +953,150 @@ class Collection(PagesMixin, RedisUniqueComponent):
         coll_cdxj_key = self.COLL_CDXJ_KEY.format(coll=self.my_id)
         return self.redis.exists(coll_cdxj_key)
 
-    def reset_cdxj_ttl(self, key=None):
+    def reset_cdxj_ttl(self, key=None, stat=None):
+        if IndexCache.MAX_SIZE:
+            IndexCache(self.redis).touch(self.my_id, stat)
+            return True
+
         if not key:
             key = self.COLL_CDXJ_KEY.format(coll=self.my_id)
         if self.COLL_CDXJ_TTL > 0:
-            self.redis.expire(key, self.COLL_CDXJ_TTL)
+            with redis_pipeline(self.redis) as pi:
+                pi.expire(key, self.COLL_CDXJ_TTL)
+                pi.expire(self.COLL_CDXJ_MERGED_KEY.format(coll=self.my_id), self.COLL_CDXJ_TTL)
             return True
         return False
 
+    def mark_cdxj_changed(self, recording):
+        """Mark recording as added or changed, to be (re)merged into
+        the collection CDX index on next sync.
+
+        :param Recording recording: recording
+        """
+        with redis_pipeline(self.redis) as pi:
+            pi.hdel(self.COLL_CDXJ_MERGED_KEY.format(coll=self.my_id), recording.my_id)
+            pi.hincrby(self.info_key, self.CDXJ_GEN_KEY, 1)
+
+        self._invalidate_cached()
+
+    def evict_coll_index(self):
+        """Remove collection CDX index, along with merged recordings."""
+        self.redis.delete(self.COLL_CDXJ_KEY.format(coll=self.my_id),
+                          self.COLL_CDXJ_MERGED_KEY.format(coll=self.my_id))
+
+        IndexCache(self.redis).update_size(self.my_id)
+
     def sync_coll_index(self, exists=False, do_async=False):
+        """Bring collection CDX index up to date. If loaded, merge only
+        recordings added or changed since last sync, as tracked by the
+        collection CDX generation, otherwise (if not exists) load all.
+
+        :param bool exists: only update an already loaded index
+        :param bool do_async: whether to load committed index files in the background
+        """
+        # collection replayed from recording index files, nothing to load
+        if self.CDXJ_FILE_INDEX:
+            return
+
+        self.access.assert_can_read_coll(self)
+
         coll_cdxj_key = self.COLL_CDXJ_KEY.format(coll=self.my_id)
-        if exists != self.redis.exists(coll_cdxj_key):
-            self.reset_cdxj_ttl(coll_cdxj_key)
+        merged_key = self.COLL_CDXJ_MERGED_KEY.format(coll=self.my_id)
+
+        pi = self.redis.pipeline(transaction=False)
+        pi.exists(coll_cdxj_key)
+        pi.hget(self.info_key, self.CDXJ_GEN_KEY)
+        pi.hget(merged_key, self.CDXJ_GEN_KEY)
+
+        loaded, gen, merged_gen = pi.execute()
+        gen = gen or '0'
+
+        # counted as cache access if replaying
+        stat = None if exists else 'cdxj_hits'
+
+        if not loaded:
+            if exists:
+                return
+
+            # expired along with merged recordings, or never loaded: load all
+            recs = self.recs.get_keys()
+            if not recs:
+                return
+
+            stat = 'cdxj_misses'
+
+            self.redis.delete(merged_key)
+
+            cdxj_keys = [self._get_rec_cdxj_key(rec) for rec in recs]
+            self.redis.zunionstore(coll_cdxj_key, cdxj_keys)
+
+        elif gen != (merged_gen or '0'):
+            merged = set(self.redis.hkeys(merged_key))
+            recs = [rec for rec in self.recs.get_keys() if rec not in merged]
+
+            cdxj_keys = [self._get_rec_cdxj_key(rec) for rec in recs]
+
+        else:
+            self.reset_cdxj_ttl(coll_cdxj_key, stat)
             return
 
-        cdxj_keys = self._get_rec_keys(Recording.CDXJ_KEY)
-        if not cdxj_keys:
+        # check all recording keys in one round-trip
+        pi = self.redis.pipeline(transaction=False)
+        for cdxj_key in cdxj_keys:
+            pi.exists(cdxj_key)
+
+        key_exists = pi.execute()
+
+        missing_keys = []
+        new_keys = []
+
+        for cdxj_key, found in zip(cdxj_keys, key_exists):
+            if not found:
+                missing_keys.append(cdxj_key)
+
+            elif loaded and cdxj_key != coll_cdxj_key:
+                new_keys.append(cdxj_key)
+
+        # merge new recordings still in redis into loaded index, server-side
+        if new_keys:
+            self.redis.zunionstore(coll_cdxj_key, [coll_cdxj_key] + new_keys)
+
+        with redis_pipeline(self.redis) as pi:
+            for rec in recs:
+                pi.hset(merged_key, rec, 1)
+
+            pi.hset(merged_key, self.CDXJ_GEN_KEY, gen)
+
+        self.reset_cdxj_ttl(coll_cdxj_key, stat)
+
+        if not missing_keys:
+            IndexCache(self.redis).update_size(self.my_id)
             return
 
-        self.redis.zunionstore(coll_cdxj_key, cdxj_keys)
-        self.reset_cdxj_ttl(coll_cdxj_key)
+        if do_async:
+            gevent.spawn(self._download_all_cdxj, missing_keys, coll_cdxj_key)
+        else:
+            self._download_all_cdxj(missing_keys, coll_cdxj_key)
+
+    def _get_rec_cdxj_key(self, rec):
+        # recordings may be indexed directly into the collection index (eg. player)
+        return Recording.CDXJ_KEY.format(rec=rec, coll=self.my_id)
+
+    def _download_all_cdxj(self, cdxj_keys, output_key):
+        """Load committed CDX index files into collection index,
+        at most CDXJ_LOAD_POOL_SIZE at a time.
+
+        :param list cdxj_keys: recording CDX index Redis keys
+        :param str output_key: collection CDX index Redis key
+        """
+        pool = gevent.pool.Pool(self.CDXJ_LOAD_POOL_SIZE)
 
-        ges = []
         for cdxj_key in cdxj_keys:
-            if self.redis.exists(cdxj_key):
-                continue
+            pool.spawn(self._do_download_cdxj, cdxj_key, output_key)
 
-            ges.append(gevent.spawn(self._do_download_cdxj, cdxj_key, coll_cdxj_key))
+        pool.join()
 
-        if not do_async:
-            res = gevent.joinall(ges)
+        IndexCache(self.redis).update_size(self.my_id)
 
     def _do_download_cdxj(self, cdxj_key, output_key):
         lock_key = None
@@ -817,11 +1119,14 @@ class Collection(PagesMixin, RedisUniqueComponent):
             while attempts < 10:
                 fh = None
                 try:
+                    start = time.time()
+
                     fh = load(cdxj_filename)
-                    buff = fh.read()
+                    count = self._load_cdxj_lines(iter_index_lines(fh), output_key)
 
-                    for cdxj_line in buff.splitlines():
-                        self.redis.zadd(output_key, 0, cdxj_line)
+                    elapsed = time.time() - start
+                    logger.debug('CDX Sync: Loaded {0} lines from {1} in {2:.2f}s ({3:.0f} lines/sec)'.format(
+                                 count, cdxj_filename, elapsed, count / elapsed if elapsed else count))
 
                     break
                 except Exception as e:
@@ -843,8 +1148,52 @@ class Collection(PagesMixin, RedisUniqueComponent):
             if lock_key:
                 self.redis.delete(lock_key)
 
+    def _load_cdxj_lines(self, cdxj_lines, output_key):
+        """Add CDX index lines to sorted set, CDXJ_LOAD_BATCH_SIZE
+        members per ZADD.
+
+        :param cdxj_lines: CDX index lines (iterable)
+        :param str output_key: sorted set Redis key
+
+        :returns: number of lines added
+        :rtype: int
+        """
+        count = 0
+        batch = []
+
+        for cdxj_line in cdxj_lines:
+            batch.append(0)
+            batch.append(cdxj_line)
+            count += 1
+
+            if count % self.CDXJ_LOAD_BATCH_SIZE == 0:
+                self._flush_cdxj_batch(batch, output_key)
+                batch = []
+
+        if batch:
+            self._flush_cdxj_batch(batch, output_key)
+
+        return count
+
+    def _flush_cdxj_batch(self, batch, output_key):
+        """Write batch of (score, CDX index line) pairs, keeping
+        the sorted set alive while a large index is still loading.
+
+        :param list batch: flattened score, member list
+        :param str output_key: sorted set Redis key
+        """
+        with redis_pipeline(self.redis) as pi:
+            pi.zadd(output_key, *batch)
+            if self.COLL_CDXJ_TTL > 0:
+                pi.expire(output_key, self.COLL_CDXJ_TTL)
+
+        # let other greenlets (eg. other recordings) proceed between batches
+        gevent.sleep(0)
+
 
 # ============================================================================
 Recording.OWNER_CLS = Collection
+IndexCache.INDEX_KEYS = [Collection.COLL_CDXJ_KEY,
+                         Collection.COLL_CDXJ_MERGED_KEY]
 BookmarkList.OWNER_CLS = Collection
 Auto.OWNER_CLS = Collection
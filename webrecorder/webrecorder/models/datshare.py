@@ -2,10 +2,9 @@ import os
 import requests
 import gevent
 import json
-import yaml
 from datetime import datetime
 
-from webrecorder.utils import get_bool, spawn_once
+from webrecorder.utils import get_bool, spawn_once, iter_json
 from collections import OrderedDict
 from tempfile import NamedTemporaryFile
 
@@ -60,10 +59,13 @@ class DatShare(object):
         data = {'collection': collection.serialize(include_bookmarks='all-serialize',
                                                    include_pages=False,
                                                    include_rec_pages=True,
-                                                   include_files=True)}
+                                                   include_files=True,
+                                                   stream=True)}
 
+        # json, a subset of yaml, can be written incrementally
         with NamedTemporaryFile('wt', delete=False) as fh:
-            yaml.dump(data, fh, default_flow_style=False)
+            for chunk in iter_json(data):
+                fh.write(chunk)
 
         return fh.name
 
@@ -1,4 +1,4 @@
-from webrecorder.utils import redis_pipeline
+from webrecorder.models.stats import StatsBuffer
 
 # ============================================================================
 class DynStats(object):
@@ -36,41 +36,49 @@ class DynStats(object):
         curr_url_key = self._res_url_templ(self.dyn_stats_key_templ,
                                            params, url)
 
-        with redis_pipeline(self.redis) as pi:
+        # written directly, to be found by requests from this stylesheet
+        if url.endswith('.css'):
+            css_res = self._res_url_templ(self.dyn_ref_templ, params, url)
+            self.redis.setex(css_res, self.dyn_stats_secs, referrer)
+
+        with StatsBuffer.pipeline(self.redis) as pi:
             pi.delete(curr_url_key)
 
             pi.hincrby(dyn_stats_key, source, 1)
             pi.expire(dyn_stats_key, self.dyn_stats_secs)
 
-            if url.endswith('.css'):
-                css_res = self._res_url_templ(self.dyn_ref_templ, params, url)
-                pi.setex(css_res, self.dyn_stats_secs, referrer)
-
             if ra_recording:
                 ra_recording.track_remote_archive(pi, source)
 
     def get_dyn_stats(self, user, collection, recording, sesh_id, stats_urls):
-        params = {'user': user.name,
-                  'coll': collection.my_id,
-                  'rec': recording.my_id if recording else 0,
-                  'id': sesh_id}
-
-        sum_stats = {}
-
-        for url in stats_urls:
-            dyn_stats_key = self._res_url_templ(self.dyn_stats_key_templ,
-                                                params, url)
+        all_stats = []
 
+        for dyn_stats_key in self.get_dyn_stats_keys(user, collection, recording, sesh_id, stats_urls):
             stats = self.redis.hgetall(dyn_stats_key)
             if not stats:
                 continue
 
             self.redis.expire(dyn_stats_key, self.dyn_stats_secs)
+            all_stats.append(stats)
+
+        return self.sum_dyn_stats(all_stats)
 
+    def get_dyn_stats_keys(self, user, collection, recording, sesh_id, stats_urls):
+        params = {'user': user.name,
+                  'coll': collection.my_id,
+                  'rec': recording.my_id if recording else 0,
+                  'id': sesh_id}
+
+        return [self._res_url_templ(self.dyn_stats_key_templ, params, url)
+                for url in stats_urls]
+
+    def sum_dyn_stats(self, all_stats):
+        sum_stats = {}
+
+        for stats in all_stats:
             for stat, value in stats.items():
                 sum_stats[stat] = int(value) + int(sum_stats.get(stat, 0))
 
-
         return sum_stats
 
     def get_cookie_key(self, user, collection, recording, sesh_id):
@@ -11,7 +11,7 @@ from warcio.warcwriter import BufferWARCWriter, WARCWriter
 from warcio.timeutils import iso_date_to_datetime
 
 
-from pywb.warcserver.index.cdxobject import CDXObject
+from pywb.indexer.archiveindexer import DefaultRecordParser
 
 import traceback
 import json
@@ -20,10 +20,14 @@ import atexit
 
 import base64
 import os
+import shutil
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 import gevent
 import redis
 
 from webrecorder.utils import SizeTrackingReader, CacheingLimitReader
+from webrecorder.load.wamloader import WAMLoader
 from webrecorder.utils import redis_pipeline, sanitize_title
 
 import logging
@@ -31,6 +35,7 @@ logger = logging.getLogger(__name__)
 
 
 BLOCK_SIZE = 16384 * 8
+CDXJ_SPOOL_SIZE = BLOCK_SIZE * 8
 EMPTY_DIGEST = '3I42H3S6NNFQ2MSVX7XZKYAYSCX5QBYJ'
 
 
@@ -81,9 +86,143 @@ class ImportStatusChecker(object):
         if props.get('files') == 0:
             props['size'] = props['total_size']
 
+        # size only reaches total size once the upload is done
+        elif not props['done']:
+            props['size'] = min(props['size'], props['total_size'] - 1)
+
         return props
 
 
+# ============================================================================
+class UploadRecordIter(object):
+    """WARC archive record iterator, splitting the archive into recordings.
+
+    Warcinfo records are consumed to find the boundaries of each recording,
+    all other records are passed on, for the cdx indexer record parser
+    to index.
+
+    :ivar BaseImporter importer: importer
+    :ivar ArchiveIterator arciterator: archive iterator
+    :ivar list infos: list of recordings (indices)
+    :ivar dict indexinfo: information about current index
+    """
+    def __init__(self, importer, stream):
+        """Initialize record iterator.
+
+        :param BaseImporter importer: importer
+        :param stream: file object
+        """
+        self.importer = importer
+        self.arciterator = ArchiveIterator(stream,
+                                           ensure_http_headers=True,
+                                           block_size=BLOCK_SIZE)
+        self.infos = []
+
+        self.indexinfo = None
+        self.last_indexinfo = None
+        self.is_first = True
+        self.remote_archives = None
+
+        self.all_infos = []
+
+    @property
+    def member_info(self):
+        return self.arciterator.member_info
+
+    def read_to_end(self, record=None):
+        self.arciterator.read_to_end(record)
+
+    def __iter__(self):
+        for record in self.arciterator:
+            if record.rec_type != 'warcinfo':
+                self.add_remote_archive(record)
+                self.split(self.arciterator.offset, None)
+                yield record
+                continue
+
+            warcinfo = None
+            try:
+                warcinfo = self.importer.parse_warcinfo(record)
+            except Exception as e:
+                print('Error Parsing WARCINFO')
+                traceback.print_exc()
+
+            self.arciterator.read_to_end(record)
+
+            self.split(self.member_info[0], warcinfo, record)
+
+    def add_remote_archive(self, record):
+        """Add remote archive of record, if any, to current recording.
+
+        :param record: WARC record
+        """
+        if self.remote_archives is None or not self.importer.wam_loader:
+            return
+
+        source_uri = record.rec_headers.get('WARC-Source-URI')
+        if source_uri:
+            res = self.importer.wam_loader.find_archive_for_url(source_uri)
+            if res:
+                self.remote_archives.add(res[2])
+
+    def split(self, curr_offset, warcinfo, record=None):
+        """Start new recording at warcinfo record, if any.
+
+        :param int curr_offset: offset of record
+        :param warcinfo: WARC information or None
+        :type: dict or None
+        :param record: warcinfo record
+        """
+        if self.last_indexinfo:
+            self.last_indexinfo['offset'] = curr_offset
+            self.last_indexinfo = None
+
+        if warcinfo and 'json-metadata' in warcinfo:
+            self.importer.add_index_info(self.infos, self.indexinfo, curr_offset)
+
+            self.indexinfo = warcinfo.get('json-metadata')
+            self.indexinfo['offset'] = None
+
+            if 'title' not in self.indexinfo:
+                self.indexinfo['title'] = 'Uploaded Recording'
+
+            if 'type' not in self.indexinfo:
+                self.indexinfo['type'] = 'recording'
+
+            self.indexinfo['ra'] = set()
+            self.remote_archives = self.indexinfo['ra']
+
+            self.last_indexinfo = self.indexinfo
+            self.all_infos.append(self.indexinfo)
+
+        elif self.is_first:
+            self.indexinfo = {'type': 'recording',
+                              'title': 'Uploaded Recording',
+                              'offset': 0,
+                             }
+            self.all_infos.append(self.indexinfo)
+
+        if self.is_first and warcinfo and 'software' in warcinfo:
+            self.indexinfo['warcinfo:software'] = warcinfo['software']
+            self.indexinfo['warcinfo:datetime'] = record.rec_headers.get('WARC-Date')
+
+        self.is_first = False
+
+    def get_index_info(self, offset):
+        """Return recording containing record at given offset.
+
+        :param int offset: offset of record
+
+        :returns: information about index or None
+        :rtype: dict or None
+        """
+        for indexinfo in reversed(self.all_infos):
+            if indexinfo['offset'] is not None and indexinfo['offset'] <= offset:
+                return indexinfo
+
+        return None
+
+
 # ============================================================================
 class BaseImporter(ImportStatusChecker):
     """WARC importer base class.
@@ -196,7 +335,8 @@ class BaseImporter(ImportStatusChecker):
 
         with redis_pipeline(self.redis) as pi:
             pi.hset(upload_key, 'size', 0)
-            pi.hset(upload_key, 'total_size', int(total_size * 2.5))
+            # archive is read twice: once when parsed and once when indexed
+            pi.hset(upload_key, 'total_size', total_size * 2)
             pi.hset(upload_key, 'total_files', num_files)
             pi.hset(upload_key, 'files', num_files)
 
@@ -219,10 +359,11 @@ class BaseImporter(ImportStatusChecker):
         :param int total_size: size of WARC archive
         :param Collection first_coll: collection
         """
+        last_end = 0
+
         try:
             count = 0
             num_recs = len(rec_infos)
-            last_end = 0
             page_id_map = {}
 
             for info in rec_infos:
@@ -237,11 +378,12 @@ class BaseImporter(ImportStatusChecker):
                                    info['coll'],
                                    info['rec'],
                                    info['offset'],
-                                   info['length'])
+                                   info['length'],
+                                   info['cdxj'])
                 else:
                     logger.debug('SKIP upload for zero-length recording')
 
-                self.process_pages(info, page_id_map, upload_key, total_size)
+                self.process_pages(info, page_id_map)
 
                 diff = info['offset'] - last_end
                 last_end = info['offset'] + info['length']
@@ -265,9 +407,12 @@ class BaseImporter(ImportStatusChecker):
 
         finally:
             # add remainder of file, assumed consumed/skipped, if any
-            last_end = stream.tell()
             stream.close()
 
+            for info in rec_infos:
+                if info['cdxj']:
+                    info['cdxj'].close()
+
             if last_end < total_size:
                 diff = total_size - last_end
                 self._add_split_padding(diff, upload_key)
@@ -280,13 +425,13 @@ class BaseImporter(ImportStatusChecker):
                 first_coll.sync_coll_index(exists=False, do_async=False)
                 first_coll.set_external_remove_on_expire()
 
-    def process_pages(self, info, page_id_map, upload_key, total_size):
+    def process_pages(self, info, page_id_map):
         pages = info.get('pages')
 
-        # detect pages if none
+        # use pages detected when parsed if none
         detected = False
         if pages is None:
-            pages = self.detect_pages(info['coll'], info['rec'], upload_key, total_size)
+            pages = info.get('detected_pages')
             detected = True
 
         # if no pages, nothing more to do
@@ -307,12 +452,9 @@ class BaseImporter(ImportStatusChecker):
             if self.max_auto_bookmarks:
                 pages = pages[:self.max_auto_bookmarks]
 
-            incr = int((total_size * 0.25) / len(pages))
-
             for page in pages:
                 page['page_id'] = page['id']
                 bookmark = blist.create_bookmark(page, incr_stats=False)
-                self.redis.hincrby(upload_key, 'size', incr)
 
     def har2warc(self, filename, stream):
         """Convert HTTP Archive format file to WARC archive.
@@ -407,6 +549,8 @@ class BaseImporter(ImportStatusChecker):
                                   'offset': info['offset'],
                                   'length': info['length'],
                                   'pages': info.get('pages', None),
+                                  'detected_pages': info.get('detected_pages'),
+                                  'cdxj': info.get('cdxj'),
                                   'collection': collection,
                                   'recording': recording,
                                   'created_at': info.get('created_at'),
@@ -444,46 +588,10 @@ class BaseImporter(ImportStatusChecker):
                     bookmark_data['page_id'] = page_id_map.get(page_id)
                 bookmark = blist.create_bookmark(bookmark_data, incr_stats=False)
 
-    def detect_pages(self, coll, rec, upload_key, total_size):
-        """Find pages in recording.
-
-        :param str coll: collection ID
-        :param str rec: recording ID
-
-        :returns: pages
-        :rtype: list
-        """
-        key = self.cdxj_key.format(coll=coll, rec=rec)
-
-        pages = []
-        count = 0
-
-        total_cdx = self.redis.zcard(key)
-
-        incr = int((total_size * 0.25) / total_cdx)
-        count = 0
-
-        for member, score in self.redis.zscan_iter(key, match='*', count=100):
-            cdxj = CDXObject(member.encode('utf-8'))
-
-            count += 1
-            self.redis.hincrby(upload_key, 'size', incr)
-
-            if self.is_page(cdxj):
-                pages.append(dict(url=cdxj['url'],
-                                  title=cdxj['url'],
-                                  timestamp=cdxj['timestamp']))
-
-                if self.max_detect_pages and len(pages) > self.max_detect_pages:
-                    self.redis.hincrby(upload_key, 'size', incr * (total_cdx - count))
-                    break
-
-        return pages
-
     def is_page(self, cdxj):
         """Return whether CDX/CDXJ index line is a page.
 
-        :param CDXObject cdxj: CDX/CDXJ index line
+        :param cdxj: CDX/CDXJ index line or index entry
 
         :returns: whether CDX/CDXJ index line is a page
         :rtype: bool
@@ -511,80 +619,59 @@ class BaseImporter(ImportStatusChecker):
 
         return False
 
-    def parse_uploaded(self, stream, expected_size):
+    def parse_uploaded(self, stream, expected_size, cdxj_filename=None):
         """Parse WARC archive.
 
+        The archive is read once: it is split into recordings, each record
+        is indexed and pages are detected in recordings that do not
+        list their pages.
+
         :param stream: file object
         :param int expected_size: expected WARC archive size
+        :param cdxj_filename: if set, WARC filename to write the CDXJ
+                              index of each recording under
+        :type: str or None
 
         :returns: list of recordings (indices)
         :rtype: list
         """
-        arciterator = ArchiveIterator(stream,
-                                      no_record_parse=True,
-                                      verify_http=True,
-                                      block_size=BLOCK_SIZE)
-        infos = []
-
-        last_indexinfo = None
-        indexinfo = None
-        is_first = True
-        remote_archives = None
-
-        for record in arciterator:
-            warcinfo = None
-            if record.rec_type == 'warcinfo':
-                try:
-                    warcinfo = self.parse_warcinfo(record)
-                except Exception as e:
-                    print('Error Parsing WARCINFO')
-                    traceback.print_exc()
-
-            elif remote_archives is not None:
-                source_uri = record.rec_headers.get('WARC-Source-URI')
-                if source_uri:
-                    if self.wam_loader:
-                        res = self.wam_loader.find_archive_for_url(source_uri)
-                        if res:
-                            remote_archives.add(res[2])
-
-            arciterator.read_to_end(record)
-
-            if last_indexinfo:
-                last_indexinfo['offset'] = arciterator.member_info[0]
-                last_indexinfo = None
+        record_iter = UploadRecordIter(self, stream)
 
-            if warcinfo and 'json-metadata' in warcinfo:
-                self.add_index_info(infos, indexinfo, arciterator.member_info[0])
+        parser = DefaultRecordParser(cdxj=True, append_post=True)
 
-                indexinfo = warcinfo.get('json-metadata')
-                indexinfo['offset'] = None
+        entry_iter = parser.join_request_records(parser.create_record_iter(record_iter))
 
-                if 'title' not in indexinfo:
-                    indexinfo['title'] = 'Uploaded Recording'
+        cdxj_writers = {}
 
-                if 'type' not in indexinfo:
-                    indexinfo['type'] = 'recording'
+        for entry in entry_iter:
+            if entry.record.rec_type == 'request' or not entry.get('url'):
+                continue
 
-                indexinfo['ra'] = set()
-                remote_archives = indexinfo['ra']
+            indexinfo = record_iter.get_index_info(int(entry['offset']))
+            if not indexinfo:
+                continue
 
-                last_indexinfo = indexinfo
+            if cdxj_filename:
+                writer = cdxj_writers.get(id(indexinfo))
+                if not writer:
+                    indexinfo['cdxj'] = self._cdxj_temp_file()
+                    writer = self.make_cdxj_writer(indexinfo['cdxj'])
+                    cdxj_writers[id(indexinfo)] = writer
 
-            elif is_first:
-                indexinfo = {'type': 'recording',
-                             'title': 'Uploaded Recording',
-                             'offset': 0,
-                            }
+                writer.write(entry, cdxj_filename)
 
-            if is_first and warcinfo and 'software' in warcinfo:
-                indexinfo['warcinfo:software'] = warcinfo['software']
-                indexinfo['warcinfo:datetime'] = record.rec_headers.get('WARC-Date')
+            if indexinfo.get('pages') is None:
+                self.add_detected_page(indexinfo, entry)
 
-            is_first = False
+        if record_iter.indexinfo:
+            self.add_index_info(record_iter.infos, record_iter.indexinfo, stream.tell())
 
-        if indexinfo:
-            self.add_index_info(infos, indexinfo, stream.tell())
+        if cdxj_filename:
+            for indexinfo in record_iter.infos:
+                if 'cdxj' in indexinfo:
+                    indexinfo['cdxj'].seek(0)
+                else:
+                    indexinfo['cdxj'] = self._cdxj_temp_file()
 
         # if anything left over, likely due to WARC error, consume remainder
         if stream.tell() < expected_size:
@@ -593,7 +680,23 @@ class BaseImporter(ImportStatusChecker):
                 if not buff:
                     break
 
-        return infos
+        return record_iter.infos
+
+    def add_detected_page(self, indexinfo, entry):
+        """Add index entry to detected pages of recording if it is a page.
+
+        :param dict indexinfo: information about index
+        :param entry: index entry
+        """
+        pages = indexinfo.setdefault('detected_pages', [])
+
+        if self.max_detect_pages and len(pages) > self.max_detect_pages:
+            return
+
+        if self.is_page(entry):
+            pages.append(dict(url=entry['url'],
+                              title=entry['url'],
+                              timestamp=entry['timestamp']))
 
     def add_index_info(self, infos, indexinfo, curr_offset):
         """Add index to list of recordings.
@@ -655,12 +758,23 @@ class BaseImporter(ImportStatusChecker):
     def to_gmt_string(cls, dt):
         return iso_date_to_datetime(dt).strftime("%Y-%m-%d %H:%M:%S") + ' GMT'
 
-    def do_upload(self, upload_key, filename, stream, user, coll, rec, offset, length):
+    def do_upload(self, upload_key, filename, stream, user, coll, rec, offset, length, cdxj=None):
         raise NotImplemented()
 
     def launch_upload(self, func, *args):
         raise NotImplemented()
 
+    def make_cdxj_writer(self, out):
+        raise NotImplemented()
+
+    def _cdxj_temp_file(self):
+        """Return temporary file for CDXJ index of recording.
+
+        :returns: temporary file
+        :rtype: SpooledTemporaryFile
+        """
+        return SpooledTemporaryFile(max_size=CDXJ_SPOOL_SIZE)
+
     def _get_upload_id(self):
         raise NotImplemented()
 
@@ -734,9 +848,11 @@ class UploadImporter(BaseImporter):
         return self.handle_upload(temp_file, upload_id, upload_key, infos, filename,
                                   user, force_coll_name, total_size)
 
-    def do_upload(self, upload_key, filename, stream, user, coll, rec, offset, length):
+    def do_upload(self, upload_key, filename, stream, user, coll, rec, offset, length, cdxj=None):
         """Send PUT request to upload recording.
 
+        The recording is indexed by the recorder once stored.
+
         :param str upload_key: upload Redis key
         :param str filename: WARC archive filename
         :param stream: file object
@@ -745,6 +861,7 @@ class UploadImporter(BaseImporter):
         :param str rec: record ID
         :param int offset: offset to start of stream
         :param int length: length of recording
+        :param cdxj: CDXJ index of recording (not used)
         """
         stream.seek(offset)
 
@@ -843,14 +960,21 @@ class InplaceImporter(BaseImporter):
     :type: Collection or None
     :ivar str cache_dir: cache directory
     :ivar str wr_temp_coll: temporary collection
+    :ivar int index_processes: number of indexing processes
     """
-    def __init__(self, redis, config, user, indexer, upload_id, create_coll=True, cache_dir=None):
+    def __init__(self, redis, config, user, indexer, upload_id, create_coll=True, cache_dir=None,
+                 index_processes=None):
         wam_loader = indexer.wam_loader if indexer else None
         super(InplaceImporter, self).__init__(redis, config, wam_loader)
         self.indexer = indexer
         self.upload_id = upload_id
         self.cache_dir = cache_dir
 
+        if index_processes is None:
+            index_processes = config.get('import_index_processes', 0)
+
+        self.index_processes = int(index_processes or 0)
+
         self.wr_temp_coll = config['wr_temp_coll']
 
         if not create_coll:
@@ -865,6 +989,10 @@ class InplaceImporter(BaseImporter):
     def multifile_upload(self, user, files):
         """Import multiple files.
 
+        If more than one indexing process is configured, the files are
+        parsed and indexed concurrently in a process pool, and then
+        imported in the given order.
+
         :param User user: user
         :param list files: list of filenames
         """
@@ -879,40 +1007,125 @@ class InplaceImporter(BaseImporter):
 
         gevent.sleep(0)
 
+        if self.index_processes > 1 and len(files) > 1:
+            self.multifile_parallel_upload(user, files, upload_id, upload_key)
+            return
+
         for filename in files:
-            size = 0
-            fh = None
-            try:
-                size = os.path.getsize(filename)
-                fh = open(filename, 'rb')
+            self.import_file(user, filename, upload_id, upload_key)
 
-                self.redis.hset(upload_key, 'filename', filename)
+    def multifile_parallel_upload(self, user, files, upload_id, upload_key):
+        """Import multiple files, parsed and indexed in a process pool.
 
-                stream = SizeTrackingReader(fh, size, self.redis, upload_key)
+        :param User user: user
+        :param list files: list of filenames
+        :param str upload_id: upload ID
+        :param str upload_key: upload Redis key
+        """
+        params = {'param.user': user.name}
+
+        # HAR files are converted and parsed in this process
+        args = [(filename, self.indexer.get_index_filename(filename, params))
+                for filename in files if not filename.endswith('.har')]
+
+        executor = ProcessPoolExecutor(max_workers=min(self.index_processes, len(args) or 1),
+                                       mp_context=multiprocessing.get_context('spawn'),
+                                       initializer=init_index_worker,
+                                       initargs=(self.indexer.cdxj_writer_cls, self.max_detect_pages))
+
+        with executor:
+            # results are returned in order of files
+            parsed_iter = executor.map(parse_in_index_worker, args)
+
+            for filename in files:
+                infos = None
+                if not filename.endswith('.har'):
+                    # if indexing process failed (eg. pool broken), parse in this process
+                    try:
+                        infos = next(parsed_iter)
+                    except Exception:
+                        traceback.print_exc()
+
+                self.import_file(user, filename, upload_id, upload_key, infos)
+
+    def import_file(self, user, filename, upload_id, upload_key, parsed_infos=None):
+        """Import file.
+
+        :param User user: user
+        :param str filename: filename
+        :param str upload_id: upload ID
+        :param str upload_key: upload Redis key
+        :param parsed_infos: list of recordings (indices), if file
+                             was already parsed by an indexing process
+        :type: list or None
+        """
+        size = 0
+        fh = None
+        size_stream = None
+        try:
+            size = os.path.getsize(filename)
+            fh = open(filename, 'rb')
+
+            self.redis.hset(upload_key, 'filename', filename)
+
+            if parsed_infos is not None:
+                infos = self.load_parsed_infos(parsed_infos)
+
+                # file already read by indexing process
+                fh.seek(size)
+                self.redis.hincrby(upload_key, 'size', size)
+
+            else:
+                stream = size_stream = SizeTrackingReader(fh, size, self.redis, upload_key)
 
                 if filename.endswith('.har'):
                     stream, expected_size = self.har2warc(filename, stream)
                     fh.close()
                     fh = stream
 
-                infos = self.parse_uploaded(stream, size)
+                cdxj_filename = self.indexer.get_index_filename(fh.name, {'param.user': user.name})
 
-                res = self.handle_upload(fh, upload_id, upload_key, infos, filename,
-                                         user, False, size)
+                infos = self.parse_uploaded(stream, size, cdxj_filename)
 
-                assert('error' not in res)
-            except Exception as e:
-                traceback.print_exc()
-                print('ERROR PARSING: ' + filename)
-                print(e)
-                if fh:
-                    rem = size - fh.tell()
-                    if rem > 0:
-                        self.redis.hincrby(upload_key, 'size', rem)
-                    self.redis.hincrby(upload_key, 'files', -1)
-                    fh.close()
+            res = self.handle_upload(fh, upload_id, upload_key, infos, filename,
+                                     user, False, size)
 
-    def do_upload(self, upload_key, filename, stream, user, coll, rec, offset, length):
+            assert('error' not in res)
+        except Exception as e:
+            traceback.print_exc()
+            print('ERROR PARSING: ' + filename)
+            print(e)
+            if size_stream:
+                size_stream.flush_size()
+
+            if fh:
+                rem = size - fh.tell()
+                if rem > 0:
+                    self.redis.hincrby(upload_key, 'size', rem)
+                self.redis.hincrby(upload_key, 'files', -1)
+                fh.close()
+
+    def load_parsed_infos(self, infos):
+        """Load CDXJ index files written by indexing process.
+
+        :param list infos: list of recordings (indices)
+
+        :returns: list of recordings (indices)
+        :rtype: list
+        """
+        for info in infos:
+            cdxj_path = info['cdxj']
+            info['cdxj'] = self._cdxj_temp_file()
+
+            with open(cdxj_path, 'rb') as fh:
+                shutil.copyfileobj(fh, info['cdxj'])
+
+            os.remove(cdxj_path)
+            info['cdxj'].seek(0)
+
+        return infos
+
+    def do_upload(self, upload_key, filename, stream, user, coll, rec, offset, length, cdxj=None):
         """Upload recording.
 
         :param str upload_key: upload Redis key
@@ -923,9 +1136,8 @@ class InplaceImporter(BaseImporter):
         :param str rec: recording ID
         :param int offset: offset to start of stream
         :param int length: length of recording
+        :param cdxj: CDXJ index of recording, written when parsed
         """
-        stream.seek(offset)
-
         if hasattr(stream, 'name'):
             filename = stream.name
 
@@ -936,7 +1148,21 @@ class InplaceImporter(BaseImporter):
                  }
 
         self.indexer.add_warc_file(filename, params)
-        self.indexer.add_urls_to_index(stream, params, filename, length)
+
+        if cdxj:
+            self.indexer.add_cdxj_to_index(cdxj, params, length)
+        else:
+            stream.seek(offset)
+            self.indexer.add_urls_to_index(stream, params, filename, length)
+
+    def make_cdxj_writer(self, out):
+        """Return CDXJ index writer.
+
+        :param out: file object
+
+        :returns: CDXJ index writer
+        """
+        return self.indexer.cdxj_writer_cls(out)
 
     def _get_upload_id(self):
         """Return upload ID."""
@@ -1015,3 +1241,109 @@ class InplaceImporter(BaseImporter):
 
         return self.the_collection
 
+
+
+# ============================================================================
+class IndexWorkerImporter(BaseImporter):
+    """WARC archive parser, run in an indexing process.
+
+    Only parses and indexes WARC archives, writing the CDXJ index of
+    each recording to a file; Redis is only accessed by the importer
+    in the main process.
+
+    :ivar cdxj_writer_cls: CDXJ index writer class
+    :ivar int max_detect_pages: maximum number of detectable pages
+    """
+    def __init__(self, cdxj_writer_cls, max_detect_pages):
+        """Initialize indexing process importer.
+
+        :param cdxj_writer_cls: CDXJ index writer class
+        :param int max_detect_pages: maximum number of detectable pages
+        """
+        self.cdxj_writer_cls = cdxj_writer_cls
+        self.max_detect_pages = max_detect_pages
+
+        self.wam_loader = WAMLoader()
+        self.cdxj_writer_cls.wam_loader = self.wam_loader
+
+        self.temp_files = []
+
+    def parse_file(self, filename, cdxj_filename):
+        """Parse WARC archive file.
+
+        :param str filename: filename
+        :param str cdxj_filename: WARC filename to write the CDXJ index under
+
+        :returns: list of recordings (indices), or None if parsing failed
+        :rtype: list or None
+        """
+        self.temp_files = []
+
+        try:
+            with open(filename, 'rb') as fh:
+                infos = self.parse_uploaded(fh, os.path.getsize(filename), cdxj_filename)
+
+        except Exception:
+            traceback.print_exc()
+
+            # remove CDXJ index files already created
+            for temp_file in self.temp_files:
+                temp_file.close()
+                try:
+                    os.remove(temp_file.name)
+                except OSError:
+                    pass
+
+            self.temp_files = []
+            return None
+
+        self.temp_files = []
+
+        for info in infos:
+            info['cdxj'].close()
+            info['cdxj'] = info['cdxj'].name
+
+        return infos
+
+    def make_cdxj_writer(self, out):
+        """Return CDXJ index writer.
+
+        :param out: file object
+
+        :returns: CDXJ index writer
+        """
+        return self.cdxj_writer_cls(out)
+
+    def _cdxj_temp_file(self):
+        """Return temporary file for CDXJ index of recording.
+
+        :returns: temporary file
+        :rtype: NamedTemporaryFile
+        """
+        temp_file = NamedTemporaryFile(suffix='.cdxj', delete=False)
+        self.temp_files.append(temp_file)
+        return temp_file
+
+
+index_worker = None
+
+
+def init_index_worker(cdxj_writer_cls, max_detect_pages):
+    """Initialize indexing process.
+
+    :param cdxj_writer_cls: CDXJ index writer class
+    :param int max_detect_pages: maximum number of detectable pages
+    """
+    global index_worker
+    index_worker = IndexWorkerImporter(cdxj_writer_cls, max_detect_pages)
+
+
+def parse_in_index_worker(args):
+    """Parse WARC archive file in indexing process.
+
+    :param tuple args: filename and WARC filename to write the CDXJ index under
+
+    :returns: list of recordings (indices), or None if parsing failed
+    :rtype: list or None
+    """
+    return index_worker.parse_file(*args)
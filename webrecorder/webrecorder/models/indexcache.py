@@ -0,0 +1,220 @@
+import time
+
+from webrecorder.utils import redis_pipeline
+
+
+# ============================================================================
+class IndexCache(object):
+    """Warm collection indexes (replay CDX index), kept within a Redis
+    memory budget by evicting the least recently used collections,
+    instead of expiring each after a fixed TTL.
+
+    The size of each collection's warm indexes is estimated from the number
+    of entries and a sample of their length, and re-estimated whenever they
+    are (re)loaded. Sizes and last access times are shared by all workers.
+
+    :cvar str LRU_KEY: collections by last access Redis key
+    :cvar str SIZE_KEY: estimated size of each collection's warm indexes Redis key
+    :cvar str STATS_KEY: hit, miss and eviction counters and total size Redis key
+    :cvar list INDEX_KEYS: Redis key templates of a collection's warm indexes
+    :cvar int MAX_SIZE: memory budget in bytes, if 0 warm indexes expire after a TTL
+    :cvar int ENTRY_OVERHEAD: estimated Redis memory overhead per entry, in bytes
+    :cvar int SAMPLE_SIZE: entries sampled to estimate entry length
+    :cvar int EVICT_BATCH: least recently used collections read per round-trip
+    """
+    LRU_KEY = 'ic:lru'
+    SIZE_KEY = 'ic:size'
+    STATS_KEY = 'ic:stats'
+
+    INDEX_KEYS = []
+
+    MAX_SIZE = 0
+    ENTRY_OVERHEAD = 64
+    SAMPLE_SIZE = 10
+    EVICT_BATCH = 10
+
+    STATS = ('cdxj_hits', 'cdxj_misses', 'evictions')
+
+    @classmethod
+    def init_props(cls, config):
+        """Initialize class variables.
+
+        :param dict config: Webrecorder configuration
+        """
+        cls.MAX_SIZE = int(config.get('coll_index_cache_max_size', cls.MAX_SIZE))
+        cls.ENTRY_OVERHEAD = int(config.get('coll_index_cache_entry_overhead', cls.ENTRY_OVERHEAD))
+
+    def __init__(self, redis):
+        self.redis = redis
+
+    def touch(self, coll, stat=None):
+        """Mark collection's warm indexes as most recently used.
+
+        :param str coll: collection ID
+        :param str stat: counter to increment, if any
+        """
+        if not self.MAX_SIZE:
+            return
+
+        with redis_pipeline(self.redis) as pi:
+            pi.zadd(self.LRU_KEY, time.time(), coll)
+            if stat:
+                pi.hincrby(self.STATS_KEY, stat, 1)
+
+    def update_size(self, coll):
+        """Re-estimate size of collection's warm indexes, then evict
+        least recently used collections (other than this one) until
+        the total size is within budget.
+
+        :param str coll: collection ID
+        """
+        if not self.MAX_SIZE:
+            return
+
+        size = self.estimate_size(coll)
+
+        # replace size and adjust total atomically, retrying if
+        # sizes are changed concurrently (eg. reload by another worker)
+        def do_update(pi):
+            old_size = int(pi.hget(self.SIZE_KEY, coll) or 0)
+
+            pi.multi()
+            if size:
+                pi.hset(self.SIZE_KEY, coll, size)
+                pi.zadd(self.LRU_KEY, time.time(), coll)
+            else:
+                pi.hdel(self.SIZE_KEY, coll)
+                pi.zrem(self.LRU_KEY, coll)
+
+            pi.hincrby(self.STATS_KEY, 'size', size - old_size)
+
+        total = self.redis.transaction(do_update, self.SIZE_KEY)[-1]
+
+        if total > self.MAX_SIZE:
+            self.evict(total, exclude=coll)
+
+    def estimate_size(self, coll):
+        """Estimate Redis memory used by collection's warm indexes.
+
+        :param str coll: collection ID
+
+        :returns: size in bytes
+        :rtype: int
+        """
+        keys = [templ.format(coll=coll) for templ in self.INDEX_KEYS]
+
+        pi = self.redis.pipeline(transaction=False)
+        for key in keys:
+            pi.type(key)
+
+        key_types = pi.execute()
+
+        pi = self.redis.pipeline(transaction=False)
+        for key, key_type in zip(keys, key_types):
+            if key_type == 'zset':
+                pi.zcard(key)
+                pi.zrange(key, 0, self.SAMPLE_SIZE - 1)
+            elif key_type == 'hash':
+                pi.hlen(key)
+                pi.hscan(key, 0, count=self.SAMPLE_SIZE)
+
+        res = pi.execute()
+
+        size = 0
+        for count, sample in zip(res[::2], res[1::2]):
+            if not count:
+                continue
+
+            # hscan returns cursor, dict
+            if isinstance(sample, tuple):
+                sample = [n + v for n, v in sample[1].items()]
+
+            if sample:
+                avg_len = sum(len(entry) for entry in sample) / len(sample)
+            else:
+                avg_len = 0
+
+            size += int(count * (avg_len + self.ENTRY_OVERHEAD))
+
+        return size
+
+    def evict(self, total, exclude=None):
+        """Delete warm indexes of least recently used collections
+        until total size is within budget.
+
+        :param int total: current total size
+        :param str exclude: collection ID not to evict
+        """
+        start = 0
+        while total > self.MAX_SIZE:
+            colls = self.redis.zrange(self.LRU_KEY, start, start + self.EVICT_BATCH - 1)
+            if not colls:
+                break
+
+            colls = [coll for coll in colls if coll != exclude]
+            if not colls:
+                start += self.EVICT_BATCH
+                continue
+
+            # collections already evicted by another worker have no size
+            def do_evict(pi):
+                sizes = pi.hmget(self.SIZE_KEY, colls)
+
+                evicted = []
+                freed = 0
+
+                for coll, size in zip(colls, sizes):
+                    evicted.append(coll)
+                    freed += int(size or 0)
+                    if total - freed <= self.MAX_SIZE:
+                        break
+
+                pi.multi()
+                for coll in evicted:
+                    pi.delete(*[templ.format(coll=coll) for templ in self.INDEX_KEYS])
+                    pi.zrem(self.LRU_KEY, coll)
+                    pi.hdel(self.SIZE_KEY, coll)
+
+                pi.hincrby(self.STATS_KEY, 'size', -freed)
+                pi.hincrby(self.STATS_KEY, 'evictions', len(evicted))
+                return freed
+
+            total -= self.redis.transaction(do_evict, self.SIZE_KEY,
+                                            value_from_callable=True)
+
+    def remove(self, coll):
+        """Remove collection, eg. when deleted, from cache accounting.
+
+        :param str coll: collection ID
+        """
+        if not self.MAX_SIZE:
+            return
+
+        def do_remove(pi):
+            size = int(pi.hget(self.SIZE_KEY, coll) or 0)
+
+            pi.multi()
+            pi.zrem(self.LRU_KEY, coll)
+            pi.hdel(self.SIZE_KEY, coll)
+            pi.hincrby(self.STATS_KEY, 'size', -size)
+
+        self.redis.transaction(do_remove, self.SIZE_KEY)
+
+    def get_stats(self):
+        """Return cache counters, total size, budget and number of
+        warm collections.
+
+        :returns: cache stats
+        :rtype: dict
+        """
+        pi = self.redis.pipeline(transaction=False)
+        pi.hgetall(self.STATS_KEY)
+        pi.zcard(self.LRU_KEY)
+
+        counts, num_colls = pi.execute()
+
+        stats = {name: int(counts.get(name, 0)) for name in self.STATS}
+        stats['size'] = int(counts.get('size', 0))
+        stats['max_size'] = self.MAX_SIZE
+        stats['collections'] = num_colls
+        return stats
@@ -1,8 +1,7 @@
 from webrecorder.models.base import RedisUniqueComponent, RedisOrderedList
 from webrecorder.utils import get_bool, redis_pipeline, get_new_id
 from webrecorder.models.stats import Stats
-
-import json
+from webrecorder.models.packed import PackedFormat
 
 
 # ============================================================================
@@ -17,6 +16,8 @@ class BookmarkList(RedisUniqueComponent):
 
     BOOKMARK_COUNTER = 'l:{blist}:c'
 
+    BOOKMARK_FORMAT = PackedFormat({1: ('url', 'timestamp', 'title', 'browser', 'desc', 'page_id')})
+
     def __init__(self, **kwargs):
         super(BookmarkList, self).__init__(**kwargs)
         self.bookmark_order = RedisOrderedList(self.BOOK_ORDER_KEY, self)
@@ -58,13 +59,13 @@ class BookmarkList(RedisUniqueComponent):
 
         self.bookmark_order.insert_ordered_id(bid, props.get('before_id'))
 
-        self.redis.hset(self.BOOK_CONTENT_KEY.format(blist=self.my_id), bid, json.dumps(bookmark))
+        self.redis.hset(self.BOOK_CONTENT_KEY.format(blist=self.my_id), bid, self.BOOKMARK_FORMAT.pack(bookmark))
 
         if incr_stats:
             Stats(self.redis).incr_bookmark_add()
 
         if page_id:
-            collection.clear_page_bookmark_cache()
+            collection.add_page_bookmarks({page_id: {bid: self.my_id}})
             self.load_pages([bookmark])
 
         return bookmark
@@ -75,28 +76,27 @@ class BookmarkList(RedisUniqueComponent):
 
         all_bookmarks = {}
 
-        clear_cache = False
+        page_bookmarks = {}
 
         for bookmark_data in bookmarks:
             # don't store rec id, if provided
             bookmark_data.pop('rec', '')
 
             # if a page is specified for this bookmark, ensure that it has the same url and timestamp
-            page_id = bookmark_data.get('page_id')
-            if page_id:
-                clear_cache = True
-
             bid = self.get_new_bookmark_id()
             bookmark_data['id'] = bid
 
-            all_bookmarks[bid] = json.dumps(bookmark_data)
+            page_id = bookmark_data.get('page_id')
+            if page_id:
+                page_bookmarks.setdefault(page_id, {})[bid] = self.my_id
+
+            all_bookmarks[bid] = self.BOOKMARK_FORMAT.pack(bookmark_data)
 
         self.bookmark_order.insert_ordered_ids(all_bookmarks.keys())
 
         self.redis.hmset(self.BOOK_CONTENT_KEY.format(blist=self.my_id), all_bookmarks)
 
-        if clear_cache:
-            self.get_owner().clear_page_bookmark_cache()
+        collection.add_page_bookmarks(page_bookmarks)
 
         Stats(self.redis).incr_bookmark_add(len(bookmarks))
 
@@ -112,7 +112,13 @@ class BookmarkList(RedisUniqueComponent):
         else:
             bookmarks = []
 
-        bookmarks = [json.loads(bookmark) for bookmark in bookmarks]
+        bookmarks = self.BOOKMARK_FORMAT.unpack_all(bookmarks)
+
+        for bid, bookmark in zip(order, bookmarks):
+            if bookmark:
+                bookmark['id'] = bid
+
+        bookmarks = [bookmark for bookmark in bookmarks if bookmark]
         if not load_pages:
             return bookmarks
 
@@ -131,28 +137,35 @@ class BookmarkList(RedisUniqueComponent):
         if not bookmark:
             return None
 
-        bookmark = json.loads(bookmark)
+        bookmark = self.BOOKMARK_FORMAT.unpack(bookmark)
+        bookmark['id'] = bid
         self.load_pages([bookmark])
         return bookmark
 
     def update_bookmark(self, bid, props):
         self.access.assert_can_write_coll(self.get_owner())
 
-        bookmark = self.get_bookmark(bid)
+        key = self.BOOK_CONTENT_KEY.format(blist=self.my_id)
+        bookmark = self.redis.hget(key, bid)
 
         if not bookmark:
             return False
 
+        bookmark = self.BOOKMARK_FORMAT.unpack(bookmark)
+        bookmark['id'] = bid
+
+        # page_id not changed, so page->bookmarks index stays as is
         AVAIL_PROPS = ('title', 'url', 'timestamp', 'browser', 'desc')
 
         for prop in props:
             if prop in AVAIL_PROPS:
                 bookmark[prop] = props[prop]
 
-        self.redis.hset(self.BOOK_CONTENT_KEY.format(blist=self.my_id), bid, json.dumps(bookmark))
+        self.redis.hset(key, bid, self.BOOKMARK_FORMAT.pack(bookmark))
 
         Stats(self.redis).incr_bookmark_mod()
 
+        self.load_pages([bookmark])
         return bookmark
 
     def remove_bookmark(self, bid):
@@ -162,14 +175,15 @@ class BookmarkList(RedisUniqueComponent):
         if not res:
             return False
 
-        # check if bookmark had a page_id
-        bookmark = self.get_bookmark(bid)
-        page_id = bookmark.get('page_id')
+        key = self.BOOK_CONTENT_KEY.format(blist=self.my_id)
+
+        # check if bookmark had a page_id, even if page no longer exists
+        bookmark = self.redis.hget(key, bid)
+        page_id = self.BOOKMARK_FORMAT.unpack(bookmark).get('page_id') if bookmark else None
         if page_id:
-            #self.get_owner().remove_page_bookmark(page_id, bid)
-            self.get_owner().clear_page_bookmark_cache()
+            self.get_owner().remove_page_bookmarks({page_id: {bid: self.my_id}})
 
-        if self.redis.hdel(self.BOOK_CONTENT_KEY.format(blist=self.my_id), bid) == 1:
+        if self.redis.hdel(key, bid) == 1:
             Stats(self.redis).incr_bookmark_del()
             return True
         else:
@@ -234,7 +248,7 @@ class BookmarkList(RedisUniqueComponent):
 
         for bookmark, page in zip(page_bookmarks, page_data_list):
             if page:
-                bookmark['page'] = json.loads(page)
+                bookmark['page'] = page
                 bookmark['page']['id'] = bookmark['page_id']
             else:
                 bookmark.pop('page_id', '')
@@ -259,6 +273,21 @@ class BookmarkList(RedisUniqueComponent):
         if desc is not None:
             self.set_prop('desc', desc)
 
+    def get_page_bookmarks(self):
+        """Return bookmarks with a page, by page ID.
+
+        :returns: bookmark IDs and list IDs, by page ID
+        :rtype: dict
+        """
+        page_bookmarks = {}
+
+        for bookmark in self.get_bookmarks(load_pages=False):
+            page_id = bookmark.get('page_id')
+            if page_id:
+                page_bookmarks.setdefault(page_id, {})[bookmark['id']] = self.my_id
+
+        return page_bookmarks
+
     def delete_me(self):
         self.access.assert_can_write_coll(self.get_owner())
 
@@ -0,0 +1,195 @@
+import json
+
+
+# ============================================================================
+class PackedFormat(object):
+    """Compact, versioned encoding of JSON objects with mostly known string
+    fields, eg. pages and bookmarks, stored as Redis hash values.
+
+    An object is packed as the values of the known fields, in order, with
+    trailing missing fields dropped, followed by the format version,
+    separated by SEP. The version is followed by a JSON object of all
+    other fields, if there are any. Known fields that are not strings or
+    that contain SEP are stored in this object as well, as are other
+    missing known fields, listed under the MISSING key.
+
+    Values stored as plain JSON objects, before packing was introduced,
+    never contain SEP (escaped by JSON) and are decoded as is.
+
+    :cvar str SEP: value separator
+    :cvar str MISSING: key of missing known fields in other fields object
+    :ivar dict versions: known fields, by format version
+    :ivar int version: current format version
+    :ivar tuple fields: known fields of current format version
+    :ivar tuple omit: fields not stored, eg. ID stored as hash field
+    """
+    SEP = '\x1f'
+    MISSING = ''
+
+    def __init__(self, versions, omit=('id',)):
+        self.versions = versions
+        self.version = max(versions)
+        self.fields = versions[self.version]
+        self.omit = omit
+
+    def pack(self, obj):
+        """Encode object.
+
+        :param dict obj: object
+
+        :returns: packed object
+        :rtype: str
+        """
+        fields = self.fields
+
+        # at least one field, so that packed values always contain SEP
+        size = len(fields)
+        while size > 1 and fields[size - 1] not in obj:
+            size -= 1
+
+        values = []
+        extra = {}
+        missing = []
+
+        for field in fields[:size]:
+            value = obj.get(field)
+            if isinstance(value, str) and self.SEP not in value:
+                values.append(value)
+                continue
+
+            values.append('')
+            if field in obj:
+                extra[field] = value
+            else:
+                missing.append(field)
+
+        for name, value in obj.items():
+            if name not in self.omit and name not in self.fields:
+                extra[name] = value
+
+        if missing:
+            extra[self.MISSING] = missing
+
+        tail = str(self.version)
+        if extra:
+            tail += json.dumps(extra, separators=(',', ':'))
+
+        values.append(tail)
+        return self.SEP.join(values)
+
+    def unpack(self, value):
+        """Decode packed or plain JSON object.
+
+        :param str value: encoded object
+
+        :returns: object
+        :rtype: dict
+        """
+        return self.unpack_all([value])[0]
+
+    def unpack_all(self, values):
+        """Decode packed or plain JSON objects. Objects packed with the
+        current version and only known fields are decoded without parsing
+        any JSON.
+
+        :param list values: encoded objects, None if missing
+
+        :returns: objects, None if missing
+        :rtype: list
+        """
+        sep = self.SEP
+        fields = self.fields
+        version = str(self.version)
+        size = len(fields) + 1
+
+        objs = []
+
+        for value in values:
+            if not value:
+                objs.append(None)
+                continue
+
+            parts = value.split(sep)
+            if parts[-1] != version:
+                objs.append(self._from_parts(parts))
+            elif len(parts) == size:
+                objs.append(dict(zip(fields, parts)))
+            else:
+                objs.append(dict(zip(fields, parts[:-1])))
+
+        return objs
+
+    def is_packed(self, value):
+        """Return whether value is packed with current format version.
+
+        :param str value: encoded object
+
+        :returns: whether packed with current version
+        :rtype: bool
+        """
+        if self.SEP not in value:
+            return False
+
+        version, extra = self._split_tail(value.rsplit(self.SEP, 1)[1])
+        return version == self.version
+
+    def _split_tail(self, tail):
+        i = tail.find('{')
+        if i < 0:
+            return int(tail), None
+
+        return int(tail[:i]), json.loads(tail[i:])
+
+    def _from_parts(self, parts):
+        # plain json object
+        if len(parts) == 1:
+            return json.loads(parts[0])
+
+        version, extra = self._split_tail(parts[-1])
+
+        obj = dict(zip(self.versions[version], parts[:-1]))
+
+        if extra:
+            for field in extra.pop(self.MISSING, []):
+                obj.pop(field, None)
+
+            obj.update(extra)
+
+        return obj
+
+    def repack_hash(self, redis, key, batch_size=1000, dry_run=False):
+        """Rewrite all values of a Redis hash not yet packed with current
+        format version.
+
+        :param StrictRedis redis: Redis interface
+        :param str key: Redis hash key
+        :param int batch_size: number of values written per round-trip
+        :param bool dry_run: if set, only count values to rewrite
+
+        :returns: number of values rewritten
+        :rtype: int
+        """
+        count = 0
+        batch = {}
+
+        for name, value in redis.hscan_iter(key, count=batch_size):
+            if self.is_packed(value):
+                continue
+
+            obj = self.unpack(value)
+            # id no longer stored, only if same as hash field
+            if obj.get('id', name) != name:
+                continue
+
+            batch[name] = self.pack(obj)
+            count += 1
+
+            if len(batch) >= batch_size:
+                if not dry_run:
+                    redis.hmset(key, batch)
+                batch = {}
+
+        if batch and not dry_run:
+            redis.hmset(key, batch)
+
+        return count
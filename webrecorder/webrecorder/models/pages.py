@@ -1,22 +1,34 @@
 import json
 import hashlib
 
+from collections import defaultdict
+
+from webrecorder.models.packed import PackedFormat
+from webrecorder.utils import redis_pipeline
+
 
 # ============================================================================
 class PagesMixin(object):
     """Recording pages.
 
     :cvar str PAGES_KEY: pages Redis key template
-    :cvar str PAGE_BOOKMARKS_CACHE_KEY: temporary list of pages->bookmarks Redis key template
-    :ivar _pages_cache: n.s.
+    :cvar str REC_PAGES_KEY: recording page index Redis key template
+    :cvar str PAGE_BOOKMARKS_KEY: page->bookmarks index Redis key template
+    :cvar str REC_PAGES_INDEXED_KEY: whether recording page indexes were built for existing pages
+    :cvar str PAGE_BOOKMARKS_INDEXED_KEY: whether page->bookmarks index was built for existing bookmarks
+    :cvar int PAGES_BATCH_SIZE: number of pages read or indexed per round-trip
+    :cvar PackedFormat PAGE_FORMAT: encoding of stored pages
     """
     PAGES_KEY = 'c:{coll}:p'
-    PAGE_BOOKMARKS_CACHE_KEY = 'c:{coll}:p_to_b'
+    REC_PAGES_KEY = 'c:{coll}:rp:{rec}'
+    PAGE_BOOKMARKS_KEY = 'c:{coll}:p_to_b'
+
+    REC_PAGES_INDEXED_KEY = '@rec_pages_idx'
+    PAGE_BOOKMARKS_INDEXED_KEY = '@p_to_b_idx'
+
+    PAGES_BATCH_SIZE = 1000
 
-    def __init__(self, **kwargs):
-        """Initialize recording pages."""
-        super(PagesMixin, self).__init__(**kwargs)
-        self._pages_cache = None
+    PAGE_FORMAT = PackedFormat({1: ('url', 'timestamp', 'title', 'rec', 'browser')})
 
     @property
     def pages_key(self):
@@ -27,6 +39,20 @@ class PagesMixin(object):
         """
         return self.PAGES_KEY.format(coll=self.my_id)
 
+    def get_rec_pages_key(self, rec_id):
+        """Return recording page index Redis key. The index is a sorted set
+        of timestamp:page ID entries, all with score 0, in lexical order.
+
+        :param str rec_id: recording ID
+
+        :returns: recording page index Redis key
+        :rtype: str
+        """
+        return self.REC_PAGES_KEY.format(coll=self.my_id, rec=rec_id)
+
+    def _get_rec_page_entry(self, pid, page):
+        return str(page.get('timestamp') or '') + ':' + pid
+
     def add_page(self, props, recording):
         """Add page to recording.
 
@@ -49,7 +75,10 @@ class PagesMixin(object):
 
         pid = self._new_page_id(page)
 
-        self.redis.hset(self.pages_key, pid, json.dumps(page))
+        with redis_pipeline(self.redis) as pi:
+            pi.hset(self.pages_key, pid, self.PAGE_FORMAT.pack(page))
+            pi.zadd(self.get_rec_pages_key(recording.my_id), 0, self._get_rec_page_entry(pid, page))
+            self.mark_revised(pi)
 
         return pid
 
@@ -70,17 +99,29 @@ class PagesMixin(object):
         :param str pid: page ID
         :param dict all_page_bookmarks: list of bookmarks
         """
+        self._ensure_rec_pages_index()
+
+        page = self.get_page(pid)
+
+        self._remove_bookmarks_for_page(pid, all_page_bookmarks)
+
+        page_bookmarks_key = self.PAGE_BOOKMARKS_KEY.format(coll=self.my_id)
+
+        with redis_pipeline(self.redis) as pi:
+            pi.hdel(self.pages_key, pid)
+            if page and page.get('rec'):
+                pi.zrem(self.get_rec_pages_key(page['rec']), self._get_rec_page_entry(pid, page))
+
+            pi.hdel(page_bookmarks_key, pid)
+            self.mark_revised(pi)
+
+    def _remove_bookmarks_for_page(self, pid, all_page_bookmarks):
         page_bookmarks = all_page_bookmarks.get(pid, {})
         for bid, list_id in page_bookmarks.items():
             blist = self.get_list(list_id)
             if blist:
                 blist.remove_bookmark(bid)
 
-        self.redis.hdel(self.pages_key, pid)
-
-        page_bookmarks_key = self.PAGE_BOOKMARKS_CACHE_KEY.format(coll=self.my_id)
-        self.redis.hdel(page_bookmarks_key, pid)
-
     def page_exists(self, pid):
         """Return whether page exists.
 
@@ -101,7 +142,7 @@ class PagesMixin(object):
         """
         page = self.redis.hget(self.pages_key, pid)
         if page:
-            page = json.loads(page)
+            page = self.PAGE_FORMAT.unpack(page)
             page['id'] = pid
             return page
 
@@ -121,16 +162,58 @@ class PagesMixin(object):
         :returns: list of pages
         :rtype: list
         """
-        page_data = self.redis.hgetall(self.pages_key)
-        pages = []
+        return self._unpack_pages(self.redis.hgetall(self.pages_key))
+
+    def iter_pages(self):
+        """Iterate over pages, PAGES_BATCH_SIZE per round-trip, without
+        loading all pages at once. Pages added or removed while iterating
+        may or may not be included.
 
-        for n, v in page_data.items():
-            page = json.loads(v)
-            page['id'] = n
-            pages.append(page)
+        :returns: pages
+        :rtype: generator
+        """
+        # small hash read at once, keeping same order as list_pages()
+        if self.redis.hlen(self.pages_key) <= self.PAGES_BATCH_SIZE:
+            yield from self.list_pages()
+            return
+
+        batch = {}
+
+        for pid, data in self.redis.hscan_iter(self.pages_key, count=self.PAGES_BATCH_SIZE):
+            batch[pid] = data
+            if len(batch) >= self.PAGES_BATCH_SIZE:
+                yield from self._unpack_pages(batch)
+                batch = {}
+
+        yield from self._unpack_pages(batch)
+
+    def _unpack_pages(self, page_data):
+        pages = self.PAGE_FORMAT.unpack_all(list(page_data.values()))
+
+        for pid, page in zip(page_data.keys(), pages):
+            page['id'] = pid
 
         return pages
 
+    def iter_rec_pages(self, recording):
+        """Iterate over pages in recording, ordered by timestamp, then
+        page ID, PAGES_BATCH_SIZE per round-trip.
+
+        :param Recording recording: recording
+
+        :returns: pages
+        :rtype: generator
+        """
+        cursor = None
+
+        while True:
+            pages, cursor = self.list_rec_pages_range(recording, cursor=cursor,
+                                                      limit=self.PAGES_BATCH_SIZE)
+            yield from pages
+
+            if not cursor:
+                break
+
     def list_rec_pages(self, recording):
         """List pages in recording.
 
@@ -139,26 +222,119 @@ class PagesMixin(object):
         :returns: list of pages
         :rtype: list
         """
-        rec_id = recording.my_id
+        pages, cursor = self.list_rec_pages_range(recording)
+        return pages
+
+    def list_rec_pages_range(self, recording, cursor=None, limit=0):
+        """List pages in recording, ordered by timestamp, then page ID,
+        starting after cursor.
+
+        :param Recording recording: recording
+        :param str cursor: cursor returned for previous range, if any
+        :param int limit: max number of pages, if 0 all remaining pages
+
+        :returns: list of pages and cursor of next range (None if no more pages)
+        :rtype: list and str
+        """
+        self._ensure_rec_pages_index()
+
+        key = self.get_rec_pages_key(recording.my_id)
+        start = '(' + cursor if cursor else '-'
+
+        if limit:
+            entries = self.redis.zrangebylex(key, start, '+', 0, limit)
+        else:
+            entries = self.redis.zrangebylex(key, start, '+')
+
+        pages = self._load_pages([entry.rsplit(':', 1)[1] for entry in entries])
+
+        if limit and len(entries) == limit:
+            cursor = entries[-1]
+        else:
+            cursor = None
+
+        return pages, cursor
+
+    def count_rec_pages(self, recording):
+        """Return number of pages in recording.
+
+        :param Recording recording: recording
+
+        :returns: number of pages
+        :rtype: int
+        """
+        self._ensure_rec_pages_index()
+
+        return self.redis.zcard(self.get_rec_pages_key(recording.my_id))
 
-        if not self._pages_cache:
-            self._pages_cache = self.list_pages()
+    def _load_pages(self, pids):
+        """Load pages, PAGES_BATCH_SIZE per round-trip.
 
-        return [page for page in self._pages_cache if page.get('rec') == rec_id]
+        :param list pids: page IDs
+
+        :returns: list of pages
+        :rtype: list
+        """
+        pages = []
+
+        for i in range(0, len(pids), self.PAGES_BATCH_SIZE):
+            batch = pids[i:i + self.PAGES_BATCH_SIZE]
+
+            batch_pages = self.PAGE_FORMAT.unpack_all(self.redis.hmget(self.pages_key, batch))
+
+            for pid, page in zip(batch, batch_pages):
+                if not page:
+                    continue
+
+                page['id'] = pid
+                pages.append(page)
+
+        return pages
+
+    def _ensure_rec_pages_index(self):
+        """Build recording page indexes for pages added before they
+        were maintained, once per collection.
+        """
+        if self.get_bool_prop(self.REC_PAGES_INDEXED_KEY):
+            return
+
+        entries = defaultdict(list)
+        count = 0
+
+        for pid, data in self.redis.hscan_iter(self.pages_key, count=self.PAGES_BATCH_SIZE):
+            page = self.PAGE_FORMAT.unpack(data)
+            if not page.get('rec'):
+                continue
+
+            entries[page['rec']].extend((0, self._get_rec_page_entry(pid, page)))
+            count += 1
+
+            if count % self.PAGES_BATCH_SIZE == 0:
+                self._add_rec_page_entries(entries)
+                entries = defaultdict(list)
+
+        self._add_rec_page_entries(entries)
+
+        self.set_bool_prop(self.REC_PAGES_INDEXED_KEY, True)
+
+    def _add_rec_page_entries(self, entries):
+        with redis_pipeline(self.redis) as pi:
+            for rec_id, rec_entries in entries.items():
+                pi.zadd(self.get_rec_pages_key(rec_id), *rec_entries)
 
     def get_pages_for_list(self, id_list):
         """List all pages in list of page IDs.
 
         :param list id_list: list of page IDs
 
-        :returns: list of pages
+        :returns: list of pages, None if page does not exist
         :rtype: list
         """
         if not id_list:
             return []
 
         page_data_list = self.redis.hmget(self.pages_key, id_list)
-        return page_data_list
+        return self.PAGE_FORMAT.unpack_all(page_data_list)
 
     def delete_rec_pages(self, recording):
         """Delete pages from recording.
@@ -167,12 +343,29 @@ class PagesMixin(object):
         """
         self.access.assert_can_write_coll(self)
 
-        rec_pages = self.list_rec_pages(recording)
+        self._ensure_rec_pages_index()
+
+        key = self.get_rec_pages_key(recording.my_id)
+        pids = [entry.rsplit(':', 1)[1] for entry in self.redis.zrange(key, 0, -1)]
+
+        if not pids:
+            return
+
+        all_page_bookmarks = self.get_all_page_bookmarks([{'id': pid} for pid in pids])
+
+        for pid in pids:
+            self._remove_bookmarks_for_page(pid, all_page_bookmarks)
 
-        all_page_bookmarks = self.get_all_page_bookmarks(rec_pages)
+        page_bookmarks_key = self.PAGE_BOOKMARKS_KEY.format(coll=self.my_id)
 
-        for n in rec_pages:
-            self.delete_page(n['id'], all_page_bookmarks)
+        with redis_pipeline(self.redis) as pi:
+            for i in range(0, len(pids), self.PAGES_BATCH_SIZE):
+                batch = pids[i:i + self.PAGES_BATCH_SIZE]
+                pi.hdel(self.pages_key, *batch)
+                pi.hdel(page_bookmarks_key, *batch)
+
+            pi.delete(key)
+            self.mark_revised(pi)
 
     def import_pages(self, pagelist, recording):
         """Import pages into recording.
@@ -190,6 +383,7 @@ class PagesMixin(object):
 
         pages = {}
         id_map = {}
+        entries = defaultdict(list)
 
         for page in pagelist:
             if 'ts' in page and 'timestamp' not in page:
@@ -202,69 +396,120 @@ class PagesMixin(object):
 
             page['id'] = pid
 
-            pages[pid] = json.dumps(page)
+            pages[pid] = self.PAGE_FORMAT.pack(page)
+            entries[recording.my_id].extend((0, self._get_rec_page_entry(pid, page)))
 
         self.redis.hmset(self.pages_key, pages)
+        self._add_rec_page_entries(entries)
+        self.mark_revised()
 
         return id_map
 
-    def clear_page_bookmark_cache(self):
-        """ Check if on-demand page->bookmark cache already exists
+    def add_page_bookmarks(self, page_bookmarks):
+        """Add bookmarks to page->bookmarks index.
+
+        :param dict page_bookmarks: bookmark IDs and list IDs, by page ID
         """
-        key = self.PAGE_BOOKMARKS_CACHE_KEY.format(coll=self.my_id)
-        return self.redis.delete(key)
+        self._update_page_bookmarks(page_bookmarks, remove=False)
 
-    def get_all_page_bookmarks(self, filter_pages=None):
-        """List all bookmarks.
+    def remove_page_bookmarks(self, page_bookmarks):
+        """Remove bookmarks from page->bookmarks index.
 
-        :param filter_pages: filter
-        :type: list or None
+        :param dict page_bookmarks: bookmark IDs and list IDs, by page ID
         """
-        key = self.PAGE_BOOKMARKS_CACHE_KEY.format(coll=self.my_id)
-        filter_pages = filter_pages or []
-        filter_pages = [page['id'] for page in filter_pages]
+        self._update_page_bookmarks(page_bookmarks, remove=True)
 
-        all_bookmarks = self.redis.hgetall(key)
-        # cached, load json and filter by rec_id, if needed
-        if all_bookmarks:
-            bookmarks = {n: json.loads(v) for n, v in all_bookmarks.items()
-                         if not filter_pages or n in filter_pages}
+    def _update_page_bookmarks(self, page_bookmarks, remove):
+        """Update entries of changed pages only, retrying if
+        any entry is changed concurrently.
 
-            return bookmarks
+        :param dict page_bookmarks: bookmark IDs and list IDs, by page ID
+        :param bool remove: whether to remove or add bookmarks
+        """
+        if not page_bookmarks:
+            return
 
-        all_lists = self.get_lists()
+        key = self.PAGE_BOOKMARKS_KEY.format(coll=self.my_id)
+        page_ids = list(page_bookmarks.keys())
 
-        all_bookmarks = {}
+        def do_update(pi):
+            updated = {}
+            removed = []
 
-        # bin all bookmarks by page
-        for blist in all_lists:
-            for bk in blist.get_bookmarks():
-                page_id = bk.get('page_id')
-                if not page_id:
-                    continue
+            for page_id, data in zip(page_ids, pi.hmget(key, page_ids)):
+                bookmarks = json.loads(data) if data else {}
 
-                if page_id not in all_bookmarks:
-                    all_bookmarks[page_id] = {bk['id']: blist.my_id}
+                for bid, list_id in page_bookmarks[page_id].items():
+                    if not remove:
+                        bookmarks[bid] = list_id
+                    elif bookmarks.get(bid) == list_id:
+                        bookmarks.pop(bid)
+
+                if bookmarks:
+                    updated[page_id] = json.dumps(bookmarks)
                 else:
-                    all_bookmarks[page_id][bk['id']] = blist.my_id
+                    removed.append(page_id)
 
-        if not all_bookmarks:
-            return {}
+            pi.multi()
+            if updated:
+                pi.hmset(key, updated)
+
+            if removed:
+                pi.hdel(key, *removed)
+
+            self.mark_revised(pi)
+
+        self.redis.transaction(do_update, key)
+
+    def _ensure_page_bookmarks_index(self):
+        """Build page->bookmarks index for bookmarks added before it
+        was maintained, once per collection.
+        """
+        if self.get_bool_prop(self.PAGE_BOOKMARKS_INDEXED_KEY):
+            return
+
+        all_bookmarks = defaultdict(dict)
+
+        # bin all bookmarks by page
+        for blist in self.get_lists():
+            for page_id, bookmarks in blist.get_page_bookmarks().items():
+                all_bookmarks[page_id].update(bookmarks)
+
+        key = self.PAGE_BOOKMARKS_KEY.format(coll=self.my_id)
+
+        with redis_pipeline(self.redis) as pi:
+            pi.delete(key)
+            if all_bookmarks:
+                pi.hmset(key, {page_id: json.dumps(bookmarks)
+                               for page_id, bookmarks in all_bookmarks.items()})
+
+        self.set_bool_prop(self.PAGE_BOOKMARKS_INDEXED_KEY, True)
 
-        filtered_bookmarks = {}
+    def get_all_page_bookmarks(self, filter_pages=None):
+        """List all bookmarks, by page.
+
+        :param filter_pages: pages to include, if None all pages
+        :type: list or None
+
+        :returns: bookmark IDs and list IDs, by page ID
+        :rtype: dict
+        """
+        self._ensure_page_bookmarks_index()
 
-        # json encode and cache all bookmarks
-        # return only bookmarks filtered by recording
-        for page, bookmark in all_bookmarks.items():
-            if not filter_pages or page in filter_pages:
-                filtered_bookmarks[page] = bookmark
+        key = self.PAGE_BOOKMARKS_KEY.format(coll=self.my_id)
 
-            all_bookmarks[page] = json.dumps(bookmark)
+        if not filter_pages:
+            all_bookmarks = self.redis.hgetall(key)
+            return {n: json.loads(v) for n, v in all_bookmarks.items()}
 
-        self.redis.hmset(key, all_bookmarks)
-        if self.COLL_CDXJ_TTL > 0:
-            self.redis.expire(key, self.COLL_CDXJ_TTL)
+        pids = [page['id'] for page in filter_pages]
+        bookmarks = {}
 
-        return filtered_bookmarks
+        for i in range(0, len(pids), self.PAGES_BATCH_SIZE):
+            batch = pids[i:i + self.PAGES_BATCH_SIZE]
 
+            for pid, data in zip(batch, self.redis.hmget(key, batch)):
+                if data:
+                    bookmarks[pid] = json.loads(data)
 
+        return bookmarks
@@ -1,4 +1,5 @@
 import json
+import gzip
 import hashlib
 import os
 import base64
@@ -41,9 +42,14 @@ class Recording(RedisUniqueComponent):
     :cvar int COMMIT_WAIT_SECS: wait for the given number of seconds
     :cvar str REC_WARC_KEY: WARC Redis key (recording)
     :cvar str COLL_WARC_KEY: WARC Redis key (collection)
+    :cvar str COLL_WARC_CHECKSUM_KEY: WARC checksum and size catalog Redis key (collection)
     :cvar str COMMIT_LOCK_KEY: storage lock Redis key
     :cvar str INDEX_FILE_KEY: CDX index file
+    :cvar str INDEX_SUMMARY_KEY: CDX index block summary file
     :cvar str INDEX_NAME_TEMPL: CDX index filename template
+    :cvar str INDEX_BLOCKS_NAME_TEMPL: compressed block CDX index filename template
+    :cvar str INDEX_SUMMARY_NAME_TEMPL: CDX index block summary filename template
+    :cvar int CDXJ_BLOCK_LINES: CDX index lines per compressed block (0 to write plain CDXJ)
     :cvar str DELETE_RETRY: delete/retry Redis key
     :cvar int OPEN_REC_TTL: TTL ongoing recording
     """
@@ -65,12 +71,18 @@ class Recording(RedisUniqueComponent):
 
     REC_WARC_KEY = 'r:{rec}:wk'
     COLL_WARC_KEY = 'c:{coll}:warc'
+    COLL_WARC_CHECKSUM_KEY = 'c:{coll}:wsum'
 
     COMMIT_LOCK_KEY = 'r:{rec}:lock'
 
     INDEX_FILE_KEY = '@index_file'
+    INDEX_SUMMARY_KEY = '@index_summary'
 
     INDEX_NAME_TEMPL = 'index-{timestamp}-{random}.cdxj'
+    INDEX_BLOCKS_NAME_TEMPL = 'index-{timestamp}-{random}.cdxj.gz'
+    INDEX_SUMMARY_NAME_TEMPL = 'index-{timestamp}-{random}.idx'
+
+    CDXJ_BLOCK_LINES = 0
 
     DELETE_RETRY = 'q:delete_retry'
 
@@ -92,6 +104,8 @@ class Recording(RedisUniqueComponent):
         #cls.COMMIT_WAIT_TEMPL = config['commit_wait_templ']
         cls.COMMIT_WAIT_SECS = int(config['commit_wait_secs'])
 
+        cls.CDXJ_BLOCK_LINES = int(config.get('cdxj_block_lines', cls.CDXJ_BLOCK_LINES))
+
     @property
     def name(self):
         """Read-only attribute name."""
@@ -152,7 +166,10 @@ class Recording(RedisUniqueComponent):
     def set_closed(self):
         """Close recording."""
         open_rec_key = self.OPEN_REC_KEY.format(rec=self.my_id)
-        self.redis.delete(open_rec_key)
+
+        with redis_pipeline(self.redis) as pi:
+            pi.delete(open_rec_key)
+            pi.publish('rec_check_changed', open_rec_key)
 
     def is_fully_committed(self):
         """Return whether the CDX index file has been fully committed
@@ -254,13 +271,15 @@ class Recording(RedisUniqueComponent):
         if include_files:
             files = {}
             files['warcs'] = [n for n, v in self.iter_all_files(include_index=False)]
-            index_file = self.get_prop(self.INDEX_FILE_KEY)
-            if index_file:
-                files['indexes'] = [os.path.basename(index_file)]
+            index_files = [self.get_prop(self.INDEX_FILE_KEY), self.get_prop(self.INDEX_SUMMARY_KEY)]
+            index_files = [os.path.basename(index_file) for index_file in index_files if index_file]
+            if index_files:
+                files['indexes'] = index_files
 
             data['files'] = files
 
         data.pop(self.INDEX_FILE_KEY, '')
+        data.pop(self.INDEX_SUMMARY_KEY, '')
 
         return data
 
@@ -275,6 +294,8 @@ class Recording(RedisUniqueComponent):
         """
         res = self.delete_files(storage)
 
+        self.redis.publish('rec_check_changed', self.OPEN_REC_KEY.format(rec=self.my_id))
+
         Stats(self.redis).incr_delete(self)
 
         # if deleting collection, no need to remove pages for each recording
@@ -314,9 +335,10 @@ class Recording(RedisUniqueComponent):
                 yield n, v
 
         if include_index:
-            index_file = self.get_prop(self.INDEX_FILE_KEY)
-            if index_file:
-                yield self.INDEX_FILE_KEY, index_file
+            for key in (self.INDEX_FILE_KEY, self.INDEX_SUMMARY_KEY):
+                index_file = self.get_prop(key)
+                if index_file:
+                    yield key, index_file
 
     def delete_files(self, storage):
         """Delete files (WARC and CDX index files).
@@ -347,6 +369,7 @@ class Recording(RedisUniqueComponent):
                 self.redis.rpush(self.DELETE_RETRY, v)
             else:
                 self.redis.hdel(coll_warc_key, n)
+                self.redis.hdel(self.COLL_WARC_CHECKSUM_KEY.format(coll=self.get_prop('owner')), n)
 
         if errs:
             return {'error_delete_files': errs}
@@ -382,7 +405,8 @@ class Recording(RedisUniqueComponent):
             return self.get_owner().get_recording(patch_rec)
 
     def write_cdxj(self, user, cdxj_key):
-        """Write CDX index lines to file.
+        """Write CDX index lines to file, as compressed blocks with
+        a summary file if CDXJ_BLOCK_LINES is set.
 
         :param RedisUniqueComponent user: user
         :param str cdxj_key: CDX index file Redis key
@@ -402,8 +426,10 @@ class Recording(RedisUniqueComponent):
 
         timestamp = timestamp_now()
 
-        cdxj_filename = self.INDEX_NAME_TEMPL.format(timestamp=timestamp,
-                                                     random=randstr)
+        name_templ = self.INDEX_BLOCKS_NAME_TEMPL if self.CDXJ_BLOCK_LINES else self.INDEX_NAME_TEMPL
+
+        cdxj_filename = name_templ.format(timestamp=timestamp,
+                                          random=randstr)
 
         os.makedirs(dirname, exist_ok=True)
 
@@ -411,10 +437,20 @@ class Recording(RedisUniqueComponent):
 
         cdxj_list = self.redis.zrange(cdxj_key, 0, -1)
 
-        with open(full_filename, 'wt') as out:
-            for cdxj in cdxj_list:
-                out.write(cdxj + '\n')
-            out.flush()
+        if self.CDXJ_BLOCK_LINES:
+            summary_filename = os.path.join(dirname,
+                                            self.INDEX_SUMMARY_NAME_TEMPL.format(timestamp=timestamp,
+                                                                                 random=randstr))
+
+            self.write_cdxj_blocks(cdxj_list, full_filename, summary_filename)
+
+            self.set_prop(self.INDEX_SUMMARY_KEY,
+                          add_local_store_prefix(summary_filename.replace(os.path.sep, '/')))
+        else:
+            with open(full_filename, 'wt') as out:
+                for cdxj in cdxj_list:
+                    out.write(cdxj + '\n')
+                out.flush()
 
         full_url = add_local_store_prefix(full_filename.replace(os.path.sep, '/'))
         #self.redis.hset(warc_key, self.INDEX_FILE_KEY, full_url)
@@ -422,6 +458,32 @@ class Recording(RedisUniqueComponent):
 
         return cdxj_filename, full_filename
 
+    @classmethod
+    def write_cdxj_blocks(cls, cdxj_list, full_filename, summary_filename):
+        """Write CDX index lines as gzip members of CDXJ_BLOCK_LINES lines
+        each, and a ZipNum summary file with the first key, offset and
+        length of each block.
+
+        :param list cdxj_list: sorted CDX index lines
+        :param str full_filename: compressed blocks path
+        :param str summary_filename: summary path
+        """
+        part = os.path.basename(full_filename)
+
+        with open(full_filename, 'wb') as out:
+            with open(summary_filename, 'wt') as summary:
+                for lineno, i in enumerate(range(0, len(cdxj_list), cls.CDXJ_BLOCK_LINES), 1):
+                    block = cdxj_list[i:i + cls.CDXJ_BLOCK_LINES]
+
+                    offset = out.tell()
+                    out.write(gzip.compress(('\n'.join(block) + '\n').encode('utf-8')))
+
+                    # urlkey and timestamp of first line
+                    key = ' '.join(block[0].split(' ', 2)[:2])
+
+                    summary.write('{0}\t{1}\t{2}\t{3}\t{4}\n'.format(key, part, offset,
+                                                                    out.tell() - offset, lineno))
+
     def commit_to_storage(self, storage=None):
         """Commit WARCs and CDX files to storage.
 
@@ -455,6 +517,14 @@ class Recording(RedisUniqueComponent):
                 all_done = collection.commit_file(cdxj_filename, full_cdxj_filename, 'indexes',
                                             info_key, self.INDEX_FILE_KEY, direct_delete=True)
 
+                full_summary_filename = self.get_prop(self.INDEX_SUMMARY_KEY)
+                if full_summary_filename:
+                    summary_filename = os.path.basename(strip_prefix(full_summary_filename))
+                    done = collection.commit_file(summary_filename, full_summary_filename, 'indexes',
+                                                  info_key, self.INDEX_SUMMARY_KEY, direct_delete=True)
+
+                    all_done = all_done and done
+
                 for warc_filename, warc_full_filename in self.iter_all_files():
                     done = collection.commit_file(warc_filename, warc_full_filename, 'warcs', warc_key)
 
@@ -521,7 +591,7 @@ class Recording(RedisUniqueComponent):
                     shutil.copyfileobj(src, dest)
                     size = dest.tell()
 
-                if n != self.INDEX_FILE_KEY:
+                if n not in (self.INDEX_FILE_KEY, self.INDEX_SUMMARY_KEY):
                     self.incr_size(size)
                     self.redis.hset(target_warc_key, n, add_local_store_prefix(target_file))
                 else:
@@ -550,7 +620,8 @@ class Recording(RedisUniqueComponent):
         self.redis.sunionstore(self.REC_WARC_KEY.format(rec=self.my_id),
                                self.REC_WARC_KEY.format(rec=source.my_id))
 
-        # sync collection cdxj, if exists
+        # merge copied cdxj into collection cdxj, if exists
+        collection.mark_cdxj_changed(self)
         collection.sync_coll_index(exists=True, do_async=True)
 
         if not errored and delete_source:
@@ -1,5 +1,8 @@
+import atexit
+import gevent
 import os
 
+from collections import defaultdict
 from datetime import datetime
 from webrecorder.utils import redis_pipeline, today_str
 
@@ -39,6 +42,10 @@ class Stats(object):
     UPLOADS_SIZE_KEY = 'st:upload-size'
     UPLOADS_PROP = 'num_uploads'
 
+    COMMIT_COUNT_KEY = 'st:commit-count'
+    COMMIT_SIZE_KEY = 'st:commit-size'
+    COMMIT_STATUS_KEY = 'st:commit-status'
+
     BOOKMARK_ADD_KEY = 'st:bookmark-add'
     BOOKMARK_MOD_KEY = 'st:bookmark-mod'
     BOOKMARK_DEL_KEY = 'st:bookmark-del'
@@ -60,6 +67,8 @@ class Stats(object):
 
         cls.TEMP_PREFIX = config['temp_prefix']
 
+        StatsBuffer.init_props(config)
+
     def __init__(self, redis):
         self.redis = redis
 
@@ -76,20 +85,23 @@ class Stats(object):
         rate_limit_key = self.RATE_LIMIT_KEY.format(ip=ip, H=h)
         return rate_limit_key
 
-    def incr_record(self, params, size, cdx_list):
+    def incr_record(self, params, size, cdx_list=None):
         username = params.get('param.user')
         if not username:
             return
 
         today = today_str()
 
-        with redis_pipeline(self.redis) as pi:
-            # rate limiting
-            rate_limit_key = self.get_rate_limit_key(params)
-            if rate_limit_key:
+        is_patch = params.get('param.recorder.rec') != None
+
+        # rate limiting, written directly as it is checked on each request
+        rate_limit_key = self.get_rate_limit_key(params)
+        if rate_limit_key:
+            with redis_pipeline(self.redis) as pi:
                 pi.incrby(rate_limit_key, size)
                 pi.expire(rate_limit_key, self.RATE_LIMIT_TTL)
 
+        with StatsBuffer.pipeline(self.redis) as pi:
             # write size to usage hashes
             if username.startswith(self.TEMP_PREFIX):
                 key = self.ALL_CAPTURE_TEMP_KEY
@@ -99,32 +111,50 @@ class Stats(object):
             if key:
                 pi.hincrby(key, today, size)
 
+            if is_patch:
+                if username.startswith(self.TEMP_PREFIX):
+                    key = self.PATCH_TEMP_KEY
+                else:
+                    key = self.PATCH_USER_KEY
+
+                pi.hincrby(key, today, size)
+
+        if cdx_list:
+            self.incr_sources(params, cdx_list)
+
+    def incr_sources(self, params, cdx_list):
+        """Add size of extracted or patched records to per-source usage.
+        May be called repeatedly with successive batches of cdx lines.
+
+        :param dict params: recorder params
+        :param list cdx_list: CDXJ lines
+        """
+        if not params.get('param.user'):
+            return
+
         is_extract = params.get('sources') != None
         is_patch = params.get('param.recorder.rec') != None
 
-        if is_extract or is_patch:
-            with redis_pipeline(self.redis) as pi:
-                for cdx in cdx_list:
-                    try:
-                        cdx = CDXObject(cdx)
-                        source_id = cdx['orig_source_id']
-                        size = int(cdx['length'])
-                        if source_id and size:
-                            pi.hincrby(self.SOURCES_KEY.format(source_id), today, size)
-                    except Exception as e:
-                        pass
-
-                if is_patch:
-                    if username.startswith(self.TEMP_PREFIX):
-                        key = self.PATCH_TEMP_KEY
-                    else:
-                        key = self.PATCH_USER_KEY
-
-                    pi.hincrby(key, today, size)
+        if not is_extract and not is_patch:
+            return
+
+        today = today_str()
+
+        with StatsBuffer.pipeline(self.redis) as pi:
+            for cdx in cdx_list:
+                try:
+                    cdx = CDXObject(cdx)
+                    source_id = cdx['orig_source_id']
+                    size = int(cdx['length'])
+                    if source_id and size:
+                        pi.hincrby(self.SOURCES_KEY.format(source_id), today, size)
+                except Exception as e:
+                    pass
 
     def incr_browser(self, browser_id):
         browser_key = self.BROWSERS_KEY.format(browser_id)
-        self.redis.hincrby(browser_key, today_str(), 1)
+        with StatsBuffer.pipeline(self.redis) as pi:
+            pi.hincrby(browser_key, today_str(), 1)
 
     def incr_download(self, collection):
         user = collection.get_owner()
@@ -161,6 +191,22 @@ class Stats(object):
         self.redis.hincrby(self.UPLOADS_COUNT_KEY, today, 1)
         self.redis.hincrby(self.UPLOADS_SIZE_KEY, today, size)
 
+    def incr_commit(self, size):
+        today = today_str()
+        with redis_pipeline(self.redis) as pi:
+            pi.hincrby(self.COMMIT_COUNT_KEY, today, 1)
+            pi.hincrby(self.COMMIT_SIZE_KEY, today, size)
+            pi.hincrby(self.COMMIT_STATUS_KEY, 'bytes', size)
+
+    def get_commit_status(self):
+        return self.redis.hgetall(self.COMMIT_STATUS_KEY)
+
+    def set_commit_status(self, **status):
+        self.redis.hmset(self.COMMIT_STATUS_KEY, status)
+
+    def incr_commit_queue(self, num):
+        self.redis.hincrby(self.COMMIT_STATUS_KEY, 'queue', num)
+
     def incr_bookmark_add(self, num=1):
         self.redis.hincrby(self.BOOKMARK_ADD_KEY, today_str(), num)
 
@@ -176,7 +222,8 @@ class Stats(object):
         else:
             key = self.REPLAY_USER_KEY
 
-        self.redis.hincrby(key, today_str(), size)
+        with StatsBuffer.pipeline(self.redis) as pi:
+            pi.hincrby(key, today_str(), size)
 
     def move_temp_to_user_usage(self, collection):
         today = today_str()
@@ -197,4 +244,131 @@ class Stats(object):
 
         key = self.BEHAVIOR_KEY.format(stat=stat, name=behavior)
 
-        self.redis.hincrby(key, today_str(), 1)
+        with StatsBuffer.pipeline(self.redis) as pi:
+            pi.hincrby(key, today_str(), 1)
+
+
+# ============================================================================
+class StatsBuffer(object):
+    """Adds up stats counters in memory, per process, and writes them
+    to Redis in one pipeline every FLUSH_SECS or MAX_EVENTS events,
+    whichever comes first, and on exit.
+
+    Counters are lost for at most FLUSH_SECS (or MAX_EVENTS) if the
+    process crashes before a flush.
+
+    :cvar float FLUSH_SECS: max time between flushes, if 0 counters are written directly
+    :cvar int MAX_EVENTS: max events between flushes
+    """
+    FLUSH_SECS = 0
+    MAX_EVENTS = 1000
+
+    buffers = {}
+
+    @classmethod
+    def init_props(cls, config):
+        cls.FLUSH_SECS = float(config.get('stats_flush_ms', 0)) / 1000.0
+        cls.MAX_EVENTS = int(config.get('stats_flush_max_events', 1000))
+
+    @classmethod
+    def pipeline(cls, redis):
+        """Return the process-wide buffer for the Redis instance,
+        or a new Redis pipeline if buffering is disabled.
+
+        :param StrictRedis redis: Redis interface
+
+        :returns: buffer or pipeline context manager
+        """
+        if not cls.FLUSH_SECS:
+            return redis_pipeline(redis)
+
+        buff = cls.buffers.get(redis)
+        if not buff:
+            buff = StatsBuffer(redis)
+            cls.buffers[redis] = buff
+
+        return buff
+
+    def __init__(self, redis):
+        self.redis = redis
+        self.flusher = None
+        self._reset()
+
+        atexit.register(self.flush)
+
+    def _reset(self):
+        self.deletes = set()
+        self.hash_counts = defaultdict(lambda: defaultdict(int))
+        self.counts = defaultdict(int)
+        self.members = defaultdict(set)
+        self.expires = {}
+        self.num_events = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.num_events += 1
+
+        if self.num_events >= self.MAX_EVENTS:
+            self.flush()
+
+        elif not self.flusher:
+            self.flusher = gevent.spawn_later(self.FLUSH_SECS, self._flush_later)
+
+    def hincrby(self, key, field, amount=1):
+        self.hash_counts[key][field] += amount
+
+    def incrby(self, key, amount=1):
+        self.counts[key] += amount
+
+    def sadd(self, key, *members):
+        self.members[key].update(members)
+
+    def expire(self, key, secs):
+        self.expires[key] = secs
+
+    def delete(self, key):
+        # drop pending counters for key, delete stored counters on flush
+        self.hash_counts.pop(key, None)
+        self.counts.pop(key, None)
+        self.members.pop(key, None)
+        self.deletes.add(key)
+
+    def _flush_later(self):
+        self.flusher = None
+        self.flush()
+
+    def flush(self):
+        """Write all pending counters to Redis."""
+        if not self.num_events:
+            return
+
+        deletes = self.deletes
+        hash_counts = self.hash_counts
+        counts = self.counts
+        members = self.members
+        expires = self.expires
+
+        self._reset()
+
+        try:
+            with redis_pipeline(self.redis) as pi:
+                for key in deletes:
+                    pi.delete(key)
+
+                for key, fields in hash_counts.items():
+                    for field, amount in fields.items():
+                        pi.hincrby(key, field, amount)
+
+                for key, amount in counts.items():
+                    pi.incrby(key, amount)
+
+                for key, key_members in members.items():
+                    pi.sadd(key, *key_members)
+
+                for key, secs in expires.items():
+                    pi.expire(key, secs)
+
+        except Exception as e:
+            print('Error Flushing Stats: ' + str(e))
@@ -107,13 +107,11 @@ class User(RedisUniqueComponent):
         return collection
 
     def get_collections(self, load=True):
-        all_collections = self.colls.get_objects(Collection)
+        all_collections = self.colls.get_objects(Collection, load=load)
         collections = []
         for collection in all_collections:
             collection.owner = self
             if self.access.can_read_coll(collection, allow_superuser=False):
-                if load:
-                    collection.load()
                 collections.append(collection)
 
         return collections
@@ -199,7 +197,10 @@ class User(RedisUniqueComponent):
 
     def mark_skip_url(self, url):
         key = self.URL_SKIP_KEY.format(user=self.my_id,  url=url)
-        r = self.redis.setex(key, self.SKIP_KEY_SECS, 1)
+
+        with redis_pipeline(self.redis) as pi:
+            pi.setex(key, self.SKIP_KEY_SECS, 1)
+            pi.publish('rec_check_changed', key)
 
     def is_anon(self):
         return self.name.startswith('temp-')
@@ -648,6 +648,7 @@ class UserManager(object):
 
         if 'max_size' in data:
             user['max_size'] = data['max_size']
+            self.redis.publish('rec_check_changed', user.info_key)
 
         if 'role' in data:
             user['role'] = data['role']
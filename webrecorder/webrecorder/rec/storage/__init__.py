@@ -15,7 +15,7 @@ def get_storage(storage_type, redis):
         return LocalFileStorage(redis)
 
     elif storage_type == 's3':
-        return S3Storage()
+        return S3Storage(redis)
 
     else:
         return None
@@ -3,12 +3,14 @@ class BaseStorage(object):
     """Webrecorder storage base class.
 
     :ivar dict cache: cache
+    :ivar dict checksums: checksums computed while uploading
     :ivar str storage_root: root directory
     """
 
     def __init__(self, storage_root=None):
         """Initialize Webrecorder storage."""
         self.cache = {}
+        self.checksums = {}
         self.storage_root = storage_root
 
     def get_collection_url(self, collection):
@@ -85,20 +87,32 @@ class BaseStorage(object):
 
         return False
 
-    def get_upload_url(self, filename):
+    def get_upload_checksum(self, target_url):
+        """Return checksum of file, as computed while it was uploaded.
+
+        :param str target_url: target URL
+
+        :returns: kind of checksum and checksum or None if not computed
+        :rtype: tuple or None
+        """
+        return self.checksums.pop(target_url, None)
+
+    def get_upload_url(self, filename, target_url=None):
         """Return upload URL.
 
         :param str filename: filename
+        :param target_url: target URL of previous upload, if not cached
+        :type: str or None
 
         :returns: upload URL
         :rtype: str
         """
-        target_url = self.cache.get(filename)
+        target_url = self.cache.get(filename, target_url)
 
         if not target_url or not self.is_valid_url(target_url):
             return None
 
-        del self.cache[filename]
+        self.cache.pop(filename, None)
         return self.get_client_url(target_url)
 
     def delete_file(self, filename):
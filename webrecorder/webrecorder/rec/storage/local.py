@@ -15,7 +15,11 @@ logger = logging.getLogger('wr.io')
 
 # ============================================================================
 class DirectLocalFileStorage(BaseStorage):
-    """Webrecorder storage (local files)."""
+    """Webrecorder storage (local files).
+
+    :cvar int COPY_BUFF_SIZE: size of chunks copied on upload
+    """
+    COPY_BUFF_SIZE = 1024 * 1024
 
     def __init__(self):
         """Initialize Webrecorder storage."""
@@ -55,7 +59,17 @@ class DirectLocalFileStorage(BaseStorage):
 
         try:
             if full_filename != target_url:
-                shutil.copyfile(full_filename, target_url)
+                # compute checksum while copying, not by reading the file again
+                m = hashlib.md5()
+                with open(full_filename, 'rb') as src, open(target_url, 'wb') as dst:
+                    while True:
+                        chunk = src.read(self.COPY_BUFF_SIZE)
+                        if not chunk:
+                            break
+                        m.update(chunk)
+                        dst.write(chunk)
+
+                self.checksums[target_url] = ('md5', m.hexdigest())
             else:
                 logger.debug('Local Store: Same File, No Upload')
 
@@ -166,7 +180,15 @@ class LocalFileStorage(DirectLocalFileStorage):
         m = hashlib.md5()
         amount = 1024 * 1024
         total_size = 0
-        with closing(BlockLoader().load(filepath_or_url)) as f:
+
+        # read local file directly, if available
+        local_path = strip_prefix(filepath_or_url)
+        if os.path.isfile(local_path):
+            fh = open(local_path, 'rb')
+        else:
+            fh = BlockLoader().load(filepath_or_url)
+
+        with closing(fh) as f:
             while True:
                 chunk = f.read(amount)
                 chunk_size = len(chunk)
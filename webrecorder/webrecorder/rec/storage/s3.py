@@ -1,7 +1,11 @@
+import base64
+import hashlib
+import json
 import logging
 import os
 
 import boto3
+import gevent.pool
 from six.moves.urllib.parse import urlsplit
 
 from webrecorder.rec.storage.base import BaseStorage
@@ -13,12 +17,48 @@ logger = logging.getLogger('wr.io')
 class S3Storage(BaseStorage):
     """Webrecorder storage (Amazon S3).
 
+    :cvar int MULTIPART_THRESHOLD: min file size uploaded in multiple parts
+    :cvar int PART_SIZE: size of each part
+    :cvar int UPLOAD_WORKERS: max number of parts uploaded concurrently
+    :cvar int PART_RETRIES: number of attempts to upload each part
+    :cvar str MULTIPART_UPLOAD_KEY: unfinished multipart upload ID Redis key
+    :cvar int MULTIPART_UPLOAD_SECS: TTL of unfinished multipart upload ID
+    :cvar str OBJECT_INFO_KEY: ETag and size of uploaded objects Redis key
     :ivar str bucket_name: name of S3 bucket
     :ivar s3: service client
+    :ivar redis: Redis interface
+    :type: StrictRedis or None
+    :ivar dict upload_ids: unfinished multipart upload IDs (without Redis)
     """
+    MULTIPART_THRESHOLD = 64 * 1024 * 1024
+    PART_SIZE = 16 * 1024 * 1024
+    UPLOAD_WORKERS = 4
+    PART_RETRIES = 3
 
-    def __init__(self):
-        """Initialize Webrecorder storage."""
+    MULTIPART_UPLOAD_KEY = 's3:mp:{target}'
+    MULTIPART_UPLOAD_SECS = 604800
+
+    OBJECT_INFO_KEY = 's3:objs'
+
+    READ_BUFF_SIZE = 1024 * 1024
+
+    @classmethod
+    def init_props(cls, config):
+        """Initialize class variables.
+
+        :param dict config: Webrecorder configuration
+        """
+        cls.MULTIPART_THRESHOLD = int(config.get('s3_multipart_threshold', cls.MULTIPART_THRESHOLD))
+        cls.PART_SIZE = int(config.get('s3_part_size', cls.PART_SIZE))
+        cls.UPLOAD_WORKERS = int(config.get('s3_upload_workers', cls.UPLOAD_WORKERS))
+        cls.PART_RETRIES = int(config.get('s3_part_retries', cls.PART_RETRIES))
+
+    def __init__(self, redis=None):
+        """Initialize Webrecorder storage.
+
+        :param redis: Redis interface
+        :type: StrictRedis or None
+        """
         super(S3Storage, self).__init__(os.environ['S3_ROOT'])
 
         res = self._split_bucket_path(self.storage_root)
@@ -27,6 +67,9 @@ class S3Storage(BaseStorage):
         self.s3 = boto3.client('s3')
         self.is_local_storage = False
 
+        self.redis = redis
+        self.upload_ids = {}
+
     def _split_bucket_path(self, url):
         """Split S3 bucket URL into network location and path.
 
@@ -89,16 +132,262 @@ class S3Storage(BaseStorage):
 
         try:
             logger.debug('S3: Uploading {0} -> {1}'.format(full_filename, s3_url))
-            self.s3.upload_file(full_filename,
-                                Bucket=self.bucket_name,
-                                Key=target_url)
+            size = os.path.getsize(full_filename)
+
+            if size < self.MULTIPART_THRESHOLD:
+                etag = self._put_object(target_url, full_filename)
+            else:
+                etag = self._multipart_upload(target_url, full_filename, size)
 
+            if not etag:
+                logger.debug('S3: Failed to Upload to {0}'.format(s3_url))
+                return False
+
+            self._set_object_info(target_url, etag, size)
+            self.checksums[target_url] = ('s3etag' if '-' in etag else 'md5', etag)
             return True
         except Exception as e:
             logger.debug(str(e))
             logger.debug('S3: Failed to Upload to {0}'.format(s3_url))
             return False
 
+    def _read_part(self, full_filename, offset, length):
+        """Read part of file.
+
+        :param str full_filename: filename
+        :param int offset: part offset
+        :param int length: part length
+
+        :returns: part data and its MD5 digest
+        :rtype: bytes and bytes
+        """
+        with open(full_filename, 'rb') as fh:
+            fh.seek(offset)
+            data = fh.read(length)
+
+        return data, hashlib.md5(data).digest()
+
+    def _is_md5_etag(self, res):
+        """Return whether ETag of uploaded object or part is its MD5 checksum,
+        which is not the case with SSE-KMS or SSE-C encryption.
+
+        :param dict res: upload response
+
+        :returns: whether ETag is MD5 checksum
+        :rtype: bool
+        """
+        return res.get('ServerSideEncryption') != 'aws:kms' and not res.get('SSECustomerAlgorithm')
+
+    def _put_object(self, target_url, full_filename):
+        """Upload file in single request, verified by MD5 checksum.
+
+        :param str target_url: target URL
+        :param str full_filename: filename
+
+        :returns: ETag or None if upload failed
+        :rtype: str or None
+        """
+        data, digest = self._read_part(full_filename, 0, -1)
+
+        res = self.s3.put_object(Bucket=self.bucket_name,
+                                 Key=target_url,
+                                 Body=data,
+                                 ContentMD5=base64.b64encode(digest).decode('ascii'))
+
+        # body already verified by S3 against ContentMD5
+        etag = res['ETag'].strip('"')
+        if self._is_md5_etag(res) and etag != digest.hex():
+            logger.debug('S3: Checksum Mismatch: {0} != {1}'.format(etag, digest.hex()))
+            return None
+
+        return etag
+
+    def _multipart_upload(self, target_url, full_filename, size):
+        """Upload file in parts, up to UPLOAD_WORKERS parts concurrently.
+
+        Each part is verified by S3 against its MD5 checksum. If any part fails, the
+        upload is kept open and only the missing parts are uploaded on retry.
+
+        :param str target_url: target URL
+        :param str full_filename: filename
+        :param int size: file size
+
+        :returns: ETag or None if upload failed
+        :rtype: str or None
+        """
+        upload_id = self._get_upload_id(target_url)
+        uploaded = {}
+
+        if upload_id:
+            try:
+                uploaded = self._list_uploaded_parts(target_url, upload_id)
+                logger.debug('S3: Resuming Upload of {0}, {1} parts uploaded'.format(target_url, len(uploaded)))
+            except Exception as e:
+                logger.debug('S3: Upload Not Resumable: ' + str(e))
+                upload_id = None
+
+        if not upload_id:
+            res = self.s3.create_multipart_upload(Bucket=self.bucket_name,
+                                                  Key=target_url)
+            upload_id = res['UploadId']
+            self._set_upload_id(target_url, upload_id)
+
+        num_parts = max((size + self.PART_SIZE - 1) // self.PART_SIZE, 1)
+
+        pool = gevent.pool.Pool(self.UPLOAD_WORKERS)
+
+        jobs = [pool.spawn(self._upload_part, target_url, upload_id,
+                           full_filename, part_num, uploaded.get(part_num))
+                for part_num in range(1, num_parts + 1)]
+
+        pool.join()
+
+        etags = [job.value for job in jobs]
+        if not all(etags):
+            logger.debug('S3: {0} of {1} parts failed'.format(etags.count(None), num_parts))
+            return None
+
+        parts = [{'ETag': '"' + etag + '"', 'PartNumber': part_num}
+                 for part_num, etag in enumerate(etags, 1)]
+
+        res = self.s3.complete_multipart_upload(Bucket=self.bucket_name,
+                                                Key=target_url,
+                                                UploadId=upload_id,
+                                                MultipartUpload={'Parts': parts})
+
+        self._delete_upload_id(target_url)
+
+        return res['ETag'].strip('"')
+
+    def _upload_part(self, target_url, upload_id, full_filename, part_num, uploaded_etag=None):
+        """Upload single part, retrying up to PART_RETRIES times.
+
+        :param str target_url: target URL
+        :param str upload_id: multipart upload ID
+        :param str full_filename: filename
+        :param int part_num: part number, starting at 1
+        :param uploaded_etag: ETag of part already uploaded
+        :type: str or None
+
+        :returns: ETag of part or None if upload failed
+        :rtype: str or None
+        """
+        data, digest = self._read_part(full_filename, (part_num - 1) * self.PART_SIZE, self.PART_SIZE)
+
+        # already uploaded with same checksum
+        # (with SSE-KMS or SSE-C, ETag is not the checksum, part is uploaded again)
+        if uploaded_etag == digest.hex():
+            return uploaded_etag
+
+        content_md5 = base64.b64encode(digest).decode('ascii')
+
+        for attempt in range(self.PART_RETRIES):
+            try:
+                res = self.s3.upload_part(Bucket=self.bucket_name,
+                                          Key=target_url,
+                                          UploadId=upload_id,
+                                          PartNumber=part_num,
+                                          Body=data,
+                                          ContentMD5=content_md5)
+
+                # body already verified by S3 against ContentMD5
+                etag = res['ETag'].strip('"')
+                if not self._is_md5_etag(res) or etag == digest.hex():
+                    return etag
+
+                logger.debug('S3: Part {0} Checksum Mismatch'.format(part_num))
+
+            except Exception as e:
+                logger.debug('S3: Part {0} Failed: {1}'.format(part_num, e))
+
+        return None
+
+    def _list_uploaded_parts(self, target_url, upload_id):
+        """List parts of unfinished multipart upload.
+
+        :param str target_url: target URL
+        :param str upload_id: multipart upload ID
+
+        :returns: ETags by part number
+        :rtype: dict
+        """
+        uploaded = {}
+        kwargs = {}
+
+        while True:
+            res = self.s3.list_parts(Bucket=self.bucket_name,
+                                     Key=target_url,
+                                     UploadId=upload_id,
+                                     **kwargs)
+
+            for part in res.get('Parts', []):
+                uploaded[part['PartNumber']] = part['ETag'].strip('"')
+
+            if not res.get('IsTruncated'):
+                return uploaded
+
+            kwargs['PartNumberMarker'] = res['NextPartNumberMarker']
+
+    def _get_upload_id(self, target_url):
+        """Get ID of unfinished multipart upload.
+
+        :param str target_url: target URL
+
+        :returns: multipart upload ID
+        :rtype: str or None
+        """
+        if self.redis:
+            return self.redis.get(self.MULTIPART_UPLOAD_KEY.format(target=target_url))
+
+        return self.upload_ids.get(target_url)
+
+    def _set_upload_id(self, target_url, upload_id):
+        """Store ID of unfinished multipart upload.
+
+        :param str target_url: target URL
+        :param str upload_id: multipart upload ID
+        """
+        if self.redis:
+            self.redis.set(self.MULTIPART_UPLOAD_KEY.format(target=target_url),
+                           upload_id, ex=self.MULTIPART_UPLOAD_SECS)
+        else:
+            self.upload_ids[target_url] = upload_id
+
+    def _delete_upload_id(self, target_url):
+        """Delete ID of finished multipart upload.
+
+        :param str target_url: target URL
+        """
+        if self.redis:
+            self.redis.delete(self.MULTIPART_UPLOAD_KEY.format(target=target_url))
+        else:
+            self.upload_ids.pop(target_url, None)
+
+    def _set_object_info(self, target_url, etag, size):
+        """Store ETag and size of uploaded object.
+
+        :param str target_url: target URL
+        :param str etag: ETag
+        :param int size: size
+        """
+        if self.redis:
+            self.redis.hset(self.OBJECT_INFO_KEY, target_url,
+                            json.dumps({'etag': etag, 'size': size}))
+
+    def _get_object_info(self, target_url):
+        """Get ETag and size of uploaded object.
+
+        :param str target_url: target URL
+
+        :returns: ETag and size or None if not stored
+        :rtype: dict or None
+        """
+        if not self.redis:
+            return None
+
+        info = self.redis.hget(self.OBJECT_INFO_KEY, target_url)
+        return json.loads(info) if info else None
+
     def client_url_to_target_url(self, client_url):
         """Get target URL (from client URL).
 
@@ -125,6 +414,10 @@ class S3Storage(BaseStorage):
         try:
             resp = self.s3.delete_object(Bucket=self.bucket_name,
                                          Key=target_url)
+
+            if self.redis:
+                self.redis.hdel(self.OBJECT_INFO_KEY, target_url)
+
             return True
         except Exception as e:
             logger.debug(str(e))
@@ -153,6 +446,14 @@ class S3Storage(BaseStorage):
         :rtype: tuple[str|None, str|None, int|None]
         """
         path = self.client_url_to_target_url(filepath_or_url)
+
+        # recorded on upload, no HEAD needed
+        info = self._get_object_info(path)
+        if info:
+            etag = info['etag']
+            kind = 's3etag' if '-' in etag else 'md5'
+            return kind, etag, info['size']
+
         try:
 
             res = self.s3.head_object(Bucket=self.bucket_name,
@@ -1,8 +1,14 @@
+from gevent.monkey import patch_all; patch_all()
+
 import os
+import time
+import traceback
 import redis
+import gevent.pool
 
 from webrecorder.models.recording import Recording
 from webrecorder.models.base import BaseAccess
+from webrecorder.models.stats import Stats
 
 import logging
 logger = logging.getLogger('wr.io')
@@ -17,16 +23,61 @@ class StorageCommitter(object):
 
         self.all_cdxj_templ = Recording.CDXJ_KEY.format(rec='*')
 
+        self.num_workers = int(config.get('storage_commit_workers', 1))
+
+        self.stats = Stats(self.redis)
+
         logger.info('Storage Committer Started')
         logger.info('Storage Root: ' + os.environ['STORAGE_ROOT'])
 
     def __call__(self):
-        for cdxj_key in self.redis.scan_iter(self.all_cdxj_templ):
-            self.process_cdxj_key(cdxj_key)
+        queue = [recording for recording in map(self.get_commit_recording,
+                                                self.redis.scan_iter(self.all_cdxj_templ))
+                 if recording]
+
+        if queue:
+            self.commit_all(queue)
 
         self.redis.publish('close_idle', '')
 
+    def commit_all(self, queue):
+        start_bytes = int(self.stats.get_commit_status().get('bytes', 0))
+        start = time.time()
+
+        self.stats.set_commit_status(queue=len(queue), workers=self.num_workers)
+
+        pool = gevent.pool.Pool(self.num_workers)
+
+        for recording in queue:
+            pool.spawn(self.commit_recording, recording)
+
+        pool.join()
+
+        elapsed = time.time() - start
+        committed = int(self.stats.get_commit_status().get('bytes', 0)) - start_bytes
+
+        self.stats.set_commit_status(queue=0,
+                                     last_bytes=committed,
+                                     last_secs='{0:.2f}'.format(elapsed),
+                                     bytes_per_sec=int(committed / elapsed) if elapsed else committed)
+
+        logger.debug('Storage Commit: {0} bytes from {1} recordings in {2:.2f}s ({3:.0f} bytes/sec)'.format(
+                     committed, len(queue), elapsed, committed / elapsed if elapsed else committed))
+
+    def commit_recording(self, recording):
+        try:
+            recording.commit_to_storage()
+        except Exception:
+            traceback.print_exc()
+        finally:
+            self.stats.incr_commit_queue(-1)
+
     def process_cdxj_key(self, cdxj_key):
+        recording = self.get_commit_recording(cdxj_key)
+        if recording:
+            recording.commit_to_storage()
+
+    def get_commit_recording(self, cdxj_key):
         _, rec, _2 = cdxj_key.split(':', 2)
 
         recording = Recording(my_id=rec,
@@ -37,14 +88,21 @@ class StorageCommitter(object):
         if not collection:
             logger.debug('Deleting Invalid Rec: ' + recording.my_id)
             recording.delete_object()
-            return
+            return None
 
         if collection.is_external():
             logger.debug('Skipping recording commit for external collection: ' + collection.my_id)
-            return
+            return None
 
-        if not recording.is_open(extend=False):
+        if recording.is_open(extend=False):
+            return None
+
+        # temp recordings are not uploaded, only finalize index, no need to queue
+        if collection.get_owner().is_anon():
             recording.commit_to_storage()
+            return None
+
+        return recording
 
 
 # =============================================================================
@@ -8,12 +8,12 @@ from pywb.recorder.filters import WriteRevisitDupePolicy, SkipDupePolicy
 from pywb.recorder.filters import ExcludeHttpOnlyCookieHeaders
 from pywb.recorder.filters import SkipRangeRequestFilter, SkipDefaultFilter
 
-from pywb.indexer.cdxindexer import BaseCDXWriter, CDXJ
+from pywb.indexer.cdxindexer import BaseCDXWriter, CDXJ, write_cdx_index
 
 from pywb.utils.format import res_template
 from pywb.utils.io import BUFF_SIZE
 
-from webrecorder.utils import SizeTrackingReader, redis_pipeline
+from webrecorder.utils import SizeTrackingReader, SizeCounter, redis_pipeline, get_new_id
 
 from webrecorder.load.wamloader import WAMLoader
 
@@ -27,6 +27,7 @@ import redis
 import json
 import glob
 import tempfile
+import time
 import traceback
 import logging
 
@@ -154,6 +155,8 @@ class WebRecRecorder(object):
         self.pubsub.subscribe('handle_delete_file')
         self.pubsub.subscribe('handle_delete_dir')
 
+        self.pubsub.subscribe('rec_check_changed')
+
         logger.info('Recorder pubsub: Waiting for messages')
 
         try:
@@ -180,6 +183,9 @@ class WebRecRecorder(object):
             elif item['channel'] == 'handle_delete_dir':
                 self.handle_delete_dir(item['data'])
 
+            elif item['channel'] == 'rec_check_changed':
+                self.recorder.writer.invalidate_check(item['data'])
+
         except:
             traceback.print_exc()
 
@@ -247,6 +253,10 @@ class CDXJIndexer(CDXJ, BaseCDXWriter):
 
 # ============================================================================
 class WebRecRedisIndexer(WritableRedisIndexer):
+    DEFAULT_BATCH_SIZE = 500
+
+    cdxj_writer_cls = CDXJIndexer
+
     def __init__(self, *args, **kwargs):
         super(WebRecRedisIndexer, self).__init__(*args, **kwargs)
 
@@ -265,6 +275,8 @@ class WebRecRedisIndexer(WritableRedisIndexer):
 
         self.stats = Stats(self.redis)
 
+        self.batch_size = int(config.get('cdxj_index_batch_size', self.DEFAULT_BATCH_SIZE))
+
     def add_warc_file(self, full_filename, params):
         base_filename = self._get_rel_or_base_name(full_filename, params)
         file_key = res_template(self.file_key_template, params)
@@ -275,43 +287,171 @@ class WebRecRedisIndexer(WritableRedisIndexer):
         self.redis.hset(file_key, base_filename, full_load_path)
         self.redis.sadd(rec_key, base_filename)
 
+    def get_index_filename(self, full_filename, params):
+        """Return WARC filename as recorded in the CDXJ index.
+
+        :param str full_filename: full path to WARC file
+        :param dict params: request parameters
+
+        :returns: relative or base WARC filename
+        :rtype: str
+        """
+        return self._get_rel_or_base_name(full_filename, params)
+
     def add_urls_to_index(self, stream, params, filename, length):
         upload_key = params.get('param.upid')
         if upload_key:
             stream = SizeTrackingReader(stream, length, self.redis, upload_key)
 
-        params['writer_cls'] = CDXJIndexer
+        base_filename = self._get_rel_or_base_name(filename, params)
+
+        cdxout = self._init_batch_writer(params)
+
+        write_cdx_index(cdxout, stream, base_filename,
+                        cdxj=True, append_post=True,
+                        writer_cls=self.cdxj_writer_cls)
+
+        if upload_key:
+            stream.flush_size()
+
+        cdxout.close()
+
+        self._finish_index(params, length, cdxout.count)
+
+        return cdxout.count
+
+    def add_cdxj_to_index(self, cdxj_stream, params, length):
+        """Add CDXJ lines, already produced from a WARC by
+        a cdxj_writer_cls writer, without reading the WARC again.
+
+        :param cdxj_stream: CDXJ file object
+        :param dict params: request parameters
+        :param int length: length of indexed WARC data
+
+        :returns: number of lines indexed
+        :rtype: int
+        """
+        cdxout = self._init_batch_writer(params)
+
+        while True:
+            buff = cdxj_stream.read(BUFF_SIZE)
+            if not buff:
+                break
+
+            cdxout.write(buff)
+
+        cdxout.close()
+
+        self._finish_index(params, length, cdxout.count, incr_upload=True)
 
-        cdx_list = (super(WebRecRedisIndexer, self).
-                      add_urls_to_index(stream, params, filename, length))
+        return cdxout.count
+
+    def _init_batch_writer(self, params):
+        keys = [res_template(self.redis_key_template, params)]
 
         # if replay key exists, add to it as well!
         coll_cdxj_key = res_template(self.coll_cdxj_key, params)
         if self.redis.exists(coll_cdxj_key):
-            for cdx in cdx_list:
-                if cdx:
-                    self.redis.zadd(coll_cdxj_key, 0, cdx)
+            keys.append(coll_cdxj_key)
+
+        def add_source_stats(cdx_batch):
+            self.stats.incr_sources(params, cdx_batch)
+
+        return CDXJBatchWriter(self.redis, keys, self.batch_size,
+                               batch_callback=add_source_stats)
 
+    def _finish_index(self, params, length, count, incr_upload=False):
         dt_now = datetime.utcnow()
 
         ts_sec = int(dt_now.timestamp())
 
+        upload_key = params.get('param.upid')
+
         with redis_pipeline(self.redis) as pi:
             for key_templ in self.info_keys:
                 key = res_template(key_templ, params)
                 pi.hincrby(key, 'size', length)
-                if cdx_list:
+                if count:
                     pi.hset(key, 'updated_at', ts_sec)
                     if key_templ == self.rec_info_key_templ:
                         pi.hset(key, 'recorded_at', ts_sec)
 
-        self.stats.incr_record(params, length, cdx_list)
+            if incr_upload and upload_key:
+                pi.hincrby(upload_key, 'size', length)
+
+        self.stats.incr_record(params, length)
+
+
+# ============================================================================
+class CDXJBatchWriter(object):
+    """Output stream for the cdx indexer which adds each CDXJ line,
+    as soon as it is written, to one or more Redis sorted sets in
+    pipelined batches, so that the full index of a WARC is never
+    held in memory.
+
+    :ivar StrictRedis redis: Redis interface
+    :ivar list keys: sorted set Redis keys
+    :ivar int batch_size: number of lines per batch
+    :ivar batch_callback: called with each batch of lines, once written
+    :ivar int count: number of lines written
+    """
+    def __init__(self, redis, keys, batch_size, batch_callback=None):
+        self.redis = redis
+        self.keys = keys
+        self.batch_size = batch_size
+        self.batch_callback = batch_callback
+
+        self.count = 0
+
+        self._partial = b''
+        self._batch = []
+
+    def write(self, buff):
+        if b'\n' not in buff:
+            self._partial += buff
+            return
+
+        lines = (self._partial + buff).split(b'\n')
+        self._partial = lines.pop()
+
+        for line in lines:
+            if line:
+                self._batch.append(line)
+
+        if len(self._batch) >= self.batch_size:
+            self.flush_batch()
+
+    def flush_batch(self):
+        if not self._batch:
+            return
+
+        zadd_args = []
+        for line in self._batch:
+            zadd_args.append(0)
+            zadd_args.append(line)
+
+        with redis_pipeline(self.redis) as pi:
+            for key in self.keys:
+                pi.zadd(key, *zadd_args)
+
+        if self.batch_callback:
+            self.batch_callback(self._batch)
+
+        self.count += len(self._batch)
+        self._batch = []
+
+    def close(self):
+        if self._partial:
+            self._batch.append(self._partial)
+            self._partial = b''
 
-        return cdx_list
+        self.flush_batch()
 
 
 # ============================================================================
 class SkipCheckingMultiFileWARCWriter(MultiFileWARCWriter):
+    MAX_CACHED_CHECKS = 10000
+
     def __init__(self, *args, **kwargs):
         config = kwargs.get('config')
         kwargs['filename_template'] = config['warc_name_templ']
@@ -330,6 +470,20 @@ class SkipCheckingMultiFileWARCWriter(MultiFileWARCWriter):
 
         self.user_key = config['info_key_templ']['user']
 
+        self.check_cache_secs = float(config.get('record_check_cache_secs', 0))
+        self.quota_lease_size = int(config.get('record_quota_lease_size', 0))
+
+        # leases are reserved in Redis, per writer, for at most check_cache_secs
+        self.quota_reserved_key = config['quota_reserved_key_templ']
+        self.writer_id = get_new_id(16)
+
+        # Redis key -> [expire time, value] for recording open, skip url and
+        # user quota lease checks, changes published on 'rec_check_changed'
+        self.check_cache = {}
+
+        # user key -> reserved Redis key of current quota leases
+        self.quota_leases = {}
+
     def create_write_buffer(self, params, name):
         rec_id = params.get('param.recorder.rec') or params.get('param.rec')
         recording = Recording(my_id=rec_id,
@@ -343,27 +497,138 @@ class SkipCheckingMultiFileWARCWriter(MultiFileWARCWriter):
     def write_stream_to_file(self, params, stream):
         upload_id = params.get('param.upid')
         def write_callback(out, filename):
-            while True:
-                buff = stream.read(BUFF_SIZE)
-                if not buff:
-                    break
+            size_counter = SizeCounter(lambda size: self.redis.hincrby(upload_id, 'size', size))
+
+            try:
+                while True:
+                    buff = stream.read(BUFF_SIZE)
+                    if not buff:
+                        break
 
-                out.write(buff)
-                if upload_id:
-                    self.redis.hincrby(upload_id, 'size', len(buff))
+                    out.write(buff)
+                    if upload_id:
+                        size_counter.incr(len(buff))
+            finally:
+                size_counter.flush()
 
         return self._write_to_file(params, write_callback)
 
-    def _is_write_resp(self, resp, params):
-        if not params['recording'].is_open():
-            logger.debug('Record Writer: Writing skipped, recording not open for write')
+    def _get_cached_check(self, key):
+        entry = self.check_cache.get(key)
+        if entry and entry[0] > time.time():
+            return entry
+
+        return None
+
+    def _set_cached_check(self, key, value):
+        if not self.check_cache_secs:
+            return
+
+        if len(self.check_cache) >= self.MAX_CACHED_CHECKS:
+            now = time.time()
+            self.check_cache = {k: v for k, v in iteritems(self.check_cache) if v[0] > now}
+
+            if len(self.check_cache) >= self.MAX_CACHED_CHECKS:
+                self.check_cache = {}
+
+        self.check_cache[key] = [time.time() + self.check_cache_secs, value]
+
+    def invalidate_check(self, key):
+        self.check_cache.pop(key, None)
+
+        # release unused part of quota lease
+        reserved_key = self.quota_leases.pop(key, None)
+        if reserved_key:
+            self.redis.hdel(reserved_key, self.writer_id)
+
+    def _is_open(self, recording):
+        open_rec_key = self.open_rec_key.format(rec=recording.my_id)
+
+        # only the open state is cached, closing publishes an invalidation
+        if self._get_cached_check(open_rec_key):
+            return True
+
+        if not recording.is_open():
             return False
 
+        self._set_cached_check(open_rec_key, True)
+        return True
+
+    def _reserve_size(self, params, length):
         user_key = res_template(self.user_key, params)
-        size, max_size = self.redis.hmget(user_key, ['size', 'max_size'])
 
-        size = int(size or 0)
-        max_size = int(max_size or 0)
+        if not self.quota_lease_size or not self.check_cache_secs:
+            size, max_size = self.redis.hmget(user_key, ['size', 'max_size'])
+            return length <= int(max_size or 0) - int(size or 0)
+
+        lease = self._get_cached_check(user_key)
+        if lease and lease[1] >= length:
+            lease[1] -= length
+            return True
+
+        reserved_key = res_template(self.quota_reserved_key, params)
+
+        lease_size = self._reserve_lease(user_key, reserved_key, length)
+        if not lease_size:
+            self.invalidate_check(user_key)
+            return False
+
+        self.quota_leases[user_key] = reserved_key
+        self._set_cached_check(user_key, lease_size - length)
+        return True
+
+    def _reserve_lease(self, user_key, reserved_key, length):
+        """Reserve up to quota_lease_size bytes, but at least length, of
+        the user's remaining space, not counting space reserved by other
+        writers. Replaces this writer's previous lease, if any.
+
+        :param str user_key: user Redis key
+        :param str reserved_key: reserved space Redis key
+        :param int length: length of response
+
+        :returns: size of lease or None if length exceeds remaining space
+        :rtype: int or None
+        """
+        def do_reserve(pi):
+            now = time.time()
+
+            size, max_size = pi.hmget(user_key, ['size', 'max_size'])
+            remaining = int(max_size or 0) - int(size or 0)
+
+            # entries are 'size:expire time', expired leases no longer count
+            expired = []
+            for writer_id, entry in iteritems(pi.hgetall(reserved_key)):
+                if writer_id == self.writer_id:
+                    continue
+
+                reserved, expire = entry.split(':')
+                if float(expire) > now:
+                    remaining -= int(reserved)
+                else:
+                    expired.append(writer_id)
+
+            lease_size = max(min(self.quota_lease_size, remaining), length)
+
+            pi.multi()
+            if expired:
+                pi.hdel(reserved_key, *expired)
+
+            if length > remaining:
+                pi.hdel(reserved_key, self.writer_id)
+                return None
+
+            pi.hset(reserved_key, self.writer_id,
+                    '{0}:{1}'.format(lease_size, now + self.check_cache_secs))
+            pi.expire(reserved_key, int(self.check_cache_secs) + 1)
+            return lease_size
+
+        return self.redis.transaction(do_reserve, user_key, reserved_key,
+                                      value_from_callable=True)
+
+    def _is_write_resp(self, resp, params):
+        if not self._is_open(params['recording']):
+            logger.debug('Record Writer: Writing skipped, recording not open for write')
+            return False
 
         length = resp.length or resp.rec_headers.get_header('Content-Length')
         if length is None:
@@ -371,7 +636,7 @@ class SkipCheckingMultiFileWARCWriter(MultiFileWARCWriter):
             resp.length = resp.payload_length
             length = resp.length
 
-        if size + length > max_size:
+        if not self._reserve_size(params, int(length)):
             logger.error('Record Writer: New Record for {0} exceeds max size, not recording!'.format(params['url']))
             return False
 
@@ -383,7 +648,14 @@ class SkipCheckingMultiFileWARCWriter(MultiFileWARCWriter):
 
         skip_key = res_template(self.skip_key_template, params)
 
-        if self.redis.get(skip_key) == '1':
+        entry = self._get_cached_check(skip_key)
+        if entry:
+            skip = entry[1]
+        else:
+            skip = self.redis.get(skip_key) == '1'
+            self._set_cached_check(skip_key, skip)
+
+        if skip:
             logger.debug('Record Writer: Skipping Request for: ' + params.get('url'))
             return False
 
@@ -400,13 +672,14 @@ class TempWriteBuffer(tempfile.SpooledTemporaryFile):
         self.recording.inc_pending_count()
 
         self._wsize = 0
+        self._size_counter = SizeCounter(self.recording.inc_pending_size)
 
     def write(self, buff):
         super(TempWriteBuffer, self).write(buff)
         length = len(buff)
         self._wsize += length
 
-        self.recording.inc_pending_size(length)
+        self._size_counter.incr(length)
 
     def close(self):
         try:
@@ -414,6 +687,7 @@ class TempWriteBuffer(tempfile.SpooledTemporaryFile):
         except:
             traceback.print_exc()
 
-        self.recording.dec_pending_count_and_size(self._wsize)
+        # only remove pending size that has been added
+        self.recording.dec_pending_count_and_size(self._wsize - self._size_counter.pending)
 
 
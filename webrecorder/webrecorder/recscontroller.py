@@ -7,6 +7,12 @@ from webrecorder.models import User, Collection, Recording
 
 # ============================================================================
 class RecsController(BaseController):
+    def __init__(self, *args, **kwargs):
+        super(RecsController, self).__init__(*args, **kwargs)
+        config = kwargs['config']
+
+        self.page_list_max_limit = int(config.get('page_list_max_limit', 1000))
+
     def init_routes(self):
         wr_api_spec.set_curr_tag('Recordings')
 
@@ -34,9 +40,12 @@ class RecsController(BaseController):
         def get_recordings():
             user, collection = self.load_user_coll()
 
-            recs = collection.get_recordings()
+            def get_recordings_result():
+                recs = collection.get_recordings()
 
-            return {'recordings': [rec.serialize() for rec in recs]}
+                return {'recordings': [rec.serialize() for rec in recs]}
+
+            return self.conditional_api_response(get_recordings_result, collection)
 
         @self.app.get('/api/v1/recording/<rec>')
         @self.api(query=['user', 'coll'],
@@ -44,10 +53,8 @@ class RecsController(BaseController):
         def get_recording(rec):
             user, collection, recording = self.load_recording(rec)
 
-            if recording:
-                return {'recording': recording.serialize()}
-            else:
-                self._raise_error(404, 'no_such_recording')
+            return self.conditional_api_response(lambda: {'recording': recording.serialize()},
+                                                 collection, recording)
 
         @self.app.post('/api/v1/recording/<rec>')
         @self.api(query=['user', 'coll'],
@@ -135,13 +142,26 @@ class RecsController(BaseController):
             return {'page_id': page_id}
 
         @self.app.get('/api/v1/recording/<rec>/pages')
-        @self.api(query=['user', 'coll'],
+        @self.api(query=['user', 'coll', '?cursor', '?limit'],
                   resp='pages')
         def list_pages(rec):
             user, collection, recording = self.load_recording(rec)
 
-            pages = collection.list_rec_pages(recording)
-            return {'pages': pages}
+            limit = request.query.get('limit')
+            if not limit:
+                pages = collection.list_rec_pages(recording)
+                return {'pages': pages}
+
+            try:
+                limit = min(max(int(limit), 1), self.page_list_max_limit)
+            except ValueError:
+                self._raise_error(400, 'invalid_limit')
+
+            pages, cursor = collection.list_rec_pages_range(recording,
+                                                            cursor=request.query.getunicode('cursor'),
+                                                            limit=limit)
+
+            return {'pages': pages, 'cursor': cursor}
 
         @self.app.get('/api/v1/recording/<rec>/num_pages')
         @self.api(query=['user', 'coll'],
@@ -149,7 +169,7 @@ class RecsController(BaseController):
         def get_num_pages(rec):
             user, collection, recording = self.load_recording(rec)
 
-            return {'count': recording.count_pages() }
+            return {'count': collection.count_rec_pages(recording)}
 
         @self.app.delete('/api/v1/recording/<rec>/pages')
         @self.api(query=['user', 'coll'],
@@ -10,7 +10,7 @@ import redis
 from time import strftime, gmtime
 
 from webrecorder.cookieguard import CookieGuard
-from webrecorder.utils import redis_pipeline
+from webrecorder.utils import redis_pipeline, get_bool
 from itsdangerous import URLSafeTimedSerializer, BadSignature
 
 
@@ -261,6 +261,8 @@ class RedisSessionMiddleware(CookieGuard):
 
         self.access_cls = access_cls
 
+        self.component_read_cache = get_bool(session_opts.get('component_read_cache'))
+
     def _load_session(self, environ):
         sesh_cookie = self.split_cookie(environ)
 
@@ -333,8 +335,13 @@ class RedisSessionMiddleware(CookieGuard):
         environ['webrec.template_params'] = session.template_params
         environ['webrec.session'] = session
         if self.access_cls:
+            kwargs = {}
+            if self.component_read_cache:
+                kwargs['read_cache'] = True
+
             environ['webrec.access'] = self.access_cls(session=session,
-                                                       redis=self.access_redis)
+                                                       redis=self.access_redis,
+                                                       **kwargs)
 
     def prepare_response(self, environ, headers):
         if 'wsgiprox.proxy_host' in environ:
@@ -344,6 +351,11 @@ class RedisSessionMiddleware(CookieGuard):
 
         session = environ['webrec.session']
 
+        access = environ.get('webrec.access')
+        cache = access and access.component_cache
+        if cache:
+            headers.append(('X-WR-Redis-Calls', str(cache.redis_calls)))
+
         if session.should_delete:
             self._delete_session_cookie(environ, headers, self.sesh_key)
         else:
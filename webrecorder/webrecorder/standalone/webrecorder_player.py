@@ -1,5 +1,6 @@
 import gevent
 import base64
+import multiprocessing
 import os
 import yaml
 
@@ -31,6 +32,8 @@ class WebrecPlayerRunner(StandaloneRunner):
 
         self.cache_dir = argres.cache_dir
 
+        self.index_processes = argres.index_processes
+
         super(WebrecPlayerRunner, self).__init__(argres)
 
         if not argres.no_browser:
@@ -166,7 +169,8 @@ class WebrecPlayerRunner(StandaloneRunner):
                                    manager.config,
                                    user,
                                    indexer, '@INIT', create_coll=True,
-                                   cache_dir=self.cache_dir)
+                                   cache_dir=self.cache_dir,
+                                   index_processes=self.index_processes)
 
         files = list(self.get_archive_files(self.inputs))
 
@@ -232,6 +236,9 @@ class WebrecPlayerRunner(StandaloneRunner):
         parser.add_argument('--cache-dir',
                             help='Writable directory to cache state (including CDXJ index) to avoid reindexing on load')
 
+        parser.add_argument('--index-processes', type=int,
+                            help='Number of processes to index multiple web archive files concurrently')
+
 
 # ============================================================================
 class FakeStrictRedis(fakeredis.FakeStrictRedis):
@@ -247,5 +254,7 @@ webrecorder_player = WebrecPlayerRunner.main
 
 
 if __name__ == "__main__":
+    # indexing processes of a frozen (pyinstaller) player re-run this entry point
+    multiprocessing.freeze_support()
     webrecorder_player()
 
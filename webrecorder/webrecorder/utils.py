@@ -1,6 +1,7 @@
 from warcio.limitreader import LimitReader
 from pywb.utils.loaders import load_overlay_config
 from contextlib import contextmanager
+from collections.abc import Iterator
 
 import re
 import gevent
@@ -8,6 +9,10 @@ import logging
 import datetime
 import os
 import base64
+import itertools
+import json
+import time
+import zlib
 
 
 # ============================================================================
@@ -55,6 +60,11 @@ def init_props(config):
     import webrecorder.rec.storage.storagepaths as storagepaths
     storagepaths.init_props(config)
 
+    from webrecorder.rec.storage.s3 import S3Storage
+    S3Storage.init_props(config)
+
+    SizeCounter.init_props(config)
+
 
 # ============================================================================
 def get_new_id(max_len=None, size=10):
@@ -127,6 +137,153 @@ def redis_pipeline(redis_obj, transaction=False):
     p.execute()
 
 
+# ============================================================================
+def iter_lines(stream, block_size=65536):
+    """Yield lines (without line endings) from stream, reading in fixed-size
+    blocks rather than loading the full stream into memory.
+
+    :param stream: file object
+    :param int block_size: size of each read
+
+    :returns: lines
+    :rtype: bytes
+    """
+    return _iter_chunk_lines(iter(lambda: stream.read(block_size), b''))
+
+
+def iter_index_lines(stream, block_size=65536):
+    """Yield lines from a plain CDXJ index stream, or from a compressed
+    block index (concatenated gzip members).
+
+    :param stream: file object
+    :param int block_size: size of each read
+
+    :returns: lines
+    :rtype: bytes
+    """
+    head = stream.read(2)
+    chunks = iter(lambda: stream.read(block_size), b'')
+
+    if head != b'\x1f\x8b':
+        return _iter_chunk_lines(itertools.chain([head], chunks))
+
+    def iter_decompressed():
+        decomp = None
+
+        for buff in itertools.chain([head], chunks):
+            while buff:
+                if not decomp or decomp.eof:
+                    decomp = zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+                out = decomp.decompress(buff)
+                buff = decomp.unused_data
+                if out:
+                    yield out
+
+    return _iter_chunk_lines(iter_decompressed())
+
+
+def _iter_chunk_lines(chunks):
+    remainder = b''
+    for buff in chunks:
+        lines = (remainder + buff).split(b'\n')
+        remainder = lines.pop()
+
+        for line in lines:
+            line = line.rstrip(b'\r')
+            if line:
+                yield line
+
+    remainder = remainder.rstrip(b'\r')
+    if remainder:
+        yield remainder
+
+
+# ============================================================================
+def iter_json(value, chunk_size=65536):
+    """Yield JSON encoding of value in chunks of about chunk_size, without
+    materializing any iterators (eg. generators) it contains, which are
+    encoded as lists. Encoding of any value not containing an iterator is
+    yielded before the first iterator is consumed.
+
+    :param value: JSON serializable value, may contain iterators
+    :param int chunk_size: minimum size of each chunk, except first and last
+
+    :returns: JSON chunks
+    :rtype: str
+    """
+    buff = []
+    size = 0
+    flushed = False
+
+    for piece in _iter_json_pieces(value):
+        # about to consume an iterator
+        if piece is None:
+            if not flushed and buff:
+                yield ''.join(buff)
+                buff = []
+                size = 0
+                flushed = True
+
+            continue
+
+        buff.append(piece)
+        size += len(piece)
+
+        if size >= chunk_size:
+            yield ''.join(buff)
+            buff = []
+            size = 0
+            flushed = True
+
+    if buff:
+        yield ''.join(buff)
+
+
+def _iter_json_pieces(value):
+    if isinstance(value, Iterator):
+        yield None
+        items = value
+
+    elif not _is_lazy(value):
+        yield json.dumps(value)
+        return
+
+    elif isinstance(value, dict):
+        yield '{'
+        sep = ''
+        # items may be added while consuming an iterator, eg. on load
+        for name, item in list(value.items()):
+            yield sep + json.dumps(name) + ':'
+            sep = ','
+            yield from _iter_json_pieces(item)
+
+        yield '}'
+        return
+
+    else:
+        items = value
+
+    yield '['
+    sep = ''
+    for item in items:
+        yield sep
+        sep = ','
+        yield from _iter_json_pieces(item)
+
+    yield ']'
+
+
+def _is_lazy(value):
+    if isinstance(value, dict):
+        return any(_is_lazy(item) for item in value.values())
+
+    if isinstance(value, (list, tuple)):
+        return any(_is_lazy(item) for item in value)
+
+    return isinstance(value, Iterator)
+
+
 # ============================================================================
 class CacheingLimitReader(LimitReader):
     def __init__(self, stream, length, out):
@@ -154,16 +311,72 @@ class CacheingLimitReader(LimitReader):
         return False
 
 
+# ============================================================================
+class SizeCounter(object):
+    """Adds up sizes locally and passes the total to flush_func once it
+    reaches FLUSH_SIZE or FLUSH_SECS have passed since the last flush.
+    The first size is passed on at once.
+
+    :cvar int FLUSH_SIZE: max size to add up before flushing
+    :cvar float FLUSH_SECS: max time to add up for before flushing
+    """
+    FLUSH_SIZE = 1024 * 1024
+    FLUSH_SECS = 1.0
+
+    @classmethod
+    def init_props(cls, config):
+        cls.FLUSH_SIZE = int(config.get('size_counter_flush_size', cls.FLUSH_SIZE))
+        cls.FLUSH_SECS = float(config.get('size_counter_flush_secs', cls.FLUSH_SECS))
+
+    def __init__(self, flush_func):
+        self.flush_func = flush_func
+        self.pending = 0
+        self.last_flush_time = 0.0
+
+    def incr(self, size):
+        """Add size, flushing if threshold reached.
+
+        :param int size: size
+        """
+        self.pending += size
+
+        if (self.pending >= self.FLUSH_SIZE or
+            (time.time() - self.last_flush_time) >= self.FLUSH_SECS):
+            self.flush()
+
+    def flush(self):
+        """Pass on size added since last flush, if any."""
+        if not self.pending:
+            return
+
+        size = self.pending
+        self.pending = 0
+        self.last_flush_time = time.time()
+
+        self.flush_func(size)
+
+
 # ============================================================================
 class SizeTrackingWriter(object):
     def __init__(self, redis, key):
         self.redis = redis
         self.key = key
+        self.size_counter = SizeCounter(self.incr_size)
 
     def write(self, buff):
         gevent.sleep(0)
 
-        self.redis.hincrby(self.key, 'size', len(buff))
+        # empty read at end of stream
+        if buff:
+            self.size_counter.incr(len(buff))
+        else:
+            self.flush()
+
+    def flush(self):
+        self.size_counter.flush()
+
+    def incr_size(self, size):
+        self.redis.hincrby(self.key, 'size', size)
 
 
 # ============================================================================
@@ -174,6 +387,10 @@ class SizeTrackingReader(CacheingLimitReader):
 
         self.closed = False
 
+    def flush_size(self):
+        """Add size read but not yet tracked."""
+        self.out.flush()
+
     def readable(self):
         return True
 
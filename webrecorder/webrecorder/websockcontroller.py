@@ -4,10 +4,13 @@ import json
 import os
 
 import gevent
+import gevent.lock
 import gevent.queue
+import gevent.select
 
 from webrecorder.basecontroller import BaseController
 from webrecorder.models.dynstats import DynStats
+from webrecorder.models.recording import Recording
 from webrecorder.models.stats import Stats
 
 
@@ -24,6 +27,8 @@ class WebsockController(BaseController):
         self.dyn_stats = DynStats(self.redis, config)
         self.stats = Stats(self.redis)
 
+        self.status_publisher = StatusPublisher(self.redis, self.dyn_stats, self.status_update_secs)
+
     def init_routes(self):
         @self.app.get('/_client_ws')
         def client_ws():
@@ -124,7 +129,6 @@ class BaseWebSockHandler(object):
         self.content_app = websock_controller.content_app
         self.access = websock_controller.access
 
-        self.dyn_stats = websock_controller.dyn_stats
         self.stats = websock_controller.stats
 
         self.sesh_id = sesh_id
@@ -132,7 +136,8 @@ class BaseWebSockHandler(object):
 
         self.updater = None
         if status_update_secs:
-            self.updater = StatusUpdater(status_update_secs, self)
+            self.updater = StatusUpdater(status_update_secs, self,
+                                         websock_controller.status_publisher)
 
         self.name = name
         self.channel = None
@@ -154,25 +159,32 @@ class BaseWebSockHandler(object):
 
         accum_buff = None
 
-        while True:
-            # read WS
-            buff = self._recv_ws()
-            if buff:
-                accum_buff = buff if not accum_buff else accum_buff + buff
-                accum_buff = self.handle_client_msg(accum_buff)
+        try:
+            while True:
+                timeout = self.updater.get_wait_secs() if self.updater else None
 
-            # read pubsub
-            if self.pubsub:
-                ps_msg = self.pubsub.get_message(ignore_subscribe_messages=True, timeout=0.1)
-                if ps_msg and ps_msg['type'] == 'message':
-                    self._send_ws(ps_msg['data'])
+                # wait for WS frames, pubsub messages or next status update, whichever comes first
+                for type_, data in self._wait_events(timeout):
+                    if type_ == 'ws':
+                        accum_buff = data if not accum_buff else accum_buff + data
+                        accum_buff = self.handle_client_msg(accum_buff)
 
-            if self.updater:
-                res = self.updater.get_update()
-                if res:
-                    self._send_ws(res)
+                    elif type_ == 'ps':
+                        self._send_ws(data)
 
-            gevent.sleep(1.0)
+                if self.updater:
+                    res = self.updater.get_update()
+                    if res:
+                        self._send_ws(res)
+        finally:
+            self._close()
+
+    def _close(self):
+        if self.updater:
+            self.updater.close()
+
+        if self.pubsub:
+            self.pubsub.close()
 
     def _publish(self, channel, msg):
         self.browser_redis.publish(channel, json.dumps(msg))
@@ -252,49 +264,46 @@ class BaseWebSockHandler(object):
             if msg['ws_type'] in ('replace-url', 'load', 'patch_req', 'behaviorDone', 'behaviorStop', 'behaviorStep'):
                 self._publish(from_browser, msg)
 
-    def get_status(self):
-        size = self.recording.size if self.recording else self.collection.size
-
-        if size is None:
-            result = {'ws_type': 'error', 'error': 'not_found'}
-            return json.dumps(result)
-
-        result = {'ws_type': 'status'}
-        result['size'] = size
-
-        if self.recording:
-            pending_size = self.recording.get_pending_size()
-
-            # if extracting, also add the size from patch recording, if any
-            if self.type_.startswith('extract'):
-                patch_recording = self.recording.get_patch_recording()
-                if patch_recording:
-                    patch_size = patch_recording.size
-                    pending_size += patch_recording.get_pending_size()
-                    if patch_size is not None:
-                        size += patch_size
-
-            result['pending_size'] = pending_size
-
-        if self.stats_urls:
-            result['stats'] = self.dyn_stats.get_dyn_stats(
-                                self.user,
-                                self.collection,
-                                self.recording,
-                                self.sesh_id,
-                                self.stats_urls)
-
-        return json.dumps(result)
-
 
 # ============================================================================
 class UwsgiWebSockHandler(BaseWebSockHandler):
+    # max wait between WS reads, for uwsgi to send and check pings
+    MAX_WAIT_SECS = 10.0
+
     def _init_ws(self, env):
         uwsgi.websocket_handshake(env['HTTP_SEC_WEBSOCKET_KEY'],
                                   env.get('HTTP_ORIGIN', ''))
 
-    def _recv_ws(self):
-        return uwsgi.websocket_recv_nb()
+        self.fds = [uwsgi.connection_fd()]
+        if self.pubsub:
+            self.fds.append(self.pubsub.connection._sock.fileno())
+
+    def _wait_events(self, timeout):
+        if timeout is None or timeout > self.MAX_WAIT_SECS:
+            timeout = self.MAX_WAIT_SECS
+
+        gevent.select.select(self.fds, [], [], timeout)
+
+        events = []
+
+        # uwsgi WS must be read from request greenlet, raises OSError if closed
+        while True:
+            buff = uwsgi.websocket_recv_nb()
+            if not buff:
+                break
+
+            events.append(('ws', buff))
+
+        if self.pubsub:
+            while True:
+                ps_msg = self.pubsub.get_message()
+                if not ps_msg:
+                    break
+
+                if ps_msg['type'] == 'message':
+                    events.append(('ps', ps_msg['data']))
+
+        return events
 
     def _send_ws(self, msg):
         uwsgi.websocket_send(msg)
@@ -306,7 +315,11 @@ class GeventWebSockHandler(BaseWebSockHandler):
         self._ws = env['wsgi.websocket']
 
         self.q = gevent.queue.Queue()
-        gevent.spawn(self._do_recv)
+        self.ws_closed = False
+        self.readers = [gevent.spawn(self._do_recv)]
+
+        if self.pubsub:
+            self.readers.append(gevent.spawn(self._do_recv_pubsub))
 
     def _do_recv(self):
         while not self._ws.closed:
@@ -316,37 +329,77 @@ class GeventWebSockHandler(BaseWebSockHandler):
                 break
 
             if result:
-                self.q.put(result.encode('utf-8'))
+                self.q.put(('ws', result.encode('utf-8')))
+
+        self.q.put(('closed', None))
+
+    def _do_recv_pubsub(self):
+        try:
+            for ps_msg in self.pubsub.listen():
+                if ps_msg['type'] == 'message':
+                    self.q.put(('ps', ps_msg['data']))
+        except Exception as e:
+            print('*** WS PUBSUB ERR', self.channel, e)
+
+        self.q.put(('closed', None))
 
-    def _recv_ws(self):
-        if self._ws.closed:
+    def _wait_events(self, timeout):
+        if self.ws_closed:
             raise OSError('WS Closed')
 
         try:
-            return self.q.get_nowait()
+            events = [self.q.get(timeout=timeout)]
         except gevent.queue.Empty as e:
-            return None
+            events = []
+
+        while not self.q.empty():
+            events.append(self.q.get_nowait())
+
+        # return events received before close, raise on next call
+        if ('closed', None) in events:
+            events = events[:events.index(('closed', None))]
+            self.ws_closed = True
+
+        elif self._ws.closed:
+            self.ws_closed = True
+
+        if self.ws_closed and not events:
+            raise OSError('WS Closed')
+
+        return events
 
     def _send_ws(self, msg):
         self._ws.send(msg)
 
+    def _close(self):
+        gevent.killall(self.readers)
+        super(GeventWebSockHandler, self)._close()
+
 
 # ============================================================================
 class StatusUpdater(object):
-    def __init__(self, status_update_secs, ws_handler):
+    def __init__(self, status_update_secs, ws_handler, status_publisher):
         self.ws_handler = ws_handler
+        self.status_publisher = status_publisher
+        self.shared_status = None
 
         self.last_status = None
         self.last_status_time = 0.0
 
         self.status_update_secs = status_update_secs
 
+    def get_wait_secs(self):
+        return max(self.last_status_time + self.status_update_secs - time.time(), 0)
+
     def get_update(self):
         curr_time = time.time()
         result = None
 
-        if (curr_time - self.last_status_time) > self.status_update_secs:
-            status = self.ws_handler.get_status()
+        if (curr_time - self.last_status_time) >= self.status_update_secs:
+            if not self.shared_status:
+                self.shared_status = self.status_publisher.subscribe(self.ws_handler)
+
+            status = self.shared_status.get_status(self.ws_handler)
 
             if status != self.last_status:
                 self.last_status = status
@@ -356,6 +409,177 @@ class StatusUpdater(object):
 
         return result
 
+    def close(self):
+        if self.shared_status:
+            self.status_publisher.unsubscribe(self.ws_handler, self.shared_status)
+            self.shared_status = None
+
+
+# ============================================================================
+class StatusPublisher(object):
+    """Shares the status of each recording (or collection) between all
+    websockets open for it, so that status is read once per interval
+    rather than once per websocket.
+    """
+    def __init__(self, redis, dyn_stats, status_update_secs):
+        self.redis = redis
+        self.dyn_stats = dyn_stats
+        self.status_update_secs = status_update_secs
+
+        self.statuses = {}
+
+    def subscribe(self, ws_handler):
+        key = SharedStatus.get_key(ws_handler)
+
+        shared_status = self.statuses.get(key)
+        if not shared_status:
+            shared_status = SharedStatus(key, self, ws_handler)
+            self.statuses[key] = shared_status
+
+        shared_status.ws_handlers.add(ws_handler)
+        return shared_status
+
+    def unsubscribe(self, ws_handler, shared_status):
+        shared_status.ws_handlers.discard(ws_handler)
+
+        if not shared_status.ws_handlers and self.statuses.get(shared_status.key) is shared_status:
+            del self.statuses[shared_status.key]
+
+
+# ============================================================================
+class SharedStatus(object):
+    def __init__(self, key, status_publisher, ws_handler):
+        self.key = key
+        self.redis = status_publisher.redis
+        self.dyn_stats = status_publisher.dyn_stats
+        self.status_update_secs = status_publisher.status_update_secs
+
+        self.user = ws_handler.user
+        self.collection = ws_handler.collection
+        self.recording = ws_handler.recording
+        self.is_extract = key[2]
+        self.patch_rec = None
+
+        self.ws_handlers = set()
+
+        self.lock = gevent.lock.Semaphore()
+        self.last_update_time = 0.0
+        self.status = None
+        self.stats = {}
+
+    @staticmethod
+    def get_key(ws_handler):
+        recording = ws_handler.recording
+        is_extract = bool(recording and ws_handler.type_ and ws_handler.type_.startswith('extract'))
+
+        return (ws_handler.collection.my_id,
+                recording.my_id if recording else None,
+                is_extract)
+
+    @staticmethod
+    def get_stats_id(ws_handler):
+        return (ws_handler.sesh_id, tuple(ws_handler.stats_urls))
+
+    def get_status(self, ws_handler):
+        stats_id = self.get_stats_id(ws_handler) if ws_handler.stats_urls else None
+
+        # only one websocket updates, any others waiting get the same result
+        with self.lock:
+            if (time.time() - self.last_update_time) >= self.status_update_secs:
+                self.update()
+
+            if stats_id and stats_id not in self.stats:
+                self.update_stats([stats_id])
+
+        result = dict(self.status)
+
+        if stats_id:
+            result['stats'] = self.stats[stats_id]
+
+        return json.dumps(result)
+
+    def update(self):
+        stats_ids = set(self.get_stats_id(ws_handler)
+                        for ws_handler in self.ws_handlers
+                        if ws_handler.stats_urls)
+
+        pi = self.redis.pipeline(transaction=False)
+
+        if self.recording:
+            pi.hget(self.recording.info_key, 'size')
+            pi.get(Recording.PENDING_SIZE_KEY.format(rec=self.recording.my_id))
+
+            # if extracting, also add the pending size from patch recording, if any
+            if self.is_extract:
+                pi.hget(self.recording.info_key, 'patch_rec')
+                if self.patch_rec:
+                    pi.get(Recording.PENDING_SIZE_KEY.format(rec=self.patch_rec))
+        else:
+            pi.hget(self.collection.info_key, 'size')
+
+        stats_keys = self.add_stats(pi, stats_ids)
+
+        results = iter(pi.execute())
+
+        status = {'ws_type': 'status',
+                  'size': int(next(results) or 0)}
+
+        if self.recording:
+            pending_size = int(next(results) or 0)
+
+            if self.is_extract:
+                patch_rec = next(results)
+                if patch_rec != self.patch_rec:
+                    # patch recording added since last update, read again
+                    self.patch_rec = patch_rec
+                    return self.update()
+
+                if patch_rec:
+                    pending_size += int(next(results) or 0)
+
+            status['pending_size'] = pending_size
+
+        self.status = status
+        self.stats = self.sum_stats(stats_keys, results)
+        self.last_update_time = time.time()
+
+    def update_stats(self, stats_ids):
+        pi = self.redis.pipeline(transaction=False)
+
+        stats_keys = self.add_stats(pi, stats_ids)
+
+        self.stats.update(self.sum_stats(stats_keys, iter(pi.execute())))
+
+    def add_stats(self, pi, stats_ids):
+        stats_keys = {}
+
+        for stats_id in stats_ids:
+            sesh_id, stats_urls = stats_id
+            stats_keys[stats_id] = self.dyn_stats.get_dyn_stats_keys(self.user,
+                                                                     self.collection,
+                                                                     self.recording,
+                                                                     sesh_id,
+                                                                     stats_urls)
+
+            for key in stats_keys[stats_id]:
+                pi.hgetall(key)
+                pi.expire(key, self.dyn_stats.dyn_stats_secs)
+
+        return stats_keys
+
+    def sum_stats(self, stats_keys, results):
+        stats = {}
+
+        for stats_id, keys in stats_keys.items():
+            all_stats = []
+            for key in keys:
+                all_stats.append(next(results))
+                next(results)
+
+            stats[stats_id] = self.dyn_stats.sum_dyn_stats(all_stats)
+
+        return stats
+
 
 # ============================================================================
 try: